@@ -117,7 +117,8 @@ if (document.getElementById('priceChart')) {
         .append("g")
             .attr("tranform", "translate(" + margin.left + "," + margin.top + ")");
 
-    fetch(`/api/prices/${encodeURIComponent(product_ean)}`)
+    // The server reduces the history to about one point per pixel
+    fetch(`/api/prices/${encodeURIComponent(product_ean)}?max_points=${Math.max(Math.floor(width), 3)}`)
         .then(response => response.json())
         .then(payload => {
             // Data should be [{"group": group, "x": x, "y": y}]
@@ -7,4 +7,20 @@ from .manager import *
 
 from .schemas import *
 
+from .writer import *
+
+from .migrate import *
+
+from .compact import *
+
+from .latest import *
+
+from .popularity import *
+
+from .statistics import *
+
+from .history import *
+
+from .autocomplete import AUTOCOMPLETE
+
 db = SQLAlchemy(model_class=base)
\ No newline at end of file
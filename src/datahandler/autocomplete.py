@@ -0,0 +1,249 @@
+from .models import Product
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from collections import namedtuple
+from bisect import bisect_left, insort
+from heapq import nlargest
+from time import monotonic
+import threading
+import re
+
+# A search result, dumped with ProductSchema like a Product
+Entry = namedtuple("Entry", ["ean_id", "name", "description", "popularity"])
+
+def normalize(text):
+    """
+    Lower cases text and reduces it to words separated by single spaces
+    """
+    return " ".join(re.split(r"\W+", text.casefold())).strip() if text else ""
+
+def trigrams(text):
+    """
+    Returns the trigrams of every word of a normalized text. Words are padded
+    with a space on the left so two characters find the start of a word
+    """
+    grams = set()
+    for word in text.split():
+        word = " " + word
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+
+    return grams
+
+class AutocompleteIndex:
+    """
+    In memory index of the products for the live search, so typing does not
+    query the database.
+    Names and names with descriptions are indexed by trigrams, EANs in a
+    sorted list for prefix lookups. The products of a trigram are kept most
+    popular first and a search only looks at the first scan products which
+    contain the query, matches in the name before matches in the description.
+    Those are ranked by whether the name starts with the query, whether a
+    word of the name does, whether the name contains it and by popularity.
+    The index is built with load and kept current with add by the writer of
+    this process. Products written by other processes (scrapers) are picked
+    up by reloading it in the background once it is older than max_age
+    seconds. Products added while it is (re)loaded are added to the new
+    index as well before it replaces the old one.
+    """
+
+    def __init__(self, max_age=3600.0, scan=50):
+        self.max_age = max_age
+        self.scan = scan
+        self.engine = None
+        self.loaded = None
+        self.loading = False
+        self.pending = [] # Entries added while loading
+        self.lock = threading.Lock()
+        self.entries = {} # ean -> Entry
+        self.texts = {} # ean -> (normalized name, normalized name and description), padded with a space
+        # Products are kept as keys of dicts, which keep them in the order
+        # they were added (most popular first) and are removed from in O(1)
+        self.names = {} # trigram -> {ean: None} whose name contains it
+        self.postings = {} # trigram -> {ean: None} whose name or description contains it
+        self.eans = [] # EANs as sorted strings
+
+    def load(self, engine):
+        """
+        Builds the index from the product table. The new index replaces the
+        old one at once, searches continue on the old one in the meantime
+        """
+        with self.lock:
+            self.loading = True
+            self.pending = []
+
+        try:
+            with Session(engine) as session:
+                rows = session.execute(
+                    select(Product.ean_id, Product.name, Product.description, Product.popularity)
+                    .order_by(Product.popularity.desc())
+                ).all()
+
+            index = AutocompleteIndex()
+            for row in rows:
+                index._add(Entry(row.ean_id, row.name, row.description, row.popularity or 0))
+            index.eans.sort()
+        except Exception:
+            with self.lock:
+                self.loading = False
+                self.pending = []
+            raise
+
+        with self.lock:
+            # Products written after the products were read
+            for entry in self.pending:
+                index._add(entry, sort=True)
+            self.pending = []
+            self.entries = index.entries
+            self.texts = index.texts
+            self.names = index.names
+            self.postings = index.postings
+            self.eans = index.eans
+            self.engine = engine
+            self.loaded = monotonic()
+            self.loading = False
+
+    def _refresh(self):
+        """
+        Reloads the index in a background thread once it is older than max_age
+        """
+        with self.lock:
+            if self.loading or self.engine is None or monotonic() - self.loaded < self.max_age:
+                return
+
+            self.loading = True
+
+        def reload():
+            try:
+                self.load(self.engine)
+            except Exception as e:
+                print(f"Autocomplete index could not be reloaded: {e}")
+
+        threading.Thread(target=reload, daemon=True).start()
+
+    def _add(self, entry, sort=False):
+        ean_id = int(entry.ean_id)
+        if ean_id in self.entries:
+            self._remove(ean_id)
+
+        name = normalize(entry.name)
+        text = normalize(f"{entry.name} {entry.description or ''}")
+
+        self.entries[ean_id] = entry
+        self.texts[ean_id] = (f" {name}", f" {text}")
+        # Products are added most popular first, new ones have no prices yet
+        for gram in trigrams(name):
+            self.names.setdefault(gram, {})[ean_id] = None
+        for gram in trigrams(text):
+            self.postings.setdefault(gram, {})[ean_id] = None
+
+        if sort:
+            insort(self.eans, str(ean_id))
+        else:
+            self.eans.append(str(ean_id))
+
+    def _remove(self, ean_id):
+        name, text = self.texts[ean_id]
+        for gram in trigrams(name):
+            del self.names[gram][ean_id]
+        for gram in trigrams(text):
+            del self.postings[gram][ean_id]
+
+        del self.entries[ean_id]
+        del self.texts[ean_id]
+        i = bisect_left(self.eans, str(ean_id))
+        if i < len(self.eans) and self.eans[i] == str(ean_id):
+            del self.eans[i]
+
+    def add(self, ean_id, name, description, popularity=0):
+        """
+        Adds or updates a product, does nothing if the index was never loaded
+        """
+        entry = Entry(int(ean_id), name, description, popularity)
+
+        with self.lock:
+            if self.loading:
+                self.pending.append(entry)
+            if self.loaded is not None:
+                self._add(entry, sort=True)
+
+    def search(self, query, limit=5):
+        """
+        Returns the best matching products as Entry
+        """
+        self._refresh()
+
+        query = normalize(query)
+        if not query:
+            return []
+
+        with self.lock:
+            if query.isdigit():
+                candidates = self._ean_prefix(query)
+            else:
+                words = query.split()
+                candidates = self._matches(words, self.names, 0)
+                if len(candidates) < limit:
+                    found = set(candidates)
+                    candidates += [
+                        ean_id for ean_id in self._matches(words, self.postings, 1) if ean_id not in found
+                    ]
+
+            return [self.entries[ean_id] for ean_id in nlargest(
+                limit, candidates, key=lambda ean_id: self._rank(ean_id, query)
+            )]
+
+    def _ean_prefix(self, prefix):
+        start = bisect_left(self.eans, prefix)
+        candidates = []
+        for ean in self.eans[start:start + self.scan]:
+            if not ean.startswith(prefix):
+                break
+            candidates.append(int(ean))
+
+        return candidates
+
+    def _matches(self, words, postings, field):
+        """
+        Returns up to scan products whose name (field 0) or name and
+        description (field 1) contain all words, most popular first. Words
+        shorter than three characters have to start a word
+        """
+        grams = []
+        for word in words:
+            if len(word) > 2:
+                grams += [word[i:i + 3] for i in range(len(word) - 2)]
+            elif len(word) == 2:
+                grams.append(" " + word)
+        if not grams:
+            return []
+
+        # Trigrams only narrow down, the words are looked for in the text of
+        # the products of the rarest trigram
+        rarest = min((postings.get(gram, ()) for gram in grams), key=len)
+        patterns = [f" {word}" if len(word) < 3 else word for word in words]
+
+        texts = self.texts
+        found = []
+        for ean_id in rarest:
+            text = texts[ean_id][field]
+            for pattern in patterns:
+                if pattern not in text:
+                    break
+            else:
+                found.append(ean_id)
+                if len(found) >= self.scan:
+                    break
+
+        return found
+
+    def _rank(self, ean_id, query):
+        name = self.texts[ean_id][0]
+        return (
+            name.startswith(query, 1),
+            f" {query}" in name,
+            query in name,
+            self.entries[ean_id].popularity
+        )
+
+# Index of this process, loaded on startup
+AUTOCOMPLETE = AutocompleteIndex()
@@ -0,0 +1,127 @@
+from .models import Price
+from .latest import refresh_latest_prices
+from .popularity import refresh_popularity
+from .statistics import count_statistics
+from sqlalchemy import select, update, delete, insert
+from datetime import timedelta
+from bisect import bisect_left, bisect_right
+
+def compact_prices(session, batch=500):
+    """
+    Folds every run of equal consecutive prices of a product in a shop into
+    the first row of the run, whose last_seen is extended to the last
+    observation of the run. Afterwards the table looks as if it had been
+    written by a change only BulkWriter.
+    Products are processed batch at a time, each batch in its own
+    transaction. Returns the number of removed rows
+    """
+    eans = session.scalars(select(Price.ean_id).distinct().order_by(Price.ean_id)).all()
+
+    removed = 0
+    for i in range(0, len(eans), batch):
+        rows = session.execute(
+            select(Price.id, Price.ean_id, Price.shop_id, Price.value, Price.date, Price.last_seen)
+            .where(Price.ean_id.in_(eans[i:i + batch]))
+            .order_by(Price.ean_id, Price.shop_id, Price.date, Price.id)
+        ).all()
+
+        extended = {}
+        obsolete = []
+        head = None
+        for row in rows:
+            if row.value is None:
+                # Rows without a value end a run and are kept as they are
+                head = None
+                continue
+
+            seen = row.last_seen if row.last_seen else row.date
+            if head and (head.ean_id, head.shop_id) == (row.ean_id, row.shop_id) and \
+                    abs(head.value - row.value) < 0.005:
+                obsolete.append(row.id)
+                head_seen = max(head_seen, seen)
+                extended[head.id] = {"id": head.id, "last_seen": head_seen}
+            else:
+                head, head_seen = row, seen
+
+        if obsolete:
+            session.execute(update(Price), list(extended.values()))
+            session.execute(delete(Price).where(Price.id.in_(obsolete)))
+            refresh_latest_prices(session, {(row.ean_id, row.shop_id) for row in rows})
+            refresh_popularity(session, eans[i:i + batch])
+            count_statistics(session, {"prices": -len(obsolete)})
+            session.commit()
+            removed += len(obsolete)
+            print(f"Removed {removed} duplicate prices")
+
+    return removed
+
+def replace_prices(session, ean_id, shop_id, observations, margin=300):
+    """
+    Replaces the prices of a product in a shop written for the supplied
+    observations, given as (date, value) sorted by date, with rows derived
+    from the observations. A row belongs to an observation if it was written
+    up to margin seconds after it, other rows in between (e.g. of a time the
+    pages were not archived) are kept and end the run of equal values before
+    them. Equal consecutive values are folded into validity intervals like
+    the change only BulkWriter does. Observations without a value are
+    ignored.
+    Does not commit. Returns the number of removed and added rows
+    """
+    observations = [(date, value) for date, value in observations if value is not None]
+    if not observations:
+        return 0, 0
+
+    dates = [date for date, value in observations]
+    margin = timedelta(seconds=margin)
+    pair = (Price.ean_id == ean_id, Price.shop_id == shop_id)
+
+    def observed(date):
+        i = bisect_right(dates, date)
+        return i > 0 and date - dates[i - 1] <= margin
+
+    rows = session.execute(
+        select(Price.id, Price.date, Price.last_seen).where(*pair, Price.date >= dates[0], Price.date <= dates[-1] + margin)
+    ).all()
+    old = [row for row in rows if observed(row.date)]
+    kept = sorted(row.date for row in rows if not observed(row.date))
+    previous = session.execute(
+        select(Price.id, Price.value, Price.date, Price.last_seen)
+        .where(*pair, Price.date < dates[0])
+        .order_by(Price.date.desc())
+        .limit(1)
+    ).first()
+
+    runs = []
+    for date, value in observations:
+        if runs and abs(runs[-1]["value"] - value) < 0.005 and \
+                bisect_right(kept, runs[-1]["last_seen"]) == bisect_left(kept, date):
+            runs[-1]["last_seen"] = date
+        else:
+            runs.append({"ean_id": ean_id, "shop_id": shop_id, "value": float(value), "date": date, "last_seen": date})
+
+    # Unchanged pages are not archived, but the old rows were extended by them
+    seen = max((row.last_seen for row in old if row.last_seen), default=None)
+    if seen and seen > runs[-1]["last_seen"] and bisect_right(kept, runs[-1]["last_seen"]) == len(kept):
+        runs[-1]["last_seen"] = seen
+
+    # The first run continues the price before the replaced span
+    if previous and previous.value is not None and abs(previous.value - runs[0]["value"]) < 0.005:
+        first = runs.pop(0)
+        previous_seen = previous.last_seen if previous.last_seen else previous.date
+        session.execute(
+            update(Price).where(Price.id == previous.id).values(last_seen=max(previous_seen, first["last_seen"]))
+        )
+
+    for run in runs:
+        if run["last_seen"] == run["date"]:
+            run["last_seen"] = None
+
+    if old:
+        session.execute(delete(Price).where(Price.id.in_([row.id for row in old])))
+    if runs:
+        session.execute(insert(Price), runs)
+    refresh_latest_prices(session, [(ean_id, shop_id)])
+    refresh_popularity(session, [ean_id])
+    count_statistics(session, {"prices": len(runs) - len(old)})
+
+    return len(old), len(runs)
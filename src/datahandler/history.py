@@ -0,0 +1,147 @@
+from .models import Price, Shop
+from .schemas import ShopSchema
+from sqlalchemy import select, func, cast, or_, Integer
+
+def epoch(expression, dialect):
+    """
+    Returns an SQL expression of the seconds since the epoch of a datetime
+    expression
+    """
+    if dialect in ("mysql", "mariadb"):
+        return func.unix_timestamp(expression, type_=Integer)
+    if dialect == "postgresql":
+        return cast(func.extract("epoch", expression), Integer)
+
+    return cast(func.strftime("%s", expression), Integer)
+
+def lttb(points, threshold):
+    """
+    Reduces points, given as (x, y) sorted by x, to threshold points with
+    Largest-Triangle-Three-Buckets. The first and the last point are kept,
+    of every bucket in between the point spanning the largest triangle with
+    the point kept before and the average of the next bucket, which keeps
+    the visible peaks. Returns the indexes of the kept points
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(range(len(points)))
+
+    kept = [0]
+    size = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * size) + 1
+        end = int((i + 1) * size) + 1
+        next_end = min(int((i + 2) * size) + 1, len(points))
+
+        following = points[end:next_end] if end < next_end else points[-1:]
+        avg_x = sum(x for x, y in following) / len(following)
+        avg_y = sum(y for x, y in following) / len(following)
+
+        ax, ay = points[a]
+        best, best_area = start, -1
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+
+        kept.append(best)
+        a = best
+
+    kept.append(len(points) - 1)
+
+    return kept
+
+def get_price_history(db, ean, start=None, end=None, max_points=None):
+    """
+    Gets the prices of a product for the price chart, grouped by shop
+    Returns a list of points {"group": shop, "x": date, "y": value,
+    "last_seen": date} sorted by date. A price row covers all observations
+    from its date up to last_seen, both ends are returned as point.
+    Only prices valid between start and end are returned if supplied. With
+    max_points every shop is reduced to at most max_points points: the span
+    is split into max_points / 2 buckets of which the first, the last, the
+    lowest and the highest price per shop are selected in SQL, the rest is
+    reduced with lttb
+    """
+    dialect = db.session.get_bind().dialect.name
+    seen = func.coalesce(Price.last_seen, Price.date)
+
+    # Rows without a value can not be drawn
+    conditions = [Price.ean_id == ean, Price.value.isnot(None)]
+    if start:
+        conditions.append(seen >= start)
+    if end:
+        conditions.append(Price.date <= end)
+
+    columns = [Price.shop_id, Price.value, Price.date, Price.last_seen]
+    stmt = select(*columns).where(*conditions).order_by(Price.shop_id, Price.date)
+
+    if max_points:
+        first, last = db.session.execute(select(func.min(Price.date), func.max(seen)).where(*conditions)).one()
+        buckets = max(max_points // 2, 1)
+
+        if first is not None and last > first:
+            # The following SQL Statement is generated (on MariaDB)
+            """
+            SELECT shop_id, value, date, last_seen FROM (
+                SELECT price.shop_id, price.value, price.date, price.last_seen,
+                    row_number() OVER (PARTITION BY price.shop_id, bucket ORDER BY price.date) AS first_rank,
+                    row_number() OVER (PARTITION BY price.shop_id, bucket ORDER BY price.date DESC) AS last_rank,
+                    row_number() OVER (PARTITION BY price.shop_id, bucket ORDER BY price.value, price.date) AS low_rank,
+                    row_number() OVER (PARTITION BY price.shop_id, bucket ORDER BY price.value DESC, price.date) AS high_rank
+                FROM price
+                WHERE price.ean_id = 4316268629836
+            ) AS bucketed
+            WHERE first_rank = 1 OR last_rank = 1 OR low_rank = 1 OR high_rank = 1
+            ORDER BY shop_id, date;
+            """
+            # with bucket = FLOOR((UNIX_TIMESTAMP(price.date) - UNIX_TIMESTAMP(first)) / width)
+            width = max(int((last - first).total_seconds() / buckets) + 1, 1)
+            bucket = (epoch(Price.date, dialect) - epoch(first, dialect)) // width
+            partition = (Price.shop_id, bucket)
+
+            bucketed = select(
+                *columns,
+                func.row_number().over(partition_by=partition, order_by=Price.date).label("first_rank"),
+                func.row_number().over(partition_by=partition, order_by=Price.date.desc()).label("last_rank"),
+                func.row_number().over(partition_by=partition, order_by=(Price.value, Price.date)).label("low_rank"),
+                func.row_number().over(partition_by=partition, order_by=(Price.value.desc(), Price.date)).label("high_rank")
+            ).where(*conditions).subquery("bucketed")
+
+            stmt = (
+                select(bucketed.c.shop_id, bucketed.c.value, bucketed.c.date, bucketed.c.last_seen)
+                .where(or_(bucketed.c.first_rank == 1, bucketed.c.last_rank == 1, bucketed.c.low_rank == 1, bucketed.c.high_rank == 1))
+                .order_by(bucketed.c.shop_id, bucketed.c.date)
+            )
+
+    series = {} # shop id -> [(date, row)]
+    for row in db.session.execute(stmt):
+        points = series.setdefault(row.shop_id, [])
+        points.append((row.date, row))
+        if row.last_seen and row.last_seen != row.date:
+            points.append((row.last_seen, row))
+
+    shop_schema = ShopSchema()
+    shops = {shop.id: shop_schema.dump(shop) for shop in db.session.scalars(select(Shop).where(Shop.id.in_(list(series))))}
+
+    results = []
+    for shop_id, points in series.items():
+        points.sort(key=lambda point: point[0])
+        if max_points:
+            kept = lttb([(date.timestamp(), row.value) for date, row in points], max_points)
+            points = [points[i] for i in kept]
+
+        results += [
+            {
+                "group": shops[shop_id],
+                "x": date.isoformat(),
+                "y": row.value,
+                "last_seen": row.last_seen.isoformat() if row.last_seen else None
+            }
+            for date, row in points
+        ]
+
+    results.sort(key=lambda point: point["x"])
+
+    return results
@@ -0,0 +1,157 @@
+from .models import Price, LatestPrice
+from sqlalchemy import select, delete, insert, func, and_, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+
+def latest_price_rows(session, pairs):
+    """
+    Returns the latest Price row of every supplied (ean, shop) pair as dict.
+    Each pair is resolved by a seek on the (ean_id, shop_id, date) index
+    instead of ranking its whole history
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return {}
+
+    latest = (
+        select(
+            Price.ean_id.label('ean_id'),
+            Price.shop_id.label('shop_id'),
+            func.max(Price.date).label('date')
+        )
+        .where(tuple_(Price.ean_id, Price.shop_id).in_(pairs))
+        .group_by(Price.ean_id, Price.shop_id)
+        .subquery('latest')
+    )
+
+    rows = session.execute(
+        select(Price.id, Price.ean_id, Price.shop_id, Price.value, Price.date, Price.last_seen)
+        .join(latest, and_(
+            Price.ean_id == latest.c.ean_id,
+            Price.shop_id == latest.c.shop_id,
+            Price.date == latest.c.date
+        ))
+        .order_by(Price.id)
+    ).all()
+
+    # Of rows with the same date the last written one wins
+    return {(row.ean_id, row.shop_id): row for row in rows}
+
+def upsert(session, model, rows, keys):
+    """
+    Inserts rows into the table of model, rows whose keys already exist are
+    updated instead. Uses the native upsert of MariaDB / MySQL, SQLite and
+    PostgreSQL, elsewhere the existing rows are deleted first
+    """
+    if not rows:
+        return
+
+    dialect = session.get_bind().dialect.name
+    columns = [column for column in rows[0] if column not in keys]
+
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in columns})
+    elif dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={column: stmt.excluded[column] for column in columns}
+        )
+    else:
+        table = model.__table__
+        session.execute(delete(model).where(
+            tuple_(*(table.c[key] for key in keys)).in_([tuple(row[key] for key in keys) for row in rows])
+        ))
+        stmt = insert(model).values(rows)
+
+    session.execute(stmt)
+
+def insert_missing(session, model, rows, keys):
+    """
+    Inserts rows into the table of model, rows whose keys already exist are
+    skipped, e.g. products another scraper wrote in the meantime. Uses the
+    native conflict handling of MariaDB / MySQL, SQLite and PostgreSQL,
+    elsewhere the existing keys are looked up first. Returns the number of
+    inserted rows
+    """
+    if not rows:
+        return 0
+
+    dialect = session.get_bind().dialect.name
+    table = model.__table__
+
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(model).values(rows).prefix_with("IGNORE")
+    elif dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(model).values(rows)
+        stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+    else:
+        existing = set(session.execute(select(*(table.c[key] for key in keys)).where(
+            tuple_(*(table.c[key] for key in keys)).in_([tuple(row[key] for key in keys) for row in rows])
+        )).all())
+        rows = [row for row in rows if tuple(row[key] for key in keys) not in existing]
+        if not rows:
+            return 0
+        session.execute(insert(model), rows)
+        return len(rows)
+
+    return session.execute(stmt).rowcount
+
+def refresh_latest_prices(session, pairs):
+    """
+    Updates the LatestPrice rows of the supplied (ean, shop) pairs from the
+    price table, has to be called whenever prices of the pairs were written
+    or removed. Does not commit
+    """
+    pairs = {(int(ean_id), int(shop_id)) for ean_id, shop_id in pairs}
+    if not pairs:
+        return
+
+    rows = latest_price_rows(session, pairs)
+
+    upsert(session, LatestPrice, [
+        {
+            "ean_id": row.ean_id,
+            "shop_id": row.shop_id,
+            "price_id": row.id,
+            "value": row.value,
+            "date": row.date,
+            "last_seen": row.last_seen
+        }
+        for row in rows.values()
+    ], ["ean_id", "shop_id"])
+
+    gone = pairs - set(rows)
+    if gone:
+        session.execute(delete(LatestPrice).where(tuple_(LatestPrice.ean_id, LatestPrice.shop_id).in_(gone)))
+
+def backfill_latest_prices(session, batch=500):
+    """
+    Rebuilds the LatestPrice rows of all products from the price table,
+    batch products at a time, each batch in its own transaction. Returns the
+    number of (ean, shop) pairs
+    """
+    eans = session.scalars(select(Price.ean_id).distinct().order_by(Price.ean_id)).all()
+
+    count = 0
+    for i in range(0, len(eans), batch):
+        pairs = session.execute(
+            select(Price.ean_id, Price.shop_id).distinct().where(Price.ean_id.in_(eans[i:i + batch]))
+        ).all()
+        refresh_latest_prices(session, pairs)
+        session.commit()
+        count += len(pairs)
+
+    return count
+
+def ensure_latest_prices(session):
+    """
+    Fills the LatestPrice table if it is empty while prices exist, i.e. on
+    the first start after it was added
+    """
+    if session.scalar(select(LatestPrice.ean_id).limit(1)) is None and \
+            session.scalar(select(Price.id).limit(1)) is not None:
+        print("Building latest prices")
+        print(f"Latest prices of {backfill_latest_prices(session)} products in shops built")
@@ -1,7 +1,10 @@
-from .models import alternatives_table,Unit,Product,Shop,Price,ProductPage
+from .models import alternatives_table,Unit,Product,Shop,Price,LatestPrice,ProductPage
+from .statistics import STATISTICS
 from sqlalchemy import or_, func, select, asc
+from sqlalchemy.dialects.mysql import match
 from sqlalchemy.sql import text
 from sqlalchemy.exc import OperationalError
+import re
 
 # Note: This module / file mainly exists because I have not researched how to
 # implement custom helpers to the database class but if someone knows how, it
@@ -64,69 +67,83 @@ def add_alternative(db, product_id, alternative_id):
 def get_database_stats(db):
     """
     Returns cosmectic information regarding the current state of the database
+    The statistics are cached for a while and taken from counters instead of
+    counting the tables, see StatisticsCache
     """
     try:
-        db.session.execute(text('SELECT 1'));
-        product_count = db.session.query(func.count(Product.ean_id)).scalar()
-        shop_count = db.session.query(func.count(Shop.id)).scalar()
-        price_count = db.session.query(func.count(Price.id)).scalar()
+        stats = STATISTICS.get(db.session)
 
         stats = {
-            "Prices": price_count,
-            "Products": product_count,
-            "Shops": shop_count
+            "Prices": stats["prices"],
+            "Prices added today": stats["prices_today"],
+            "Products": stats["products"],
+            "Shops": stats["shops"],
+            "Shops with prices today": stats["active_shops"],
+            "Newest price": stats["newest_price"].strftime("%d.%m.%Y %H:%M") if stats["newest_price"] else "-"
         }
 
         return (True, stats)
     except OperationalError as e:
         print(f"Database connection failed: {e}")
+        db.session.rollback()
         return (False, {})
 
-def search_product_by_query(db, query, *args, limit=5):
+def fulltext_terms(query):
     """
-    Searches saved products by a query which is abitrary text. Number of results
-    can be configured
+    Turns a search query into a boolean mode full-text search requiring every
+    word as prefix, e.g. "aa batt" into "+aa* +batt*"
     """
+    words = re.sub(r'[+\-<>()~*"@]', " ", query).split()
 
-    query = f"%{query}%"
+    return " ".join(f"+{word}*" for word in words)
 
+def search_product_by_query(db, query, *args, limit=5):
     """
-    queried_products = db.session.query(Product).filter(
-        or_(
-            Product.ean_id.ilike(query),
-            Product.name.ilike(query),
-            Product.description.ilike(query)
-        )
-    ).limit(limit).all()
-    """
+    Searches saved products by a query which is abitrary text. Number of results
+    can be configured.
+    On MariaDB the FULLTEXT index of name and description is used and results
+    are ranked by relevance, elsewhere (or if that finds nothing) by a
+    substring match. Ties are ranked by the number of prices of a product
+    """
+    dialect = db.session.get_bind().dialect.name
+    terms = fulltext_terms(query)
+
+    if dialect in ("mysql", "mariadb") and terms and not query.strip().isdigit():
+        # The following SQL Statement is generated
+        """
+        SELECT product.*, MATCH (product.name, product.description) AGAINST ('+aa* +batt*' IN BOOLEAN MODE) AS relevance
+        FROM product
+        WHERE MATCH (product.name, product.description) AGAINST ('+aa* +batt*' IN BOOLEAN MODE)
+        ORDER BY relevance DESC, product.popularity DESC
+        LIMIT 5;
+        """
+        relevance = match(Product.name, Product.description, against=terms).in_boolean_mode()
+
+        results = db.session.scalars(
+            select(Product)
+            .where(relevance)
+            .order_by(relevance.desc(), Product.popularity.desc())
+            .limit(limit)
+        ).all()
+
+        # Words shorter than the minimum token size of the index never match
+        if results:
+            return results
+
+    pattern = f"%{query}%"
 
-    qp = (
+    stmt = (
         select(Product)
         .where(or_(
-            Product.ean_id.ilike(query),
-            Product.name.ilike(query),
-            Product.description.ilike(query)
+            Product.ean_id.ilike(pattern),
+            Product.name.ilike(pattern),
+            Product.description.ilike(pattern)
         ))
-    ).alias('qp')
-
-    stmt = (
-        select(
-            qp.c.ean_id,
-            qp.c.name,
-            qp.c.description,
-            qp.c.amount,
-            qp.c.unit_id,
-            qp.c.image
-        )
-        .join(Price, Price.ean_id == qp.c.ean_id)
-        .group_by(qp.c.ean_id)
-        .order_by(func.count(qp.c.ean_id).desc())
+        .order_by(Product.popularity.desc())
         .limit(limit)
     )
 
-    results = db.session.execute(stmt).all()
-
-    return results
+    return db.session.scalars(stmt).all()
 
 def get_ean(ean):
     """
@@ -171,55 +188,55 @@ def get_latest_prices(db, ean):
     """
     Gets latest associated prices of the given product
     """
+    prices, lowest, highest = get_latest_prices_many(db, [ean]).get(int(ean), ([], None, None))
 
-    # The following SQL Statement gets the latest price of a product for each shop
+    return prices
+
+def get_latest_prices_many(db, eans):
     """
-    WITH found_prices AS (
-	    SELECT price.value AS value, shop.name AS name, ROW_NUMBER() OVER(PARTITION BY shop.id ORDER BY price.date DESC) AS row_number
-	    FROM price
-	    INNER JOIN shop
-	    ON price.shop_id=shop.id
-	    WHERE price.ean_id=4316268629836
-    )
-    SELECT value, name
-    FROM found_prices
-    WHERE row_number = 1;
+    Gets the latest associated prices of all given products in one query
+    Returns dict with the ean as key and a tuple of its prices per shop
+    ordered by value, the lowest and the highest of them as value. Products
+    without prices are left out
     """
 
-    found_prices = (
-        select(
-            Price.value.label('value'),
-            Price.date.label('date'),
-            Shop.name.label('name'),
-            Shop.id.label('shop_id'),
-            func.row_number().over(
-                partition_by=Shop.id,
-                order_by=Price.date.desc()
-            ).label('row_number')
-        )
-        .join(Shop, Price.shop_id == Shop.id)
-        .where(Price.ean_id == ean)
-        .cte('found_prices')
-    )
+    # The following SQL Statement gets the latest price of the products for each shop
+    """
+    SELECT latestprice.value, shop.name, COALESCE(latestprice.last_seen, latestprice.date) AS date, shop.id, latestprice.ean_id
+    FROM latestprice
+    INNER JOIN shop
+    ON latestprice.shop_id=shop.id
+    WHERE latestprice.ean_id IN (4316268629836, 4006381333931)
+    ORDER BY latestprice.ean_id, latestprice.value;
+    """
+
+    eans = {int(ean) for ean in eans}
+    if not eans:
+        return {}
 
     stmt = (
         select(
-            found_prices.c.value,
-            found_prices.c.name,
-            found_prices.c.date,
-            found_prices.c.shop_id,
+            LatestPrice.value.label('value'),
+            Shop.name.label('name'),
+            # A row covers the observations up to last_seen
+            func.coalesce(LatestPrice.last_seen, LatestPrice.date).label('date'),
+            Shop.id.label('shop_id'),
+            LatestPrice.ean_id.label('ean_id')
         )
-        .where(found_prices.c.row_number == 1)
-        .order_by(asc(found_prices.c.value))
+        .join(Shop, LatestPrice.shop_id == Shop.id)
+        .where(LatestPrice.ean_id.in_(eans))
+        .order_by(LatestPrice.ean_id, asc(LatestPrice.value))
     )
 
-    result = db.session.execute(stmt).all()
+    prices = {}
+    for row in db.session.execute(stmt):
+        prices.setdefault(row.ean_id, []).append(row)
 
-    return result
+    return {ean: (rows, rows[0], rows[-1]) for ean, rows in prices.items()}
 
 def get_latest_pricerange(db, ean):
     """
     Gets the minimum and maximum range from the latest prices
     """
-    prices = get_latest_prices(db, ean)
-    return(prices[0], prices[-1])
+    prices, lowest, highest = get_latest_prices_many(db, [ean])[int(ean)]
+    return(lowest, highest)
@@ -0,0 +1,62 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from .models import base
+from .latest import ensure_latest_prices
+from .popularity import ensure_popularity
+from .statistics import ensure_statistics
+
+def _created_on(index, dialect):
+    """
+    Returns whether the index exists on the dialect, indexes can be limited
+    to some dialects with Index.ddl_if
+    """
+    ddl_if = getattr(index, "_ddl_if", None)
+    if ddl_if is None or ddl_if.dialect is None:
+        return True
+
+    dialects = (ddl_if.dialect,) if isinstance(ddl_if.dialect, str) else ddl_if.dialect
+    return dialect.name in dialects
+
+def upgrade_schema(engine, metadata=base.metadata):
+    """
+    Creates the missing tables and adds the columns and indexes which were
+    added to the models after their table was created, has to be called on
+    startup by everything using the database. New columns have to be
+    nullable or have a server default.
+    """
+    # The scrapers may run on a database the web app never upgraded
+    metadata.create_all(engine)
+
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            added = [column for column in table.columns if column.name not in existing]
+
+            for column in added:
+                print(f"Adding column {table.name}.{column.name}")
+                connection.execute(text("ALTER TABLE {table} ADD COLUMN {column}".format(
+                    table=preparer.format_table(table),
+                    column=CreateColumn(column).compile(dialect=engine.dialect)
+                )))
+
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes and _created_on(index, engine.dialect):
+                    print(f"Adding index {index.name}")
+                    index.create(connection)
+
+def upgrade_data(session):
+    """
+    Fills the tables and columns derived from the price history which were
+    added after the prices were written. Has to be called after
+    upgrade_schema on startup
+    """
+    ensure_latest_prices(session)
+    ensure_popularity(session)
+    ensure_statistics(session)
@@ -12,7 +12,8 @@ from sqlalchemy import (
     Sequence,
     Float,
     Table,
-    UniqueConstraint
+    UniqueConstraint,
+    Index
 )
 import datetime
 
@@ -43,12 +44,19 @@ class ProductPage(base):
     shop_id = mapped_column(ForeignKey("shop.id"), primary_key=True)
     shop: Mapped["Shop"] = relationship()
     url = Column(String(255))
+    next_due = Column(DateTime, nullable=True, index=True) # When the price is refreshed next
+    refresh_interval = Column(Float, nullable=True) # Hours between refreshes, adapted to price changes
     
 class Product(base):
     """
     Stores Products identified by their EAN
     """
     __tablename__                       = 'product'
+    __table_args__                      = (
+        # Full-text search, only on MariaDB / MySQL
+        Index("ix_product_fulltext", "name", "description", mysql_prefix="FULLTEXT", mariadb_prefix="FULLTEXT")
+            .ddl_if(dialect=("mysql", "mariadb")),
+    )
     ean_id                              = Column(BIGINT(unsigned=True), primary_key=True)
     name                                = Column(String(255))
     description                         = Column(String(1023), nullable=True)
@@ -56,6 +64,8 @@ class Product(base):
     unit_id                             = mapped_column(ForeignKey("unit.name"))
     unit: Mapped["Unit"]                = relationship()
     image                               = Column(String(255), nullable=True)
+    popularity                          = \
+        Column(Integer, nullable=False, default=0, server_default="0") # Number of price rows, ranks search results
     prices: Mapped[List["Price"]]       = relationship(back_populates="ean")
     alternatives: Mapped[List["Product"]] = relationship(
         secondary=alternatives_table,
@@ -66,9 +76,12 @@ class Product(base):
 
 class Price(base):
     """
-    Stores Prices associated with Products
+    Stores Prices associated with Products.
+    A row covers all observations of the same value in a row: it is valid
+    from date and was seen last at last_seen (only at date if empty)
     """
     __tablename__                       = 'price'
+    __table_args__                      = (Index("ix_price_ean_shop_date", "ean_id", "shop_id", "date"),)
     id: Mapped[int] = \
         mapped_column(primary_key=True)
     ean_id = \
@@ -81,6 +94,35 @@ class Price(base):
     shop: Mapped["Shop"] = relationship(back_populates="prices")
     date = \
         Column(DateTime, default=datetime.datetime.now)
+    last_seen = \
+        Column(DateTime, nullable=True)
+
+class LatestPrice(base):
+    """
+    Stores the latest Price row of every product in every shop, so current
+    prices are looked up without going through the price history. Kept up to
+    date by the BulkWriter and everything else which writes prices
+    """
+    __tablename__                       = 'latestprice'
+    ean_id                              = \
+        Column(BIGINT(unsigned=True), ForeignKey("product.ean_id"), primary_key=True)
+    shop_id: Mapped[int]                = \
+        mapped_column(ForeignKey("shop.id"), primary_key=True)
+    shop: Mapped["Shop"]                = relationship()
+    price_id                            = Column(Integer) # Id of the Price row
+    value                               = Column(Float)
+    date                                = Column(DateTime)
+    last_seen                           = Column(DateTime, nullable=True)
+
+class Statistic(base):
+    """
+    Stores counters of the dashboard statistics, e.g. the number of prices.
+    They are changed by everything which writes the counted rows, so the
+    tables do not have to be counted
+    """
+    __tablename__                       = 'statistic'
+    name                                = Column(String(63), primary_key=True)
+    value                               = Column(BIGINT, default=0)
 
 class Shop(base):
     """
@@ -99,3 +141,44 @@ class Shop(base):
     url                                 = Column(String(255))
     long                                = Column(Float)
     lat                                 = Column(Float)
+
+class ScrapeConfig(base):
+    """
+    Stores the scraper settings of a Shop
+    """
+    __tablename__                       = 'scrapeconfig'
+    shop_id                             = \
+        mapped_column(ForeignKey("shop.id"), primary_key=True)
+    shop: Mapped["Shop"]                = relationship()
+    site                                = Column(String(31), nullable=True) # Name of the scraper plugin
+    rate                                = Column(Float, default=2.0) # Requests per second to start with
+    min_rate                            = Column(Float, default=0.2)
+    max_rate                            = Column(Float, default=10.0)
+    burst                               = Column(Integer, default=1)
+    min_interval                        = Column(Float, default=6.0) # Hours between refreshes of a page
+    max_interval                        = Column(Float, default=336.0)
+    budget                              = Column(Integer, nullable=True) # Pages refreshed per run, unlimited if empty
+
+class ScrapeJob(base):
+    """
+    Stores the queued work of the scraper workers.
+    A job is claimed by a worker for lease seconds and kept as long as the
+    worker renews its lease, jobs of crashed workers become claimable again
+    once their lease expired. Finished jobs are removed.
+    """
+    __tablename__                       = 'scrapejob'
+    __table_args__                      = (Index("ix_scrapejob_claim", "state", "run_after"),)
+    id: Mapped[int]                     = \
+        mapped_column(primary_key=True)
+    shop_id                             = \
+        mapped_column(ForeignKey("shop.id"))
+    shop: Mapped["Shop"]                = relationship()
+    kind                                = Column(String(15)) # "price" refresh of a page or "list" crawl
+    ean_id                              = Column(BIGINT(unsigned=True), nullable=True)
+    url                                 = Column(String(255))
+    state                               = Column(String(15), default="queued") # queued, running or failed
+    attempts                            = Column(Integer, default=0)
+    run_after                           = Column(DateTime, default=datetime.datetime.now)
+    lease_owner                         = Column(String(63), nullable=True)
+    lease_until                         = Column(DateTime, nullable=True)
+    error                               = Column(String(255), nullable=True)
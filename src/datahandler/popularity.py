@@ -0,0 +1,47 @@
+from .models import Product, Price
+from sqlalchemy import select, update, func, bindparam
+
+def add_popularity(session, counts):
+    """
+    Adds the supplied number of new price rows per ean, given as dict, to the
+    popularity of the products. Does not commit
+    """
+    if not counts:
+        return
+
+    product = Product.__table__
+    session.execute(
+        update(product)
+        .where(product.c.ean_id == bindparam("ean"))
+        .values(popularity=product.c.popularity + bindparam("count")),
+        [{"ean": ean_id, "count": count} for ean_id, count in counts.items()]
+    )
+
+def refresh_popularity(session, eans=None):
+    """
+    Recounts the price rows of the supplied products, of all products if
+    eans is None. Has to be called after price rows were removed. Does not
+    commit
+    """
+    count = (
+        select(func.count(Price.id))
+        .where(Price.ean_id == Product.ean_id)
+        .scalar_subquery()
+    )
+
+    stmt = update(Product).values(popularity=count)
+    if eans is not None:
+        stmt = stmt.where(Product.ean_id.in_(list(eans)))
+
+    session.execute(stmt, execution_options={"synchronize_session": False})
+
+def ensure_popularity(session):
+    """
+    Counts the prices of all products if none was counted yet while prices
+    exist, i.e. on the first start after the popularity was added
+    """
+    if session.scalar(select(Product.ean_id).where(Product.popularity > 0).limit(1)) is None and \
+            session.scalar(select(Price.id).limit(1)) is not None:
+        print("Counting prices of all products")
+        refresh_popularity(session)
+        session.commit()
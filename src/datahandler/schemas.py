@@ -30,4 +30,5 @@ class PriceSchema(SQLAlchemySchema):
 
     group = fields.Nested(ShopSchema, attribute="shop", data_key="group")
     x = fields.DateTime(attribute="date")
-    y = fields.Float(attribute="value")
\ No newline at end of file
+    y = fields.Float(attribute="value")
+    last_seen = fields.DateTime()
\ No newline at end of file
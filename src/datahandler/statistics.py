@@ -0,0 +1,131 @@
+from .models import Product, Shop, Price, LatestPrice, Statistic
+from .latest import upsert
+from sqlalchemy import select, update, insert, func, case, bindparam
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from datetime import date, datetime, timedelta
+from time import monotonic
+
+def prices_on(day):
+    """
+    Returns the name of the counter of the prices added on day
+    """
+    return f"prices:{day.isoformat()}"
+
+def count_statistics(session, counts):
+    """
+    Adds the supplied amounts, given as dict of counter name and amount, to
+    the counters. Missing counters are created. Does not commit
+    """
+    counts = {name: amount for name, amount in counts.items() if amount}
+    if not counts:
+        return
+
+    dialect = session.get_bind().dialect.name
+    rows = [{"name": name, "value": amount} for name, amount in counts.items()]
+
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql_insert(Statistic).values(rows)
+        stmt = stmt.on_duplicate_key_update(value=Statistic.value + stmt.inserted.value)
+        session.execute(stmt)
+    elif dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(Statistic).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"value": Statistic.value + stmt.excluded.value}
+        )
+        session.execute(stmt)
+    else:
+        table = Statistic.__table__
+        existing = set(session.scalars(select(Statistic.name).where(Statistic.name.in_(list(counts)))))
+        if existing:
+            session.execute(
+                update(table)
+                .where(table.c.name == bindparam("counter"))
+                .values(value=table.c.value + bindparam("amount")),
+                [{"counter": name, "amount": counts[name]} for name in existing]
+            )
+        if len(existing) < len(rows):
+            session.execute(insert(Statistic), [row for row in rows if row["name"] not in existing])
+
+def refresh_statistics(session):
+    """
+    Recounts the products, shops and prices, e.g. after rows were changed
+    without updating the counters. The prices added per day are kept, they
+    can not be recounted. Does not commit
+    """
+    counts = {
+        "products": session.scalar(select(func.count(Product.ean_id))),
+        "shops": session.scalar(select(func.count(Shop.id))),
+        "prices": session.scalar(select(func.count(Price.id)))
+    }
+
+    upsert(session, Statistic, [{"name": name, "value": value} for name, value in counts.items()], ["name"])
+
+    return counts
+
+def ensure_statistics(session):
+    """
+    Counts the products, shops and prices if they were never counted, i.e.
+    on the first start after the counters were added
+    """
+    if session.get(Statistic, "prices") is None:
+        print("Counting products, shops and prices")
+        refresh_statistics(session)
+        session.commit()
+
+class StatisticsCache:
+    """
+    Serves the dashboard statistics from memory, they are read from the
+    database at most every ttl seconds.
+    The numbers of products, shops and prices and of the prices added today
+    are read from the counters. The shops with a price seen within
+    active and the newest price seen are taken from the latest prices
+    """
+
+    def __init__(self, ttl=60.0, active=timedelta(days=1)):
+        self.ttl = ttl
+        self.active = active
+        self.stats = None
+        self.loaded = None
+
+    def clear(self):
+        self.stats = None
+
+    def get(self, session):
+        """
+        Returns the statistics as dict of counter name and value
+        """
+        if self.stats is None or monotonic() - self.loaded >= self.ttl:
+            self.stats = self._read(session)
+            self.loaded = monotonic()
+
+        return self.stats
+
+    def _read(self, session):
+        today = prices_on(date.today())
+        counters = dict(session.execute(
+            select(Statistic.name, Statistic.value)
+            .where(Statistic.name.in_(["products", "shops", "prices", today]))
+        ).all())
+
+        seen = func.coalesce(LatestPrice.last_seen, LatestPrice.date)
+        active_shops, newest = session.execute(
+            select(
+                func.count(case((seen >= datetime.now() - self.active, LatestPrice.shop_id)).distinct()),
+                func.max(seen)
+            )
+        ).one()
+
+        return {
+            "products": counters.get("products", 0),
+            "shops": counters.get("shops", 0),
+            "prices": counters.get("prices", 0),
+            "prices_today": counters.get(today, 0),
+            "active_shops": active_shops,
+            "newest_price": newest
+        }
+
+# Statistics of this process, served on the dashboard
+STATISTICS = StatisticsCache()
@@ -0,0 +1,256 @@
+from .models import Unit,Product,ProductPage,Price
+from .latest import latest_price_rows, refresh_latest_prices, insert_missing
+from .popularity import add_popularity
+from .autocomplete import AUTOCOMPLETE
+from .statistics import count_statistics, prices_on
+from collections import Counter
+from sqlalchemy import insert, update
+from datetime import datetime
+from time import monotonic
+
+class BulkWriter:
+    """
+    Buffers inserts of units, products, product pages and prices as well as updates
+    of the refresh schedule of product pages and writes them as multi-row
+    statements within a single transaction.
+    The buffer is flushed once max_rows rows are pending, once the oldest
+    pending row is older than max_age seconds or when flush / close is called.
+    Can be used as a context manager which flushes on exit.
+    With change_only a price equal to the current one of the product in that
+    shop does not add a row but only extends the last_seen of the current row.
+    The LatestPrice rows of all products in shops with new prices, the
+    popularity of their products and the statistics counters are updated in
+    the same transaction.
+    If supplied, observer is called with the duration in seconds and the
+    number of rows of every flush. Callables registered with after_commit are
+    called once after the next successful flush.
+    """
+
+    def __init__(self, session, max_rows=500, max_age=30.0, change_only=True, observer=None):
+        self.session = session
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.change_only = change_only
+        self.observer = observer
+        self.units = {}
+        self.products = {}
+        self.pages = {}
+        self.prices = []
+        self.schedules = {}
+        self.callbacks = []
+        self.oldest = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.units) + len(self.products) + len(self.pages) + len(self.prices) + len(self.schedules)
+
+    def has_product(self, ean_id):
+        """
+        Returns True if a product with this ean is waiting to be written
+        """
+        return int(ean_id) in self.products
+
+    def has_page(self, ean_id, shop_id):
+        """
+        Returns True if a product page for this ean and shop is waiting to be
+        written
+        """
+        return (int(ean_id), int(shop_id)) in self.pages
+
+    def add_unit(self, name):
+        """
+        Buffers a new unit
+        """
+        self.units[name] = {"name": name}
+        self._added()
+
+    def add_product(self, ean_id, name, description, amount, unit_id, image=None):
+        """
+        Buffers a new product
+        """
+        self.products[int(ean_id)] = {
+            "ean_id": int(ean_id),
+            "name": name,
+            "description": description,
+            "amount": float(amount),
+            "unit_id": unit_id,
+            "image": image
+        }
+        self._added()
+
+    def add_page(self, ean_id, shop_id, url):
+        """
+        Buffers a new product page
+        """
+        self.pages[(int(ean_id), int(shop_id))] = {
+            "ean_id": int(ean_id),
+            "shop_id": int(shop_id),
+            "url": url
+        }
+        self._added()
+
+    def add_price(self, ean_id, shop_id, value, date=None):
+        """
+        Buffers a new price, the date defaults to now
+        """
+        self.prices.append({
+            "ean_id": int(ean_id),
+            "shop_id": int(shop_id),
+            "value": float(value),
+            "date": date if date else datetime.now(),
+            "last_seen": None
+        })
+        self._added()
+
+    def seen_price(self, ean_id, shop_id, date=None):
+        """
+        Buffers an observation of the current price without knowing its
+        value, e.g. of a page which did not change. Extends the current price
+        of the product in that shop, the date defaults to now
+        """
+        self.prices.append({
+            "ean_id": int(ean_id),
+            "shop_id": int(shop_id),
+            "value": None,
+            "date": date if date else datetime.now(),
+            "last_seen": None
+        })
+        self._added()
+
+    def schedule_page(self, ean_id, shop_id, next_due, refresh_interval):
+        """
+        Buffers an update of when the product page is refreshed next
+        """
+        self.schedules[(int(ean_id), int(shop_id))] = {
+            "ean_id": int(ean_id),
+            "shop_id": int(shop_id),
+            "next_due": next_due,
+            "refresh_interval": refresh_interval
+        }
+        self._added()
+
+    def after_commit(self, callback):
+        """
+        Registers a callable which is called without arguments once the rows
+        buffered so far were committed. It is dropped if the flush fails
+        """
+        self.callbacks.append(callback)
+
+    def _added(self):
+        if self.oldest is None:
+            self.oldest = monotonic()
+
+        if len(self) >= self.max_rows or monotonic() - self.oldest >= self.max_age:
+            self.flush()
+
+    def _current_prices(self, pairs):
+        """
+        Returns the current price row of every (ean, shop) pair as dict
+        """
+        return {
+            pair: {"id": row.id, "value": row.value, "date": row.date, "last_seen": row.last_seen}
+            for pair, row in latest_price_rows(self.session, pairs).items()
+        }
+
+    def _fold_prices(self):
+        """
+        Splits the buffered observations into new price rows and updates of
+        the last_seen of current rows
+        """
+        pairs = {(price["ean_id"], price["shop_id"]) for price in self.prices}
+        current = self._current_prices(pairs) if self.change_only else {}
+
+        inserts = []
+        updates = {}
+        for price in sorted(self.prices, key=lambda price: price["date"]):
+            key = (price["ean_id"], price["shop_id"])
+            row = current.get(key)
+
+            if row and row["value"] is not None and price["date"] >= row["date"] and \
+                    (price["value"] is None or abs(price["value"] - row["value"]) < 0.005):
+                # A backdated observation does not shorten the row
+                last_seen = max(row["last_seen"] or row["date"], price["date"])
+                if last_seen == row["last_seen"]:
+                    continue
+                # Rows inserted by this batch are extended before they are written
+                row["last_seen"] = last_seen
+                if "id" in row:
+                    updates[row["id"]] = {"id": row["id"], "last_seen": last_seen}
+            elif price["value"] is not None:
+                inserts.append(price)
+                if self.change_only:
+                    current[key] = price
+
+        return inserts, list(updates.values())
+
+    def flush(self):
+        """
+        Writes all buffered rows in one transaction. Units and products are
+        written before pages and prices so the foreign keys are satisfied, schedule
+        updates last so they also apply to pages added in this batch
+        """
+        if not len(self):
+            # Everything buffered before was committed already
+            callbacks, self.callbacks = self.callbacks, []
+            for callback in callbacks:
+                callback()
+            return
+
+        start = monotonic()
+        rows_total = len(self)
+        try:
+            prices, seen = self._fold_prices() if self.prices else ([], [])
+            # Other writers (scrapers of other shops or workers) may have
+            # written the same keys since they were checked, which must not
+            # fail the whole batch
+            insert_missing(self.session, Unit, list(self.units.values()), ["name"])
+            products = insert_missing(self.session, Product, list(self.products.values()), ["ean_id"])
+            insert_missing(self.session, ProductPage, list(self.pages.values()), ["ean_id", "shop_id"])
+            if prices:
+                self.session.execute(insert(Price), prices)
+            # Bulk updates by primary key
+            if seen:
+                self.session.execute(update(Price), seen)
+            if self.schedules:
+                self.session.execute(update(ProductPage), list(self.schedules.values()))
+            if prices:
+                add_popularity(self.session, Counter(price["ean_id"] for price in prices))
+            count_statistics(self.session, {
+                "products": products,
+                "prices": len(prices),
+                prices_on(datetime.now().date()): len(prices)
+            })
+            if self.prices:
+                refresh_latest_prices(self.session, {(price["ean_id"], price["shop_id"]) for price in self.prices})
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        else:
+            # Products written by this process are found by the live search
+            # right away
+            for product in self.products.values():
+                AUTOCOMPLETE.add(product["ean_id"], product["name"], product["description"])
+            for callback in self.callbacks:
+                callback()
+            if self.observer:
+                self.observer(monotonic() - start, rows_total)
+        finally:
+            self.units = {}
+            self.products = {}
+            self.pages = {}
+            self.prices = []
+            self.schedules = {}
+            self.callbacks = []
+            self.oldest = None
+
+    def close(self):
+        """
+        Flushes the remaining rows, has to be called on shutdown
+        """
+        self.flush()
@@ -7,7 +7,7 @@ import os
 
 from ui.views import appview
 from ui.api import appapi
-from datahandler import db,init_units
+from datahandler import db,init_units,upgrade_schema,upgrade_data,AUTOCOMPLETE
 
 def run():
     print("Starting...");
@@ -54,6 +54,9 @@ def run():
         
     with app.app_context():
         db.create_all()
+        upgrade_schema(db.engine)
+        upgrade_data(db.session)
+        AUTOCOMPLETE.load(db.engine)
         init_units(db)
 
     # Initialize the units table
@@ -0,0 +1,238 @@
+"""
+Offline benchmark of the scrapers.
+Runs the site plugins against a local stand-in server (see server.py) and an
+isolated SQLite database, so the numbers do not depend on the shops or their
+rate limits. Reports pages per second, parse time per page and database time
+per page for every scenario.
+
+    python src/tools/scraper/bench/benchmark.py --pages 500 --latency 0.05
+"""
+from argparse import ArgumentParser
+from sqlalchemy.orm import sessionmaker
+from time import perf_counter
+import tempfile
+import asyncio
+import sqlalchemy
+import json
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+scraper_dir = os.path.abspath(os.path.join(current_dir,'../'))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
+
+for directory in (scraper_dir, src_dir):
+    if directory not in sys.path:
+        sys.path.append(directory)
+
+from datahandler.models import base, Unit, Shop, ScrapeConfig, Product, ProductPage, Price
+from datahandler.writer import BulkWriter
+from helper.ratelimit import RateLimiter
+from sites import SITES, make_http_client
+from server import StandInServer, make_ean
+
+SHOP_ID = 1
+
+class Stats:
+    """
+    Accumulates the time spent in the parse and database stages of a run
+    """
+
+    def __init__(self):
+        self.parse = 0.0
+        self.db = 0.0
+
+    def timed(self, stage, function):
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                setattr(self, stage, getattr(self, stage) + perf_counter() - start)
+
+        return wrapper
+
+def make_database(path, shop_name, server, pages):
+    """
+    Creates a fresh database containing the shop and pages stored product
+    pages on the stand-in server
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+    base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    db.add(Unit(name="pcs"))
+    db.add(Shop(id=SHOP_ID, name=shop_name, url=server.url))
+    db.add(ScrapeConfig(shop_id=SHOP_ID, site=shop_name))
+    for n in range(pages):
+        db.add(Product(ean_id=make_ean(n), name=f"Product {n}", amount=1, unit_id="pcs"))
+        db.add(ProductPage(ean_id=make_ean(n), shop_id=SHOP_ID, url=server.product_url(shop_name, n)))
+    db.commit()
+
+    return db
+
+def make_client(site, server):
+    """
+    Creates the client for the site. Returns None if the site needs a browser
+    and none is available
+    """
+    if not site.browser:
+        return make_http_client()
+
+    try:
+        # Same profile as in production, only the stand-in server may be loaded
+        return site.make_driver(headless=True, base_url=server.url)
+    except Exception as e:
+        print(f"No browser available for {site.name}: {e}")
+        return None
+
+def instrument(scraper, stats):
+    """
+    Wraps the parse and database stages of the scraper in timers
+    """
+    for method in ("parse_list", "parse_price", "parse_product", "render_price", "fetch_product"):
+        # Http plugins fetch separately from parsing, only browser plugins
+        # parse while fetching and there the whole fetch counts
+        if method == "fetch_product" and not scraper.browser:
+            continue
+        if hasattr(scraper, method):
+            setattr(scraper, method, stats.timed("parse", getattr(scraper, method)))
+
+    for method in ("store_price", "store_product", "seed_frontier"):
+        setattr(scraper, method, stats.timed("db", getattr(scraper, method)))
+    scraper.writer.flush = stats.timed("db", scraper.writer.flush)
+
+    if scraper.browser:
+        # Page loads are network time, not parse time
+        load = scraper.load
+        def untimed_load(url):
+            start = perf_counter()
+            load(url)
+            stats.parse -= perf_counter() - start
+        scraper.load = untimed_load
+
+def run_scenario(args, server, site, scenario):
+    """
+    Runs a single scenario on a fresh database and returns its report
+    """
+    db_path = os.path.join(args.directory, f"{site.name}.sqlite")
+    db = make_database(db_path, site.name, server, 0 if scenario == "populate_from_list" else args.pages)
+    shop = db.query(Shop).filter_by(id=SHOP_ID).first()
+
+    client = make_client(site, server)
+    # Hybrid shops can still be measured on their browserless path
+    if client is None and not getattr(site, "hybrid", False):
+        db.close()
+        return None
+
+    stats = Stats()
+    writer = BulkWriter(db)
+    # Fixed rate, the latencies of a local server are too small for the
+    # adaptive backoff to mean anything
+    limiter = RateLimiter(rate=args.rate, min_rate=args.rate, max_rate=args.rate, burst=args.concurrency)
+    scraper = site(client, db, shop, writer=writer, limiter=limiter)
+    scraper.base_url = server.url
+    instrument(scraper, stats)
+
+    requests, errors = server.requests, server.errors
+    start = perf_counter()
+    try:
+        if scenario == "update_stored":
+            scraper.update_stored(workers=args.workers if site.browser else None)
+        elif scenario == "update_stored_async":
+            asyncio.run(scraper.update_stored_async(concurrency=args.concurrency))
+        elif scenario == "populate_from_list":
+            scraper.populate_from_list(
+                f"{server.url}/{site.name}/list?start=0&count={args.pages}",
+                workers=args.workers if site.browser else None
+            )
+        writer.close()
+    finally:
+        elapsed = perf_counter() - start
+        if site.browser:
+            if client:
+                client.quit()
+            if scraper.session:
+                scraper.session.close()
+        else:
+            client.close()
+
+    pages = server.requests - requests
+    report = {
+        "shop": site.name,
+        "scenario": scenario,
+        "pages": pages,
+        "errors": server.errors - errors,
+        "prices": db.query(Price).count(),
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 1) if elapsed else 0,
+        "parse_ms_per_page": round(stats.parse * 1000 / pages, 3) if pages else 0,
+        "db_ms_per_page": round(stats.db * 1000 / pages, 3) if pages else 0,
+    }
+    db.close()
+
+    return report
+
+def scenarios(site):
+    if site.browser:
+        return ["update_stored"]
+    return ["update_stored", "update_stored_async", "populate_from_list"]
+
+def main():
+    parser = ArgumentParser(description="Benchmark the scrapers against a local stand-in server")
+    parser.add_argument("--shops", nargs="*", default=list(SITES), choices=list(SITES))
+    parser.add_argument("--pages", type=int, default=200, help="product pages per scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="additional random delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 429 / 503 responses")
+    parser.add_argument("--rate", type=float, default=1000.0, help="requests per second allowed by the limiter")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight for the async refresh")
+    parser.add_argument("--workers", type=int, default=None, help="browser processes for selenium shops")
+    parser.add_argument("--directory", default=None, help="where to keep the benchmark databases")
+    parser.add_argument("--json", action="store_true", help="print the reports as json")
+    args = parser.parse_args()
+
+    temporary = None
+    if not args.directory:
+        temporary = tempfile.TemporaryDirectory()
+        args.directory = temporary.name
+    else:
+        os.makedirs(args.directory, exist_ok=True)
+
+    server = StandInServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=(429, 503)
+    ).start()
+
+    reports = []
+    try:
+        for name in args.shops:
+            site = SITES[name]
+            for scenario in scenarios(site):
+                print(f"Running {name} {scenario}")
+                report = run_scenario(args, server, site, scenario)
+                if report is None:
+                    break
+                reports.append(report)
+    finally:
+        server.stop()
+        if temporary:
+            temporary.cleanup()
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    columns = ["shop", "scenario", "pages", "errors", "prices", "seconds",
+               "pages_per_second", "parse_ms_per_page", "db_ms_per_page"]
+    print()
+    print(" | ".join(columns))
+    for report in reports:
+        print(" | ".join(str(report[column]) for column in columns))
+
+if __name__ == "__main__":
+    main()
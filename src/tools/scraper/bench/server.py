@@ -0,0 +1,145 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from threading import Thread, Lock
+from random import Random
+from time import sleep
+import os
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Paragraph repeated to pad product pages to a realistic size
+FILLER = "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.</p>"
+
+def load_fixture(name):
+    with open(os.path.join(fixture_dir, name), encoding="utf-8") as f:
+        return f.read()
+
+def make_ean(n):
+    """
+    Returns a valid EAN-13 for the product number n
+    """
+    digits = str(400000000000 + n)
+    fullsum = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return int(digits + str((10 - fullsum % 10) % 10))
+
+def make_price(n):
+    return 1 + (n * 37 % 10000) / 100
+
+class StandInServer:
+    """
+    Local stand-in for the shops serving the recorded pages in fixtures/.
+    Product pages are generated from the fixture of the shop for any product
+    number under /<shop>/p/<n>, listings under /<shop>/list?start=&count=.
+    Every response can be delayed by latency seconds (plus up to jitter
+    seconds) and a share of error_rate responses is answered with one of
+    error_status instead.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=(503,), filler=100, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.filler = "\n".join([FILLER] * filler)
+        self.random = Random(seed)
+        self.lock = Lock()
+        self.requests = 0
+        self.errors = 0
+        self.fixtures = {
+            name.rpartition(".")[0]: load_fixture(name) for name in os.listdir(fixture_dir)
+        }
+        self.httpd = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def product_url(self, shop, n):
+        return f"{self.url}/{shop}/p/{n}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, with Nagle every keep
+            # alive response would wait for a delayed ack
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def render_product(self, shop, n):
+        price = make_price(n)
+
+        return self.fixtures[f"{shop}_product"] \
+            .replace("{n}", str(n)) \
+            .replace("{ean}", str(make_ean(n))) \
+            .replace("{price_dot}", f"{price:.2f}") \
+            .replace("{price}", f"{price:.2f}".replace(".", ",")) \
+            .replace("{filler}", self.filler)
+
+    def render_list(self, shop, start, count):
+        item = self.fixtures[f"{shop}_list_item"]
+        products = "".join(
+            item.replace("{n}", str(n)).replace("{url}", self.product_url(shop, n))
+            for n in range(start, start + count)
+        )
+
+        return self.fixtures[f"{shop}_list"].replace("{products}", products)
+
+    def handle(self, request):
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + self.random.random() * self.jitter
+            failed = self.random.random() < self.error_rate
+            status = self.random.choice(self.error_status)
+            if failed:
+                self.errors += 1
+
+        if delay:
+            sleep(delay)
+
+        url = urlparse(request.path)
+        parts = url.path.strip("/").split("/")
+        query = parse_qs(url.query)
+
+        body = None
+        try:
+            if len(parts) == 3 and parts[1] == "p":
+                body = self.render_product(parts[0], int(parts[2]))
+            elif len(parts) == 2 and parts[1] == "list":
+                body = self.render_list(
+                    parts[0],
+                    int(query.get("start", ["0"])[0]),
+                    int(query.get("count", ["100"])[0])
+                )
+            elif len(parts) == 1:
+                body = "<html><body>Stand-in</body></html>"
+        except (KeyError, ValueError):
+            body = None
+
+        if body is None:
+            status, body = 404, "Not Found"
+        elif not failed:
+            status = 200
+
+        data = body.encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "text/html; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
@@ -0,0 +1,112 @@
+from hashlib import sha256
+from time import time
+import sqlite3
+import zlib
+import os
+
+def object_path(path, digest):
+    """
+    Returns where the body with the supplied digest is stored in the archive
+    at path
+    """
+    return os.path.join(path, "objects", digest[:2], digest[2:])
+
+def load_object(path, digest):
+    """
+    Returns the body with the supplied digest from the archive at path
+    """
+    with open(object_path(path, digest), "rb") as f:
+        return zlib.decompress(f.read()).decode()
+
+class PageArchive:
+    """
+    Compressed archive of fetched page bodies.
+    Bodies are stored content addressed, zlib compressed under the sha256 of
+    the body, so a page which did not change between fetches is stored once.
+    An index in SQLite records every fetch by shop, url and time together with
+    the kind of page ("price" or "product") and the digest of its body.
+    Index rows are committed every checkpoint fetches and on close.
+    Only pages read with plain requests are archived: all pages of
+    HttpScraper plugins (Reichelt) and the price pages hybrid plugins
+    (Conrad) read without the browser. Rendered pages depend on the state of
+    the browser and have no offline parser, so they are not archived.
+    """
+
+    def __init__(self, path=".scraper/archive", level=6, checkpoint=50):
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+
+        self.path = path
+        self.level = level
+        self.checkpoint = checkpoint
+        self.pending_changes = 0
+        self.connection = sqlite3.connect(os.path.join(path, "index.sqlite"), timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS page ("
+            "shop INTEGER, site TEXT, url TEXT, fetched_at REAL, kind TEXT, digest TEXT)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_page_fetch ON page (shop, url, fetched_at)"
+        )
+        self.connection.commit()
+
+    def store(self, shop_id, site, url, kind, text, fetched_at=None):
+        """
+        Archives the body of a fetched page, returns its digest
+        """
+        body = text.encode()
+        digest = sha256(body).hexdigest()
+
+        path = object_path(self.path, digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name so a crash never leaves a
+            # truncated object behind
+            with open(f"{path}.{os.getpid()}.tmp", "wb") as f:
+                f.write(zlib.compress(body, self.level))
+            os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+        self.connection.execute(
+            "INSERT INTO page (shop, site, url, fetched_at, kind, digest) VALUES (?, ?, ?, ?, ?, ?)",
+            (shop_id, site, url, fetched_at if fetched_at else time(), kind, digest)
+        )
+        self.pending_changes += 1
+        if self.pending_changes >= self.checkpoint:
+            self.commit()
+
+        return digest
+
+    def load(self, digest):
+        """
+        Returns the archived body with the supplied digest
+        """
+        return load_object(self.path, digest)
+
+    def fetches(self, shop_ids=None, since=None, until=None):
+        """
+        Returns the indexed fetches as (shop, site, url, fetched_at, kind,
+        digest), ordered by shop, url and time. Optionally only those of some
+        shops and within a time span given as unix timestamps
+        """
+        query = "SELECT shop, site, url, fetched_at, kind, digest FROM page WHERE 1 = 1"
+        params = []
+        if shop_ids:
+            query += f" AND shop IN ({', '.join('?' * len(shop_ids))})"
+            params += list(shop_ids)
+        if since is not None:
+            query += " AND fetched_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND fetched_at < ?"
+            params.append(until)
+
+        return self.connection.execute(query + " ORDER BY shop, url, fetched_at", params)
+
+    def commit(self):
+        self.connection.commit()
+        self.pending_changes = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
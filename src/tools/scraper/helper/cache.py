@@ -0,0 +1,96 @@
+from hashlib import sha256
+import sqlite3
+import os
+
+class ResponseCache:
+    """
+    Persistent cache of the validators of previously fetched pages, keyed by
+    their url. It is used to send conditional requests and to recognize pages
+    whose content did not change since they were processed last.
+    Only the ETag, Last-Modified and a hash of the body are stored, not the
+    body itself.
+    """
+
+    def __init__(self, path=".scraper/cache.sqlite"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS response ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, digest BLOB)"
+        )
+
+    def _get(self, url):
+        return self.connection.execute(
+            "SELECT etag, last_modified, digest FROM response WHERE url = ?", (url,)
+        ).fetchone()
+
+    def headers(self, url):
+        """
+        Returns the headers turning a request to url into a conditional one
+        """
+        entry = self._get(url)
+
+        headers = {}
+        if entry:
+            if entry[0]:
+                headers["if-none-match"] = entry[0]
+            if entry[1]:
+                headers["if-modified-since"] = entry[1]
+
+        return headers
+
+    def unchanged(self, url, response):
+        """
+        Returns True if the response is a 304 or its body is identical to the
+        one stored last for url
+        """
+        if response.status_code == 304:
+            return True
+
+        entry = self._get(url)
+
+        return bool(entry) and response.status_code < 400 and \
+            entry[2] == sha256(response.content).digest()
+
+    def entry(self, url, response):
+        """
+        Returns the validators and body hash of a successfully processed
+        response for store_entry, None if it is not worth remembering
+        """
+        if response.status_code >= 300:
+            return None
+
+        return (
+            url,
+            response.headers.get("etag"),
+            response.headers.get("last-modified"),
+            sha256(response.content).digest()
+        )
+
+    def store_entry(self, entry):
+        """
+        Remembers an entry returned by entry
+        """
+        if entry is None:
+            return
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO response (url, etag, last_modified, digest) VALUES (?, ?, ?, ?)",
+            entry
+        )
+        self.connection.commit()
+
+    def store(self, url, response):
+        """
+        Remembers the validators and body hash of a successfully processed
+        response
+        """
+        self.store_entry(self.entry(url, response))
+
+    def close(self):
+        self.connection.close()
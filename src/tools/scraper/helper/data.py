@@ -1,6 +1,4 @@
-from sqlalchemy import or_, func, select, asc
-from sqlalchemy.sql import text
-from sqlalchemy.exc import OperationalError
+from sqlalchemy import and_, or_, func, select
 import os,sys
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -9,54 +7,82 @@ src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
 if src_dir not in sys.path:
     sys.path.append(src_dir)
 
-from datahandler.models import Price, Shop
+from datahandler.models import LatestPrice, ProductPage
+from datetime import datetime, timedelta
 
-def get_latest_prices(db, ean):
+def _scheduled_pages(shop_id):
     """
-    Gets latest associated prices of the given product
+    Returns the select of the product pages of the given shop with their
+    schedule and their latest price in that shop
     """
-
-    # The following SQL Statement gets the latest price of a product for each shop
-    """
-    WITH found_prices AS (
-	    SELECT price.value AS value, shop.name AS name, ROW_NUMBER() OVER(PARTITION BY shop.id ORDER BY price.date DESC) AS row_number
-	    FROM price
-	    INNER JOIN shop
-	    ON price.shop_id=shop.id
-	    WHERE price.ean_id=4316268629836
-    )
-    SELECT value, name
-    FROM found_prices
-    WHERE row_number = 1;
-    """
-
-    found_prices = (
+    latest = (
         select(
-            Price.value.label('value'),
-            Price.date.label('date'),
-            Shop.name.label('name'),
-            Shop.id.label('shop_id'),
-            func.row_number().over(
-                partition_by=Shop.id,
-                order_by=Price.date.desc()
-            ).label('row_number')
+            LatestPrice.ean_id.label('ean_id'),
+            LatestPrice.value.label('value'),
+            func.coalesce(LatestPrice.last_seen, LatestPrice.date).label('date')
         )
-        .join(Shop, Price.shop_id == Shop.id)
-        .where(Price.ean_id == ean)
-        .cte('found_prices')
+        .where(LatestPrice.shop_id == shop_id)
+        .subquery('latest')
     )
 
     stmt = (
         select(
-            found_prices.c.value,
-            found_prices.c.name,
-            found_prices.c.date,
-            found_prices.c.shop_id,
+            ProductPage.ean_id,
+            ProductPage.url,
+            ProductPage.next_due,
+            ProductPage.refresh_interval,
+            latest.c.value,
+            latest.c.date
         )
-        .where(found_prices.c.row_number == 1)
-        .order_by(asc(found_prices.c.value))
+        .outerjoin(latest, latest.c.ean_id == ProductPage.ean_id)
+        .where(ProductPage.shop_id == shop_id)
     )
 
-    result = db.execute(stmt).all()
+    return stmt, latest
+
+def get_due_pages(db, shop_id, now=None, default=timedelta(hours=24)):
+    """
+    Gets the product pages of the given shop which are due for a refresh
+    together with their latest price in that shop. Pages which were never
+    scheduled are due once their latest price is older than default.
+    """
+
+    # The following SQL Statement is generated
+    """
+    SELECT productpage.ean_id, productpage.url, productpage.next_due,
+        productpage.refresh_interval, latest.value, latest.date
+    FROM productpage
+    LEFT OUTER JOIN (
+        SELECT latestprice.ean_id AS ean_id, latestprice.value AS value,
+            COALESCE(latestprice.last_seen, latestprice.date) AS date
+        FROM latestprice
+        WHERE latestprice.shop_id=15
+    ) AS latest
+    ON latest.ean_id=productpage.ean_id
+    WHERE productpage.shop_id=15 AND (productpage.next_due <= :now OR (
+        productpage.next_due IS NULL AND (latest.date IS NULL OR latest.date < :cutoff)
+    ));
+    """
+
+    now = now if now else datetime.now()
+
+    stmt, latest = _scheduled_pages(shop_id)
+    stmt = stmt.where(or_(
+        ProductPage.next_due <= now,
+        and_(
+            ProductPage.next_due == None,
+            or_(latest.c.date == None, latest.c.date < now - default)
+        )
+    ))
+
+    return db.execute(stmt).all()
+
+def get_scheduled_pages(db, shop_id, eans):
+    """
+    Gets the supplied product pages of the given shop together with their
+    latest price in that shop, regardless of whether they are due
+    """
+    stmt, latest = _scheduled_pages(shop_id)
+    stmt = stmt.where(ProductPage.ean_id.in_(eans))
 
-    return result
\ No newline at end of file
+    return db.execute(stmt).all()
@@ -0,0 +1,57 @@
+from selenium import webdriver
+from urllib.parse import quote
+
+# Proxy every blocked request is sent to, nothing listens on the discard port
+# so the request fails immediately
+BLACKHOLE = "PROXY 127.0.0.1:9"
+
+def make_pac(hosts):
+    """
+    Returns a proxy auto-config script letting requests to the supplied
+    domains (and their subdomains) through and sending everything else to
+    BLACKHOLE
+    """
+    conditions = " || ".join(
+        f'host == "{host}" || dnsDomainIs(host, ".{host}")' for host in hosts
+    )
+
+    return (
+        "function FindProxyForURL(url, host) {"
+        f"if ({conditions}) return \"DIRECT\";"
+        f"return \"{BLACKHOLE}\";"
+        "}"
+    )
+
+def make_driver(headless=True, hosts=None):
+    """
+    Creates a Firefox driver tuned for scraping. Pages are handed over as soon
+    as the DOM is ready, images, media and web fonts are not loaded at all
+    and if hosts is given requests to all other hosts (trackers, ads, third
+    party widgets) are blocked.
+    """
+    options = webdriver.FirefoxOptions()
+    if headless:
+        options.add_argument("-headless")
+
+    # Return from get() on DOMContentLoaded instead of the load event,
+    # elements we need are waited for explicitly
+    options.page_load_strategy = "eager"
+
+    # Images, media and fonts
+    options.set_preference("permissions.default.image", 2)
+    options.set_preference("media.autoplay.default", 5)
+    options.set_preference("media.mediasource.enabled", False)
+    options.set_preference("media.video_stats.enabled", False)
+    options.set_preference("gfx.downloadable_fonts.enabled", False)
+
+    # Trackers known to Firefox are blocked in any case
+    options.set_preference("privacy.trackingprotection.enabled", True)
+
+    if hosts:
+        options.set_preference("network.proxy.type", 2)
+        options.set_preference(
+            "network.proxy.autoconfig_url",
+            "data:application/x-ns-proxy-autoconfig," + quote(make_pac(hosts))
+        )
+
+    return webdriver.Firefox(options=options)
@@ -0,0 +1,161 @@
+from hashlib import blake2b
+from time import time
+import sqlite3
+import os
+
+def normalize(url):
+    """
+    Strips the query from an url, product pages are stored without it too
+    """
+    return url.partition("?")[0]
+
+def url_key(url):
+    """
+    Returns a compact 64 bit key for the normalized url
+    """
+    digest = blake2b(normalize(url).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+class Frontier:
+    """
+    Persistent queue of product urls to crawl for a single shop.
+    Every url ever added is remembered by a 64 bit hash so it is only queued
+    once, no matter in how many listings it appears. Pending urls survive a
+    crash and are resumed by the next run. Changes are committed every
+    checkpoint operations and on close.
+    Also remembers when the shop was last discovered from a source such as
+    its sitemaps.
+    """
+
+    def __init__(self, shop_id, path=".scraper/frontier.sqlite", checkpoint=25):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.shop_id = shop_id
+        self.checkpoint = checkpoint
+        self.pending_changes = 0
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            "shop INTEGER, key INTEGER, PRIMARY KEY (shop, key)) WITHOUT ROWID"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS queue ("
+            "shop INTEGER, url TEXT, added REAL, PRIMARY KEY (shop, url))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS discovery ("
+            "shop INTEGER, source TEXT, last_run REAL, PRIMARY KEY (shop, source))"
+        )
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM queue WHERE shop = ?", (self.shop_id,)
+        ).fetchone()[0]
+
+    def _changed(self, count=1):
+        self.pending_changes += count
+        if self.pending_changes >= self.checkpoint:
+            self.commit()
+
+    def seed(self, urls):
+        """
+        Marks urls as seen without queueing them, used for already known
+        product pages
+        """
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO seen (shop, key) VALUES (?, ?)",
+            ((self.shop_id, url_key(url)) for url in urls)
+        )
+        self.commit()
+
+    def add(self, urls):
+        """
+        Queues all urls which have not been seen before.
+        Returns the number of newly queued urls
+        """
+        added = 0
+        for url in urls:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO seen (shop, key) VALUES (?, ?)",
+                (self.shop_id, url_key(url))
+            )
+            if cursor.rowcount:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO queue (shop, url, added) VALUES (?, ?, ?)",
+                    (self.shop_id, url, time())
+                )
+                added += 1
+
+        self._changed(added)
+        return added
+
+    def requeue(self, urls):
+        """
+        Queues urls whether they have been seen before or not, e.g. pages
+        which changed since they were crawled. Returns the number of queued
+        urls
+        """
+        queued = 0
+        for url in urls:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO seen (shop, key) VALUES (?, ?)",
+                (self.shop_id, url_key(url))
+            )
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO queue (shop, url, added) VALUES (?, ?, ?)",
+                (self.shop_id, url, time())
+            )
+            queued += cursor.rowcount
+
+        self._changed(queued)
+        return queued
+
+    def last_discovery(self, source):
+        """
+        Returns the unix timestamp of the last complete discovery from source
+        or None
+        """
+        row = self.connection.execute(
+            "SELECT last_run FROM discovery WHERE shop = ? AND source = ?", (self.shop_id, source)
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def discovered(self, source, timestamp):
+        """
+        Records a complete discovery from source which started at timestamp
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO discovery (shop, source, last_run) VALUES (?, ?, ?)",
+            (self.shop_id, source, timestamp)
+        )
+        self.commit()
+
+    def pending(self):
+        """
+        Returns all queued urls, oldest first
+        """
+        return [row[0] for row in self.connection.execute(
+            "SELECT url FROM queue WHERE shop = ? ORDER BY added", (self.shop_id,)
+        )]
+
+    def done(self, url):
+        """
+        Removes a crawled url from the queue
+        """
+        self.connection.execute(
+            "DELETE FROM queue WHERE shop = ? AND url = ?", (self.shop_id, url)
+        )
+        self._changed()
+
+    def commit(self):
+        self.connection.commit()
+        self.pending_changes = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
@@ -0,0 +1,234 @@
+from sqlalchemy import select, update, delete, insert, and_, or_
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from random import uniform
+import threading
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
+
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from datahandler.models import ScrapeJob
+
+# Dialects supporting SELECT ... FOR UPDATE SKIP LOCKED
+SKIP_LOCKED_DIALECTS = ("mysql", "mariadb", "postgresql")
+
+class JobQueue:
+    """
+    Queue of scrape jobs shared by any number of worker processes and hosts
+    through the scrapejob table.
+    Jobs are claimed atomically: with SELECT ... FOR UPDATE SKIP LOCKED on
+    MariaDB, with a conditional UPDATE per job elsewhere (SQLite). A claim is
+    a lease of lease seconds which the owner renews (see leased), jobs of
+    a worker which stopped renewing are claimed by others once it expired.
+    Failed jobs are retried with exponential backoff up to max_attempts
+    times.
+    """
+
+    def __init__(self, db, owner, lease=300, max_attempts=5, backoff=60, max_backoff=6 * 3600):
+        self.db = db
+        self.owner = owner
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.skip_locked = db.get_bind().dialect.name in SKIP_LOCKED_DIALECTS
+
+    def enqueue(self, shop_id, kind, jobs):
+        """
+        Queues jobs given as (ean, url) tuples unless a job for the same url
+        is already open. Returns the number of queued jobs
+        """
+        jobs = dict(((url, ean_id) for ean_id, url in jobs))
+        if not jobs:
+            return 0
+
+        open_urls = set(self.db.scalars(
+            select(ScrapeJob.url)
+            .where(ScrapeJob.shop_id == shop_id, ScrapeJob.kind == kind)
+            .where(ScrapeJob.state.in_(("queued", "running")))
+        ))
+
+        now = datetime.now()
+        rows = [
+            {"shop_id": shop_id, "kind": kind, "ean_id": ean_id, "url": url,
+             "state": "queued", "attempts": 0, "run_after": now}
+            for url, ean_id in jobs.items() if url not in open_urls
+        ]
+
+        if rows:
+            self.db.execute(insert(ScrapeJob), rows)
+        self.db.commit()
+
+        return len(rows)
+
+    def _claimable(self, now):
+        return or_(
+            and_(ScrapeJob.state == "queued", ScrapeJob.run_after <= now),
+            and_(
+                ScrapeJob.state == "running",
+                ScrapeJob.lease_until < now,
+                ScrapeJob.attempts < self.max_attempts
+            )
+        )
+
+    def expire(self):
+        """
+        Marks jobs as failed whose workers died on every attempt
+        """
+        self.db.execute(
+            update(ScrapeJob)
+            .where(
+                ScrapeJob.state == "running",
+                ScrapeJob.lease_until < datetime.now(),
+                ScrapeJob.attempts >= self.max_attempts
+            )
+            .values(state="failed", lease_owner=None, lease_until=None, error="Lease expired")
+        )
+        self.db.commit()
+
+    def claim(self, shop_ids=None, limit=10):
+        """
+        Claims up to limit jobs of the supplied shops (all if None), oldest
+        first. Returns the claimed jobs as rows
+        """
+        now = datetime.now()
+
+        stmt = (
+            select(ScrapeJob.id)
+            .where(self._claimable(now))
+            .order_by(ScrapeJob.run_after)
+            .limit(limit)
+        )
+        if shop_ids:
+            stmt = stmt.where(ScrapeJob.shop_id.in_(shop_ids))
+
+        claim = {
+            "state": "running",
+            "lease_owner": self.owner,
+            "lease_until": now + timedelta(seconds=self.lease),
+            "attempts": ScrapeJob.attempts + 1
+        }
+
+        try:
+            if self.skip_locked:
+                # Rows locked by other workers are skipped, the ones found are
+                # ours until the commit
+                ids = self.db.scalars(stmt.with_for_update(skip_locked=True)).all()
+                if ids:
+                    self.db.execute(update(ScrapeJob).where(ScrapeJob.id.in_(ids)).values(**claim))
+            else:
+                # Without row locks every job is claimed by an update which
+                # only succeeds if nobody else claimed it in the meantime
+                ids = []
+                for job_id in self.db.scalars(stmt).all():
+                    result = self.db.execute(
+                        update(ScrapeJob)
+                        .where(ScrapeJob.id == job_id, self._claimable(now))
+                        .values(**claim)
+                    )
+                    if result.rowcount:
+                        ids.append(job_id)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        if not ids:
+            return []
+
+        return self.db.execute(
+            select(
+                ScrapeJob.id,
+                ScrapeJob.shop_id,
+                ScrapeJob.kind,
+                ScrapeJob.ean_id,
+                ScrapeJob.url,
+                ScrapeJob.attempts
+            )
+            .where(ScrapeJob.id.in_(ids))
+            .order_by(ScrapeJob.run_after)
+        ).all()
+
+    def heartbeat(self, jobs, session=None):
+        """
+        Renews the lease of the supplied jobs, using session instead of the
+        session of the queue if supplied
+        """
+        if not jobs:
+            return
+
+        session = session if session is not None else self.db
+        session.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id.in_([job.id for job in jobs]), ScrapeJob.lease_owner == self.owner)
+            .values(lease_until=datetime.now() + timedelta(seconds=self.lease))
+        )
+        session.commit()
+
+    @contextmanager
+    def leased(self, jobs, interval=None):
+        """
+        Renews the lease of the supplied jobs every interval seconds (a third
+        of the lease by default) while the block runs, so none of them
+        expires however long a single job takes. Jobs completed or failed in
+        the meantime are not ours anymore and left alone. The leases are
+        renewed by a thread with a session of its own
+        """
+        interval = interval if interval else self.lease / 3
+        stopped = threading.Event()
+
+        def renew():
+            with Session(self.db.get_bind()) as session:
+                while not stopped.wait(interval):
+                    try:
+                        self.heartbeat(jobs, session)
+                    except Exception as e:
+                        session.rollback()
+                        print(f"Could not renew the leases: {e}")
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def complete(self, jobs):
+        """
+        Removes finished jobs
+        """
+        if not jobs:
+            return
+
+        self.db.execute(
+            delete(ScrapeJob)
+            .where(ScrapeJob.id.in_([job.id for job in jobs]), ScrapeJob.lease_owner == self.owner)
+        )
+        self.db.commit()
+
+    def fail(self, job, error):
+        """
+        Requeues a failed job after a backoff, or marks it as failed for good
+        once it ran out of attempts
+        """
+        if job.attempts >= self.max_attempts:
+            values = {"state": "failed"}
+        else:
+            delay = min(self.max_backoff, self.backoff * 2 ** (job.attempts - 1))
+            values = {
+                "state": "queued",
+                "run_after": datetime.now() + timedelta(seconds=delay * uniform(0.8, 1.2))
+            }
+
+        self.db.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id == job.id, ScrapeJob.lease_owner == self.owner)
+            .values(lease_owner=None, lease_until=None, error=str(error)[:255], **values)
+        )
+        self.db.commit()
@@ -0,0 +1,84 @@
+from sqlalchemy import select
+from time import monotonic
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
+
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from datahandler.models import Product, ProductPage, Unit
+
+class KnownRows:
+    """
+    In memory copy of the keys of the stored products, product pages and
+    units, so the scraper does not have to ask the database whether a row
+    exists before writing it.
+    Products and units are loaded with the first check, the pages of a shop
+    with the first check for that shop. Rows buffered by the scraper are
+    added with add_product / add_page / add_unit. If max_age is set,
+    everything is loaded again once it is older than max_age seconds, which
+    picks up rows written by other processes.
+    """
+
+    def __init__(self, db, max_age=None):
+        self.db = db
+        self.max_age = max_age
+        self.clear()
+
+    def clear(self):
+        """
+        Forgets all keys, they are loaded again when needed
+        """
+        self.products = None
+        self.units = None
+        self.pages = {} # shop id -> {ean: url}
+        self.loaded = None
+
+    def _fresh(self):
+        if self.loaded is not None and self.max_age is not None and monotonic() - self.loaded > self.max_age:
+            self.clear()
+        if self.loaded is None:
+            self.loaded = monotonic()
+
+    def _load(self):
+        self._fresh()
+        if self.products is None:
+            self.products = set(self.db.scalars(select(Product.ean_id)))
+            self.units = set(self.db.scalars(select(Unit.name)))
+
+    def shop_pages(self, shop_id):
+        """
+        Returns the product pages of a shop as dict of ean to url
+        """
+        self._fresh()
+        shop_id = int(shop_id)
+        if shop_id not in self.pages:
+            self.pages[shop_id] = dict(self.db.execute(
+                select(ProductPage.ean_id, ProductPage.url).where(ProductPage.shop_id == shop_id)
+            ).all())
+
+        return self.pages[shop_id]
+
+    def has_product(self, ean_id):
+        self._load()
+        return int(ean_id) in self.products
+
+    def add_product(self, ean_id):
+        self._load()
+        self.products.add(int(ean_id))
+
+    def has_unit(self, name):
+        self._load()
+        return name in self.units
+
+    def add_unit(self, name):
+        self._load()
+        self.units.add(name)
+
+    def has_page(self, ean_id, shop_id):
+        return int(ean_id) in self.shop_pages(shop_id)
+
+    def add_page(self, ean_id, shop_id, url):
+        self.shop_pages(shop_id)[int(ean_id)] = url
@@ -0,0 +1,168 @@
+from contextlib import contextmanager
+from datetime import datetime
+from time import monotonic, time
+import json
+import os
+
+# Upper bounds of the histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Set SCRAPER_LOG=json to get one JSON object per log line
+LOG_FORMAT = os.environ.get("SCRAPER_LOG") if os.environ.get("SCRAPER_LOG") else "text"
+
+def log(message, **fields):
+    """
+    Prints a progress message. In json mode the message is printed together
+    with its fields as a single JSON object instead
+    """
+    if LOG_FORMAT == "json":
+        print(json.dumps({"time": datetime.now().isoformat(), "message": message, **fields}, default=str), flush=True)
+    else:
+        print(message)
+
+class Histogram:
+    """
+    Cumulative histogram of durations in seconds
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """
+    Timings and counters of a scraper process.
+    Durations are collected per shop and stage (fetch, render, parse, query,
+    db) in histograms, events (unchanged pages, errors, stored prices, ...)
+    and response status classes per shop in counters. The collected values
+    are written as Prometheus text or JSON with write.
+    """
+
+    def __init__(self):
+        self.stages = {} # (shop, stage) -> Histogram
+        self.events = {} # (shop, event) -> count
+        self.responses = {} # (shop, status class) -> count
+        self.started = time()
+
+    def observe(self, stage, seconds, shop=""):
+        """
+        Records the duration of a stage
+        """
+        key = (shop, stage)
+        if key not in self.stages:
+            self.stages[key] = Histogram()
+        self.stages[key].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, shop=""):
+        """
+        Records the duration of the enclosed block
+        """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, monotonic() - start, shop=shop)
+
+    def count(self, event, shop="", amount=1):
+        """
+        Counts an event
+        """
+        self.events[(shop, event)] = self.events.get((shop, event), 0) + amount
+
+    def response(self, status_code, shop=""):
+        """
+        Counts a response by its status class (2xx, 3xx, 4xx, 5xx)
+        """
+        key = (shop, f"{status_code // 100}xx")
+        self.responses[key] = self.responses.get(key, 0) + 1
+
+    def to_dict(self):
+        return {
+            "started": self.started,
+            "finished": time(),
+            "stages": [
+                {
+                    "shop": shop,
+                    "stage": stage,
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(zip(map(str, histogram.buckets), histogram.counts))
+                }
+                for (shop, stage), histogram in sorted(self.stages.items())
+            ],
+            "events": [
+                {"shop": shop, "event": event, "count": count}
+                for (shop, event), count in sorted(self.events.items())
+            ],
+            "responses": [
+                {"shop": shop, "class": status, "count": count}
+                for (shop, status), count in sorted(self.responses.items())
+            ]
+        }
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP scraper_stage_seconds Time spent in each stage of the scraper, per page or per database flush",
+            "# TYPE scraper_stage_seconds histogram"
+        ]
+        for (shop, stage), histogram in sorted(self.stages.items()):
+            labels = f'shop="{shop}",stage="{stage}"'
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'scraper_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'scraper_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'scraper_stage_seconds_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'scraper_stage_seconds_count{{{labels}}} {histogram.count}')
+
+        lines.append("# HELP scraper_events_total Pages skipped, failed or stored by the scraper")
+        lines.append("# TYPE scraper_events_total counter")
+        for (shop, event), count in sorted(self.events.items()):
+            lines.append(f'scraper_events_total{{shop="{shop}",event="{event}"}} {count}')
+
+        lines.append("# HELP scraper_responses_total Responses of the shops by status class")
+        lines.append("# TYPE scraper_responses_total counter")
+        for (shop, status), count in sorted(self.responses.items()):
+            lines.append(f'scraper_responses_total{{shop="{shop}",class="{status}"}} {count}')
+
+        lines.append("# HELP scraper_last_run_timestamp_seconds When the metrics were written")
+        lines.append("# TYPE scraper_last_run_timestamp_seconds gauge")
+        lines.append(f"scraper_last_run_timestamp_seconds {time()}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes the metrics to path, as JSON if it ends with .json and as
+        Prometheus text otherwise. The file is replaced atomically so
+        collectors never read a partial file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path + ".tmp", "w") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+        os.replace(path + ".tmp", path)
+
+# Metrics of this process
+METRICS = Metrics()
+
+def metrics_path(name):
+    """
+    Returns where the metrics of the run called name are written to
+    """
+    path = os.environ.get("SCRAPER_METRICS") if os.environ.get("SCRAPER_METRICS") else ".scraper/metrics/{name}.prom"
+
+    return path.format(name=name)
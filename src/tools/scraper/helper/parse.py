@@ -0,0 +1,167 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from html.parser import HTMLParser
+import json
+import re
+import os
+
+# Tree builder used for BeautifulSoup. lxml is considerably faster than the
+# pure python parser and is used whenever it is installed. Can be overridden
+# by setting SCRAPER_PARSER to any tree builder known to BeautifulSoup.
+try:
+    import lxml
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+if os.environ.get("SCRAPER_PARSER"):
+    PARSER = os.environ.get("SCRAPER_PARSER")
+
+# Size of the chunks fed into the streaming extractor
+CHUNK_SIZE = 16384
+
+# Embedded JSON-LD blocks, schema.org structured data
+LD_JSON = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE
+)
+
+def make_soup(text, ids=None):
+    """
+    Builds a BeautifulSoup tree of the supplied document using the configured
+    parser. If ids is given only the elements with those ids and their
+    descendants are added to the tree.
+    """
+    strainer = SoupStrainer(id=ids) if ids else None
+
+    return BeautifulSoup(text, PARSER, parse_only=strainer)
+
+class _Found(Exception):
+    pass
+
+class StreamExtractor(HTMLParser):
+    """
+    Collects the text of the first element with the supplied tag and
+    attributes without building a document tree. Parsing is aborted as soon
+    as the element is closed.
+    A class attribute matches if it contains the supplied class.
+    """
+
+    def __init__(self, tag, attrs):
+        super().__init__(convert_charrefs=True)
+        self.tag = tag
+        self.attrs = attrs
+        self.depth = 0
+        self.text = []
+
+    def _matches(self, attrs):
+        attrs = dict(attrs)
+        for name, value in self.attrs.items():
+            if name == "class":
+                if value not in (attrs.get("class") or "").split():
+                    return False
+            elif attrs.get(name) != value:
+                return False
+        return True
+
+    def handle_starttag(self, tag, attrs):
+        if tag != self.tag:
+            return
+        if self.depth:
+            self.depth += 1
+        elif self._matches(attrs):
+            self.depth = 1
+
+    def handle_endtag(self, tag):
+        if self.depth and tag == self.tag:
+            self.depth -= 1
+            if not self.depth:
+                raise _Found()
+
+    def handle_data(self, data):
+        if self.depth:
+            self.text.append(data)
+
+def extract_text(text, tag, **attrs):
+    """
+    Returns the text content of the first element matching tag and attrs or
+    None if there is none. Use class_ to match on the class attribute.
+    """
+    if "class_" in attrs:
+        attrs["class"] = attrs.pop("class_")
+
+    extractor = StreamExtractor(tag, attrs)
+
+    try:
+        for i in range(0, len(text), CHUNK_SIZE):
+            extractor.feed(text[i:i + CHUNK_SIZE])
+        extractor.close()
+    except _Found:
+        return "".join(extractor.text)
+
+    return None
+
+def price_value(value):
+    """
+    Converts a price as found in a page ("1.299,00 €", "1299.00", 12.5) to a
+    float. Returns None if it is no valid price
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    value = str(value).replace("€", "").strip()
+    if "," in value:
+        value = value.replace(".", "").replace(",", ".")
+
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def _offer_price(data):
+    """
+    Searches decoded JSON-LD for the price of the first offer
+    """
+    if isinstance(data, list):
+        for item in data:
+            price = _offer_price(item)
+            if price is not None:
+                return price
+        return None
+
+    if not isinstance(data, dict):
+        return None
+
+    for key in ("price", "lowPrice"):
+        if key in data:
+            price = price_value(data[key])
+            if price is not None:
+                return price
+
+    for key in ("offers", "@graph"):
+        if key in data:
+            price = _offer_price(data[key])
+            if price is not None:
+                return price
+
+    return None
+
+def structured_price(text):
+    """
+    Returns the price embedded in the page as structured data, either as
+    JSON-LD offer or as microdata itemprop="price". Returns None if the page
+    has none. This works on the server rendered page, no browser is needed.
+    """
+    for block in LD_JSON.findall(text):
+        try:
+            price = _offer_price(json.loads(block))
+        except ValueError:
+            continue
+        if price is not None:
+            return price
+
+    soup = BeautifulSoup(text, PARSER, parse_only=SoupStrainer(attrs={"itemprop": "price"}))
+    element = soup.find(attrs={"itemprop": "price"})
+    if element:
+        return price_value(element.get("content") or element.get_text())
+
+    return None
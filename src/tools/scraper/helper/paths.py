@@ -0,0 +1,89 @@
+import sqlite3
+import os
+
+class FetchPaths:
+    """
+    Remembers per product page which way of reading its price worked, a plain
+    request ("http") or rendering the page in the browser ("browser").
+    Pages whose price could not be read without the browser threshold times
+    in a row are rendered right away, the plain request is only retried on
+    every probe-th refresh in case the page changed.
+    """
+
+    def __init__(self, path=".scraper/paths.sqlite", threshold=3, probe=10):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.threshold = threshold
+        self.probe = probe
+        # Outcomes of this run, see summary
+        self.counts = {"http": 0, "browser": 0, "failed": 0}
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS fetchpath ("
+            "url TEXT PRIMARY KEY, http INTEGER DEFAULT 0, browser INTEGER DEFAULT 0, "
+            "misses INTEGER DEFAULT 0, skipped INTEGER DEFAULT 0)"
+        )
+        self.connection.commit()
+
+    def _ensure(self, url):
+        self.connection.execute("INSERT OR IGNORE INTO fetchpath (url) VALUES (?)", (url,))
+
+    def try_http(self, url):
+        """
+        Returns whether the price of url should be read with a plain request
+        first. Skipped attempts are counted towards the next probe
+        """
+        row = self.connection.execute(
+            "SELECT misses, skipped FROM fetchpath WHERE url = ?", (url,)
+        ).fetchone()
+
+        if not row or row[0] < self.threshold:
+            return True
+
+        skipped = row[1] + 1
+        if skipped >= self.probe:
+            skipped = 0
+
+        self.connection.execute("UPDATE fetchpath SET skipped = ? WHERE url = ?", (skipped, url))
+        self.connection.commit()
+
+        return skipped == 0
+
+    def record(self, url, path, success):
+        """
+        Registers the outcome of reading the price of url using path
+        """
+        self._ensure(url)
+
+        if path == "http" and success:
+            self.connection.execute(
+                "UPDATE fetchpath SET http = http + 1, misses = 0, skipped = 0 WHERE url = ?", (url,)
+            )
+        elif path == "http":
+            self.connection.execute(
+                "UPDATE fetchpath SET misses = misses + 1 WHERE url = ?", (url,)
+            )
+        elif success:
+            self.connection.execute(
+                "UPDATE fetchpath SET browser = browser + 1 WHERE url = ?", (url,)
+            )
+        self.connection.commit()
+
+        if success:
+            self.counts[path] += 1
+        elif path == "browser":
+            self.counts["failed"] += 1
+
+    def summary(self):
+        """
+        Returns a short report of the paths taken in this run
+        """
+        return "{http} prices read without the browser, {browser} rendered, {failed} failed".format(**self.counts)
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
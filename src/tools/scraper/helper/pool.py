@@ -0,0 +1,104 @@
+from multiprocessing import get_context
+from queue import Empty
+
+def _worker(site_cls, tasks, results, headless, limiter, base_url):
+    """
+    Runs inside a worker process. Starts its own browser, warms the site up
+    once and then works through the tasks until it receives None.
+    Every task is a tuple of (key, method name, arguments) and its outcome is
+    sent back as (key, result, error)
+    """
+    driver = None
+    try:
+        driver = site_cls.make_driver(headless=headless, base_url=base_url)
+        # The worker never touches the database, results are written by the
+        # process owning the pool
+        site = site_cls(driver, None, None, limiter=limiter)
+        if base_url:
+            site.base_url = base_url
+        site.warm_up()
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            key, method, args = task
+            try:
+                results.put((key, getattr(site, method)(*args), None))
+            except Exception as e:
+                results.put((key, None, str(e)))
+        print(site.load_summary())
+    finally:
+        if driver is not None:
+            driver.quit()
+        results.put(None)
+
+class DriverPool:
+    """
+    Pool of browser workers each running in a separate process with its own
+    lean headless Firefox instance. Tasks are spread across the workers and
+    their results are collected in the calling process, which stays the only
+    one writing to the database.
+    base_url replaces the one of the site class in the workers, e.g. for a
+    stand-in server, their browsers may only load from its host then.
+    """
+
+    def __init__(self, site_cls, workers=4, headless=True, limiter=None, base_url=None):
+        self.site_cls = site_cls
+        self.base_url = base_url
+        self.workers = workers
+        self.headless = headless
+        # Every worker gets its share of the rate limit of the shop
+        self.limiter = limiter.split(workers) if limiter else None
+
+    def map(self, method, tasks, timeout=5.0):
+        """
+        Calls method of the site on every worker for each (key, args) tuple in
+        tasks and yields (key, result, error) in order of completion.
+        Workers which died without saying goodbye (e.g. killed by the OOM
+        killer) are noticed once no result arrived for timeout seconds, their
+        current task is lost
+        """
+        ctx = get_context("spawn")
+        task_queue = ctx.Queue()
+        result_queue = ctx.Queue()
+
+        for key, args in tasks:
+            task_queue.put((key, method, args))
+        for _ in range(self.workers):
+            task_queue.put(None)
+
+        processes = [
+            ctx.Process(
+                target=_worker,
+                args=(self.site_cls, task_queue, result_queue, self.headless, self.limiter, self.base_url),
+                daemon=True
+            ) for _ in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        running = len(processes)
+        try:
+            while running:
+                try:
+                    result = result_queue.get(timeout=timeout)
+                except Empty:
+                    alive = sum(process.is_alive() for process in processes)
+                    if alive < running:
+                        for process in processes:
+                            if not process.is_alive() and process.exitcode:
+                                print(f"Browser worker {process.pid} died with exit code {process.exitcode}")
+                        running = alive
+                    continue
+
+                if result is None:
+                    running -= 1
+                else:
+                    yield result
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
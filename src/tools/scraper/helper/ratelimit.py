@@ -0,0 +1,138 @@
+from time import monotonic, sleep
+from collections import deque
+import asyncio
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
+
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from datahandler.models import ScrapeConfig
+
+# Status codes telling us to slow down
+BACKOFF_STATUS = (429, 503)
+
+def served_from_cache(headers):
+    """
+    Returns True if the headers of a response tell it came from a cache in
+    front of the shop, e.g. a CDN
+    """
+    age = headers.get("age", "").strip()
+
+    return "hit" in headers.get("x-cache", "").lower() or \
+        "hit" in headers.get("cf-cache-status", "").lower() or \
+        (age.isdigit() and int(age) > 0)
+
+class RateLimiter:
+    """
+    Token bucket limiting the requests sent to a single shop.
+    The rate adapts to the responses of the shop (AIMD): it is increased
+    additively while responses are healthy and cut multiplicatively on
+    429 / 503 responses or when the latency rises above slowdown times the
+    baseline, the best latency of the last window responses. Responses
+    which did not have to be generated (304, served from a cache) are fast
+    no matter how busy the shop is and do not count as latency.
+    """
+
+    def __init__(self, rate=2.0, min_rate=0.2, max_rate=10.0, burst=1,
+            increase=0.1, decrease=0.5, slowdown=3.0, window=100):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.slowdown = slowdown
+        self.tokens = burst
+        self.updated = monotonic()
+        self.latency = None # Moving average of the response latency
+        self.recent = deque(maxlen=window) # Moving averages of the last responses
+        self.baseline = None # Lowest of the recent moving averages
+        self.last_decrease = 0
+
+    @classmethod
+    def for_shop(cls, db, shop):
+        """
+        Creates a limiter using the ScrapeConfig of the shop, or the defaults
+        if the shop has none
+        """
+        config = db.query(ScrapeConfig).filter_by(shop_id=shop.id).first()
+
+        if not config:
+            return cls()
+
+        return cls(
+            rate=config.rate,
+            min_rate=config.min_rate,
+            max_rate=config.max_rate,
+            burst=config.burst
+        )
+
+    def split(self, parts):
+        """
+        Returns a limiter with 1/parts of the rate, used for every one of
+        parts workers sharing the limit of this one
+        """
+        return RateLimiter(
+            rate=self.rate / parts,
+            min_rate=self.min_rate / parts,
+            max_rate=self.max_rate / parts,
+            burst=self.burst,
+            increase=self.increase / parts,
+            decrease=self.decrease,
+            slowdown=self.slowdown,
+            window=self.recent.maxlen
+        )
+
+    def _reserve(self):
+        """
+        Takes a token from the bucket and returns how long the caller has to
+        wait before it may use it
+        """
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+
+        return max(0, -self.tokens / self.rate)
+
+    def wait(self):
+        """
+        Blocks until the next request may be sent
+        """
+        sleep(self._reserve())
+
+    async def wait_async(self):
+        """
+        Waits until the next request may be sent without blocking the loop
+        """
+        await asyncio.sleep(self._reserve())
+
+    def feedback(self, status_code, latency, cached=False):
+        """
+        Adapts the rate to the outcome of a request. status_code may be None
+        if it is unknown, e.g. for pages loaded in a browser. cached tells
+        that the response was served from a cache, see served_from_cache
+        """
+        if status_code != 304 and not cached:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency = 0.8 * self.latency + 0.2 * latency
+            self.recent.append(self.latency)
+            self.baseline = min(self.recent)
+
+        overloaded = status_code in BACKOFF_STATUS or \
+            (self.latency is not None and self.latency > self.slowdown * self.baseline)
+
+        if overloaded:
+            # Only back off once per interval, responses to requests sent
+            # before the last cut would otherwise cut the rate again
+            now = monotonic()
+            if now - self.last_decrease >= 1 / self.rate:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.last_decrease = now
+        else:
+            self.rate = min(self.max_rate, self.rate + self.increase)
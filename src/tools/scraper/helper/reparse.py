@@ -0,0 +1,116 @@
+from sqlalchemy import select, update
+from multiprocessing import get_context
+from itertools import groupby
+from datetime import datetime
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
+
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from datahandler.models import Product, ProductPage
+from datahandler.compact import replace_prices
+from helper.archive import load_object
+
+# State of a parse process, see _init
+_archive_path = None
+_plugins = {}
+
+def _init(archive_path):
+    global _archive_path
+    _archive_path = archive_path
+
+def _plugin(site_name):
+    """
+    Returns an offline instance of a site plugin. It has neither client nor
+    database nor shop, only its parse methods are used
+    """
+    from sites import SITES
+
+    if site_name not in _plugins:
+        _plugins[site_name] = SITES[site_name](None, None, None)
+
+    return _plugins[site_name]
+
+def _parse(task):
+    """
+    Parses an archived body, task is (site name, kind, digest)
+    """
+    site_name, kind, digest = task
+    try:
+        plugin = _plugin(site_name)
+        text = load_object(_archive_path, digest)
+        result = plugin.parse_price(text) if kind == "price" else plugin.parse_product(text)
+    except Exception as e:
+        print(f"{digest} could not be parsed: {e}")
+        result = None
+
+    return task, result
+
+def _finish(db, dry_run):
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+
+def reparse(db, archive, shop_ids=None, since=None, until=None, processes=None, batch=200, dry_run=False):
+    """
+    Parses the pages in the archive again with the current site plugins and
+    rewrites the prices derived from them as well as the name, description
+    and amount of products whose product page was archived. Prices read in
+    the browser are not archived (see PageArchive) and left as they are.
+    Every distinct body is parsed once, spread across processes processes.
+    The rewrite is committed every batch pages, with dry_run it is rolled
+    back instead. Returns (pages, removed rows, added rows)
+    """
+    tasks = {(site, kind, digest) for shop, site, url, fetched_at, kind, digest in archive.fetches(shop_ids, since, until)}
+    print(f"Parsing {len(tasks)} distinct pages")
+
+    with get_context("spawn").Pool(processes, initializer=_init, initargs=(archive.path,)) as pool:
+        results = dict(pool.imap_unordered(_parse, tasks, chunksize=16))
+
+    pages = removed = added = 0
+    eans = {} # shop id -> {url: ean} of the stored product pages
+    for (shop_id, url), fetches in groupby(archive.fetches(shop_ids, since, until), key=lambda row: (row[0], row[2])):
+        if shop_id not in eans:
+            eans[shop_id] = {page_url: ean_id for ean_id, page_url in db.execute(
+                select(ProductPage.ean_id, ProductPage.url).where(ProductPage.shop_id == shop_id)
+            )}
+
+        observations = {} # ean -> [(date, value)]
+        product = None
+        for shop, site, url, fetched_at, kind, digest in fetches:
+            result = results.get((site, kind, digest))
+            date = datetime.fromtimestamp(fetched_at)
+            if kind == "product":
+                if not result:
+                    continue
+                product = result
+                observations.setdefault(int(result["ean"]), []).append((date, result.get("price")))
+            else:
+                ean_id = eans[shop_id].get(url.partition("?")[0])
+                if ean_id is not None:
+                    observations.setdefault(ean_id, []).append((date, result))
+
+        for ean_id, values in observations.items():
+            counts = replace_prices(db, ean_id, shop_id, values)
+            removed += counts[0]
+            added += counts[1]
+
+        if product:
+            db.execute(
+                update(Product)
+                .where(Product.ean_id == int(product["ean"]))
+                .values(name=product["name"], description=product["description"], amount=float(product["amount"]))
+            )
+
+        pages += 1
+        if pages % batch == 0:
+            _finish(db, dry_run)
+            print(f"{pages} pages rewritten, {removed} rows removed and {added} added")
+
+    _finish(db, dry_run)
+
+    return pages, removed, added
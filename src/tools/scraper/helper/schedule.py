@@ -0,0 +1,132 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import heapq
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
+
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from datahandler.models import ScrapeConfig
+from helper.data import get_due_pages, get_scheduled_pages
+
+DuePage = namedtuple("DuePage", ["ean_id", "url"])
+
+class RefreshSchedule:
+    """
+    Priority queue of the product pages of a shop which are due for a price
+    refresh, most overdue first.
+    Every page has its own refresh interval (in hours). It is shortened by
+    decrease whenever the price of the page changed and lengthened by
+    increase when it did not, bounded by min_interval and max_interval. Pages
+    with volatile prices are visited often, stable ones rarely.
+    The next due date of every observed page is written through the writer.
+    """
+
+    def __init__(self, db, shop_id, writer, min_interval=6.0, max_interval=336.0,
+            budget=None, default=24.0, increase=1.5, decrease=0.5):
+        self.db = db
+        self.shop_id = shop_id
+        self.writer = writer
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget = budget # Maximum number of pages per run
+        self.default = default # Interval of pages which were never scheduled
+        self.increase = increase
+        self.decrease = decrease
+        self.heap = []
+        self.pages = {} # ean -> (interval, latest price) of the loaded pages
+
+    @classmethod
+    def for_shop(cls, db, shop, writer):
+        """
+        Creates a schedule using the ScrapeConfig of the shop, or the defaults
+        if the shop has none
+        """
+        config = db.query(ScrapeConfig).filter_by(shop_id=shop.id).first()
+
+        if not config:
+            return cls(db, shop.id, writer)
+
+        # Columns added to an existing table are empty
+        return cls(
+            db, shop.id, writer,
+            min_interval=config.min_interval if config.min_interval else 6.0,
+            max_interval=config.max_interval if config.max_interval else 336.0,
+            budget=config.budget
+        )
+
+    def __len__(self):
+        return len(self.heap)
+
+    def load(self, now=None):
+        """
+        Queues all pages which are due at now
+        """
+        rows = get_due_pages(self.db, self.shop_id, now=now, default=timedelta(hours=self.default))
+
+        for ean_id, url, next_due, interval, value, date in rows:
+            if next_due:
+                due = next_due
+            elif date:
+                due = date + timedelta(hours=self.default)
+            else:
+                due = datetime.min
+            self.pages[ean_id] = (interval if interval else self.default, value)
+            heapq.heappush(self.heap, (due, ean_id, url))
+
+    def track(self, eans):
+        """
+        Makes the supplied pages known to the schedule without queueing them,
+        used if the pages to refresh are picked elsewhere
+        """
+        eans = [ean_id for ean_id in eans if ean_id not in self.pages]
+        if not eans:
+            return
+
+        for ean_id, url, next_due, interval, value, date in get_scheduled_pages(self.db, self.shop_id, eans):
+            self.pages[ean_id] = (interval if interval else self.default, value)
+
+    def pop(self):
+        """
+        Returns the most overdue page
+        """
+        due, ean_id, url = heapq.heappop(self.heap)
+
+        return DuePage(ean_id, url)
+
+    def due(self):
+        """
+        Returns the queued pages, most overdue first and at most budget
+        """
+        count = min(len(self.heap), self.budget) if self.budget else len(self.heap)
+
+        return [self.pop() for _ in range(count)]
+
+    def observe(self, ean_id, value=None, unchanged=False, now=None):
+        """
+        Schedules the next refresh of a page after its price was read.
+        value is the price found, None if it could not be read. unchanged is
+        set if the page did not change at all
+        """
+        if ean_id not in self.pages:
+            return
+
+        now = now if now else datetime.now()
+        interval, previous = self.pages[ean_id]
+
+        if value is None and not unchanged:
+            # Failed pages are retried soon without touching their interval
+            next_due = now + timedelta(hours=self.min_interval)
+        else:
+            if unchanged or (previous is not None and abs(value - previous) < 0.005):
+                interval = min(self.max_interval, interval * self.increase)
+            elif previous is not None:
+                interval = max(self.min_interval, interval * self.decrease)
+            # The first price of a page keeps its interval
+            next_due = now + timedelta(hours=interval)
+
+        self.pages[ean_id] = (interval, value if value is not None else previous)
+        self.writer.schedule_page(ean_id, self.shop_id, next_due, interval)
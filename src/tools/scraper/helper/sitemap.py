@@ -0,0 +1,115 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+import xml.etree.ElementTree as ET
+import zlib
+
+# A <url> or <sitemap> entry, kind is "url" or "sitemap" and lastmod a unix
+# timestamp or None
+SitemapEntry = namedtuple("SitemapEntry", ["kind", "loc", "lastmod"])
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+def parse_lastmod(text):
+    """
+    Returns the W3C datetime of a lastmod element as unix timestamp, times
+    without timezone are taken as UTC. Returns None if it can not be read
+    """
+    if not text:
+        return None
+
+    try:
+        date = datetime.fromisoformat(text.strip())
+    except ValueError:
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+
+    return date.timestamp()
+
+def _local(tag):
+    """
+    Strips the namespace from a tag
+    """
+    return tag.rpartition("}")[2]
+
+class SitemapParser:
+    """
+    Incremental parser of sitemaps and sitemap indexes. The document is fed
+    in chunks as it is downloaded and entries are returned as soon as they
+    are complete, parsed entries are dropped from the tree so memory does not
+    grow with the size of the sitemap. Gzipped sitemaps are recognized by
+    their first bytes and inflated on the fly.
+    """
+
+    def __init__(self):
+        self.parser = ET.XMLPullParser(events=("start", "end"))
+        self.inflate = None
+        self.started = False
+        self.root = None
+
+    def feed(self, chunk):
+        """
+        Parses the next chunk of the document, returns the entries completed
+        by it
+        """
+        if not self.started:
+            self.started = True
+            if chunk.startswith(GZIP_MAGIC):
+                self.inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        if self.inflate:
+            chunk = self.inflate.decompress(chunk)
+
+        self.parser.feed(chunk)
+
+        return self._entries()
+
+    def close(self):
+        """
+        Finishes the document, returns the remaining entries
+        """
+        if self.inflate:
+            self.parser.feed(self.inflate.flush())
+        self.parser.close()
+
+        return self._entries()
+
+    def _entries(self):
+        entries = []
+
+        for event, element in self.parser.read_events():
+            if event == "start":
+                if self.root is None:
+                    self.root = element
+                continue
+
+            kind = _local(element.tag)
+            if kind not in ("url", "sitemap"):
+                continue
+
+            loc = lastmod = None
+            for child in element:
+                name = _local(child.tag)
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = parse_lastmod(child.text)
+
+            if loc:
+                entries.append(SitemapEntry(kind, loc, lastmod))
+
+            # Completed entries are not needed anymore
+            self.root.clear()
+
+        return entries
+
+def robots_sitemaps(text):
+    """
+    Returns the sitemap urls announced in a robots.txt
+    """
+    return [
+        line.partition(":")[2].strip()
+        for line in text.splitlines()
+        if line.lower().startswith("sitemap:")
+    ]
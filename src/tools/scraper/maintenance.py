@@ -0,0 +1,113 @@
+"""
+Maintenance commands for the price database, e.g.
+
+    python src/tools/scraper/maintenance.py compact
+    python src/tools/scraper/maintenance.py latest
+    python src/tools/scraper/maintenance.py stats
+    python src/tools/scraper/maintenance.py reparse --shops reichelt --since 2026-01-01
+"""
+from argparse import ArgumentParser
+from datetime import datetime
+from dotenv import load_dotenv
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../'))
+
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from datahandler.migrate import upgrade_schema
+from datahandler.compact import compact_prices
+from datahandler.latest import backfill_latest_prices
+from datahandler.statistics import refresh_statistics
+from datahandler.models import ScrapeConfig
+from helper.archive import PageArchive
+from helper.reparse import reparse
+from sites import SITES
+from run import get_session
+
+def compact(db, args):
+    """
+    Folds runs of unchanged prices written before change only storage
+    """
+    removed = compact_prices(db, batch=args.batch)
+    print(f"Compaction complete, {removed} rows removed")
+
+def latest(db, args):
+    """
+    Rebuilds the latest price of every product in every shop
+    """
+    count = backfill_latest_prices(db, batch=args.batch)
+    print(f"Latest prices of {count} products in shops rebuilt")
+
+def stats(db, args):
+    """
+    Recounts the products, shops and prices shown on the dashboard
+    """
+    counts = refresh_statistics(db)
+    db.commit()
+    print(f"Statistics recounted: {counts}")
+
+def reparse_archive(db, args):
+    """
+    Rewrites the prices derived from archived pages with the current parsers
+    """
+    path = args.archive if args.archive else \
+        (os.environ.get("SCRAPER_ARCHIVE") if os.environ.get("SCRAPER_ARCHIVE") else ".scraper/archive")
+    shop_ids = [config.shop_id for config in db.query(ScrapeConfig).filter(ScrapeConfig.site.in_(args.shops))] \
+        if args.shops else None
+
+    archive = PageArchive(path)
+    try:
+        pages, removed, added = reparse(
+            db, archive,
+            shop_ids=shop_ids,
+            since=args.since.timestamp() if args.since else None,
+            until=args.until.timestamp() if args.until else None,
+            processes=args.processes,
+            dry_run=args.dry_run
+        )
+    finally:
+        archive.close()
+
+    print(f"Reparse complete, {pages} pages rewritten, {removed} rows removed and {added} added"
+          + (" (dry run, nothing written)" if args.dry_run else ""))
+
+def main():
+    parser = ArgumentParser(description="Maintenance commands for the price database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_compact = commands.add_parser("compact", help="fold repeated equal prices into validity intervals")
+    parser_compact.add_argument("--batch", type=int, default=500, help="products per transaction")
+    parser_compact.set_defaults(function=compact)
+
+    parser_latest = commands.add_parser("latest", help="rebuild the latest price table from the price history")
+    parser_latest.add_argument("--batch", type=int, default=500, help="products per transaction")
+    parser_latest.set_defaults(function=latest)
+
+    parser_stats = commands.add_parser("stats", help="recount the products, shops and prices shown on the dashboard")
+    parser_stats.set_defaults(function=stats)
+
+    parser_reparse = commands.add_parser("reparse", help="rewrite prices from the page archive with the current parsers")
+    parser_reparse.add_argument("--archive", default=None, help="archive location, defaults to SCRAPER_ARCHIVE")
+    parser_reparse.add_argument("--shops", nargs="*", default=None, choices=list(SITES), help="only these site plugins")
+    parser_reparse.add_argument("--since", type=datetime.fromisoformat, default=None, help="only pages fetched since")
+    parser_reparse.add_argument("--until", type=datetime.fromisoformat, default=None, help="only pages fetched before")
+    parser_reparse.add_argument("--processes", type=int, default=None, help="parse processes, defaults to the cpu count")
+    parser_reparse.add_argument("--dry-run", action="store_true", help="roll back instead of writing")
+    parser_reparse.set_defaults(function=reparse_archive)
+
+    args = parser.parse_args()
+
+    load_dotenv(".env")
+
+    db = get_session()
+    upgrade_schema(db.get_bind())
+    try:
+        args.function(db, args)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
-import httpx
 from dotenv import load_dotenv
 from sqlalchemy.orm import sessionmaker
 import sqlalchemy
-from selenium import webdriver
+from multiprocessing import get_context
+import asyncio
 import os,sys
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,10 +11,18 @@ src_dir = os.path.abspath(os.path.join(current_dir,'../../'))
 if src_dir not in sys.path:
     sys.path.append(src_dir)
 
-from datahandler.models import Shop
+from datahandler.models import Shop, ScrapeConfig
+from datahandler.migrate import upgrade_schema, upgrade_data
+from datahandler.writer import BulkWriter
 
 
-from sites import Conrad, Reichelt, Voelkner
+from sites import SITES, make_http_client
+from helper.archive import PageArchive
+from helper.cache import ResponseCache
+from helper.frontier import Frontier
+from helper.metrics import METRICS, metrics_path
+from helper.paths import FetchPaths
+from helper.ratelimit import RateLimiter
 
 search = {
     "conrad": [
@@ -60,10 +68,10 @@ search = {
     ]
 }
 
-def main():
-    load_dotenv(".env")  
-    
-    # Setup SQL Connection
+def get_session():
+    """
+    Opens a new database session using the connection settings of the env
+    """
     db_uri = "mariadb://{user}:{passwd}@{host}:{port}/{db}?ssl_ca={ssl_ca}&ssl_cert={ssl_cert}&ssl_key={ssl_key}".format(
         user =  os.environ.get("DB_USER") if os.environ.get("DB_USER") else "ecstasee",
         passwd = os.environ.get("DB_PASSWORD") if os.environ.get("DB_PASSWORD") else "ecstasee",
@@ -77,53 +85,151 @@ def main():
 
     engine = sqlalchemy.create_engine(db_uri)
     Session = sessionmaker(bind=engine)
-    db = Session()
-
-    # Setup HTTP Session Client
-    headers = {
-        "user-agent": "Mozilla/5.0 (X11; Linux x86_64; rv:131.0) Gecko/20100101 Firefox/131.0"
-    }
-    session = httpx.Client(http2=True, timeout=15.0, follow_redirects=True)
-    session.headers = headers
 
-    driver = webdriver.Firefox()
+    return Session()
 
-    conrad_shop_obj = db.query(Shop).filter_by(id=19).first() # Id of buerklin shop
-    conrad = Conrad(driver, db, conrad_shop_obj)
+def get_client(site):
+    """
+    Creates the client the site plugin fetches its pages with
+    """
+    if site.browser:
+        # Set SCRAPER_HEADLESS=0 to watch the browser
+        headless = os.environ.get("SCRAPER_HEADLESS") if os.environ.get("SCRAPER_HEADLESS") else "1"
+        return site.make_driver(headless=headless != "0")
 
-    reichelt_shop_obj = db.query(Shop).filter_by(id=15).first() # Id of reichelt shop
-    reich = Reichelt(session, db, reichelt_shop_obj)
+    # Setup HTTP Session Client
+    return make_http_client()
 
-    voelkner_shop_obj = db.query(Shop).filter_by(id=18).first() # Id of voelkner shop
-    voelk = Voelkner(driver, db, voelkner_shop_obj)
+def make_scraper(db, shop, site_name, writer, known=None):
+    """
+    Creates the scraper of a shop together with its client and local state.
+    Scrapers sharing a database session may share the KnownRows in known
+    """
+    site = SITES[site_name]
+    client = get_client(site)
+
+    # Validators of already processed pages for conditional requests
+    cache = ResponseCache(os.environ.get("SCRAPER_CACHE") if os.environ.get("SCRAPER_CACHE") else ".scraper/cache.sqlite")
+
+    # Persistent crawl queue, urls of interrupted runs are resumed
+    frontier = Frontier(shop.id, os.environ.get("SCRAPER_FRONTIER") if os.environ.get("SCRAPER_FRONTIER") else ".scraper/frontier.sqlite")
+
+    # Hybrid browser shops read prices with plain requests where possible and
+    # remember per page which way worked
+    hybrid = {}
+    if getattr(site, "hybrid", False):
+        hybrid["session"] = make_http_client()
+        hybrid["paths"] = FetchPaths(os.environ.get("SCRAPER_PATHS") if os.environ.get("SCRAPER_PATHS") else ".scraper/paths.sqlite")
+
+    # Fetched pages are only archived if a location is configured, pages
+    # rendered in the browser never are
+    archive = PageArchive(os.environ.get("SCRAPER_ARCHIVE")) if os.environ.get("SCRAPER_ARCHIVE") else None
+
+    return site(
+        client, db, shop,
+        writer=writer,
+        frontier=frontier,
+        limiter=RateLimiter.for_shop(db, shop),
+        cache=cache,
+        known=known,
+        archive=archive,
+        **hybrid
+    )
 
-    conrad.update_stored()
-    voelk.update_stored()
-    reich.update_stored()
-    
+def close_scraper(scraper):
+    """
+    Closes the client and local state of a scraper created by make_scraper
     """
-    for i in range(0, len(search["conrad"])):
-        try:
-            r = conrad.populate_from_list(search["conrad"][i])
-            print(f'{i}/{len(search["conrad"])} {r}')
-        except Exception as e:
-            print(f"Error occured: {e}")
-    for i in range(0, len(search["reichelt"])):
-        try:
-            r = reich.populate_from_list(search["reichelt"][i])
-            print(f'{i}/{len(search["reichelt"])} {r}')
-        except Exception as e:
-            print(f"Error occured: {e}")
-    for i in range(0, len(search["voelkner"])):
-        try:
-            r = voelk.populate_from_list(search["voelkner"][i])
-            print(f'{i}/{len(search["voelkner"])} {r}')
-        except Exception as e:
-            print(f"Error occured: {e}")
+    scraper.frontier.close()
+    scraper.cache.close()
+    if scraper.archive:
+        scraper.archive.close()
+    if scraper.browser:
+        scraper.paths.close()
+        # Created by the hybrid path or for sitemaps
+        if scraper.session is not None:
+            scraper.session.close()
+        scraper.client.quit()
+    else:
+        scraper.client.close()
+
+def run_shop(shop_id, site_name, workers):
     """
+    Runs the complete scrape of a single shop. Every shop is run in its own
+    process with its own database session and client
+    """
+    load_dotenv(".env")
+
+    db = get_session()
+    shop = db.query(Shop).filter_by(id=shop_id).first()
+
+    # All scraped rows are buffered and written in batches
+    writer = BulkWriter(db)
+
+    scraper = make_scraper(db, shop, site_name, writer)
+
+    try:
+        if scraper.browser:
+            scraper.update_stored(workers=workers)
+        else:
+            asyncio.run(scraper.update_stored_async(concurrency=8))
+
+        # New products are found in the lists of the search dict, the
+        # sitemaps of the shop or both
+        discovery = os.environ.get("SCRAPER_DISCOVERY") if os.environ.get("SCRAPER_DISCOVERY") else "lists"
+
+        if discovery in ("sitemaps", "all"):
+            try:
+                scraper.discover(workers=workers)
+            except Exception as e:
+                scraper.count("error")
+                print(f"Error occured: {e}")
+
+        lists = search.get(site_name, []) if discovery in ("lists", "all") else []
+        for i in range(0, len(lists)):
+            try:
+                r = scraper.populate_from_list(lists[i], workers=workers)
+                print(f'{shop.name} {i}/{len(lists)} {r}')
+            except Exception as e:
+                scraper.count("error")
+                print(f"Error occured: {e}")
+    finally:
+        writer.close()
+        close_scraper(scraper)
+        db.close()
+        # Every shop runs in its own process and writes its own metrics
+        METRICS.write(metrics_path(site_name))
 
-    session.close()
-    driver.close()
+def main():
+    load_dotenv(".env")
+
+    # Shops are scraped if they have a ScrapeConfig naming a known site plugin
+    db = get_session()
+    upgrade_schema(db.get_bind())
+    upgrade_data(db)
+    configs = db.query(ScrapeConfig).filter(ScrapeConfig.site.in_(list(SITES))).all()
+    shops = [(config.shop_id, config.site) for config in configs]
+    db.close()
+
+    if not shops:
+        print("No shops to scrape; set the site of a shop in the scrapeconfig table")
+        return
+
+    # Number of browser processes used by each of the selenium based shops
+    workers = int(os.environ.get("SCRAPER_WORKERS") if os.environ.get("SCRAPER_WORKERS") else "4")
+
+    # All shops are scraped at the same time, each in its own process
+    ctx = get_context("spawn")
+    processes = [
+        ctx.Process(target=run_shop, args=(shop_id, site_name, workers), name=site_name)
+        for shop_id, site_name in shops
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            print(f"Scraping {process.name} failed with exit code {process.exitcode}")
 
 if __name__ == "__main__":
     main()
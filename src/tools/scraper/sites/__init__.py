@@ -1,3 +1,7 @@
+from .base import *
 from .reichelt import *
 from .voelkner import *
-from .conrad import *
\ No newline at end of file
+from .conrad import *
+
+# Site plugins by the name used in ScrapeConfig.site
+SITES = {site.name: site for site in (Conrad, Reichelt, Voelkner)}
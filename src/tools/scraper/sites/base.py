@@ -0,0 +1,818 @@
+from selenium.webdriver.support.wait import WebDriverWait
+from time import monotonic, time
+from functools import partial
+from urllib.parse import urlparse, urljoin
+import asyncio
+import httpx
+import re
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
+
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from helper.driver import make_driver
+from helper.frontier import Frontier
+from helper.known import KnownRows
+from helper.metrics import METRICS, log
+from helper.parse import structured_price
+from helper.paths import FetchPaths
+from helper.pool import DriverPool
+from helper.ratelimit import RateLimiter, served_from_cache
+from helper.schedule import RefreshSchedule
+from helper.sitemap import SitemapParser, robots_sitemaps
+from datahandler.writer import BulkWriter
+
+# Returned by fetch_price / fetch_product if the page did not change since it
+# was processed last
+UNCHANGED = "unchanged"
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:131.0) Gecko/20100101 Firefox/131.0"
+
+def make_http_client():
+    """
+    Creates the httpx client pages are requested with
+    """
+    return httpx.Client(
+        http2=True,
+        timeout=15.0,
+        follow_redirects=True,
+        headers={"user-agent": USER_AGENT}
+    )
+
+class ShopScraper:
+    """
+    Base of all site scrapers.
+    Implements refreshing the stored product pages of a shop, crawling product
+    listings and storing the results. Site plugins only declare how pages are
+    fetched and what is extracted from them.
+    """
+
+    name = None # Identifies the plugin in ScrapeConfig.site
+    base_url = None
+    browser = False # Whether the plugin needs a selenium driver as client
+    sitemaps = None # Sitemap (index) urls of the shop, the ones in robots.txt if None
+    product_pattern = None # Regular expression matching product pages in the sitemaps
+
+    def __init__(self, client, database_connection, shop, writer=None, frontier=None, limiter=None, cache=None, known=None, archive=None):
+        self.client = client
+        self.shop = shop
+        self.db = database_connection
+        self.cache = cache # Optional ResponseCache for conditional requests
+        self.validated = None # Cache entry of the page read last, see cache_when_stored
+        self.archive = archive # Optional PageArchive fetched pages are saved in
+        self.writer = writer if writer is not None else BulkWriter(database_connection)
+        # Queue of product urls to crawl, in memory unless a persistent one is supplied
+        self.frontier = frontier if frontier is not None else \
+            (Frontier(shop.id, path=":memory:") if shop else None)
+        self.seeded = False
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.schedule = None # RefreshSchedule of the current update, see due_pages
+        # Keys of the stored rows, checked instead of querying the database
+        self.known = known if known is not None else KnownRows(database_connection)
+        # Flushes of a writer of its own count as db time of this shop
+        if self.writer.observer is None:
+            self.writer.observer = lambda seconds, rows: self.observe("db", seconds)
+
+    def log(self, message, **fields):
+        """
+        Logs a progress message of this scraper, see helper.metrics.log
+        """
+        log(message, shop=self.name, **fields)
+
+    def count(self, event, amount=1):
+        """
+        Counts an event of this scraper in the process metrics
+        """
+        METRICS.count(event, shop=self.name, amount=amount)
+
+    def observe(self, stage, seconds):
+        """
+        Records the duration of a stage of this scraper in the process metrics
+        """
+        METRICS.observe(stage, seconds, shop=self.name)
+
+    def timer(self, stage):
+        """
+        Records the duration of the enclosed block as stage of this scraper
+        """
+        return METRICS.timer(stage, shop=self.name)
+
+    def warm_up(self):
+        """
+        Called once before the first product page is fetched
+        """
+        pass
+
+    def list_products(self, product_list_url):
+        """
+        Returns the urls of all products found in the supplied list
+        """
+        raise NotImplementedError
+
+    def fetch_price(self, product_url):
+        """
+        Reads the price from the supplied product page.
+        Returns None if no valid price was found
+        """
+        raise NotImplementedError
+
+    def fetch_product(self, product_url):
+        """
+        Reads the product information from the supplied product page as dict
+        with the keys name, description, ean, price and amount.
+        Returns None if the page could not be read
+        """
+        raise NotImplementedError
+
+    def due_pages(self):
+        """
+        Returns the stored product pages of this shop which are due for a
+        price refresh, most overdue first
+        """
+        with self.timer("query"):
+            self.schedule = RefreshSchedule.for_shop(self.db, self.shop, self.writer)
+            self.schedule.load()
+
+        pages = self.schedule.due()
+        self.log(
+            f"{len(pages)} pages due for an update, {len(self.schedule)} left for later runs",
+            event="due", due=len(pages), deferred=len(self.schedule)
+        )
+
+        return pages
+
+    def update_stored(self, workers=None):
+        """
+        Iterates through the product pages of this shop which are due and
+        updates their prices on each page
+        """
+
+        pages = self.due_pages()
+
+        self.warm_up()
+
+        for page in pages:
+            self.log(f"{page.ean_id}... Updating", event="update", ean=page.ean_id)
+            try:
+                self.update_price(page.url, page.ean_id)
+            except Exception as e:
+                self.error(e, ean=page.ean_id, url=page.url)
+
+    def error(self, e, **fields):
+        """
+        Counts and logs an exception which is skipped over
+        """
+        self.count("error")
+        self.log(f"Request resulted in Exception: {e}; proceeding anyway", event="error", error=str(e), **fields)
+
+    def update_price(self, product_url, ean_id):
+        """
+        Gets price of the supplied ean using the supplied product page
+        """
+        price_val = self.fetch_price(product_url)
+
+        return self.store_price(ean_id, price_val)
+
+    def store_price(self, ean_id, price_val):
+        """
+        Registers the price of the supplied ean in the database
+        """
+        if price_val == UNCHANGED:
+            self.count("unchanged")
+            self.log(f"{ean_id} Page unchanged; skipping", event="unchanged", ean=ean_id)
+            # The current price was still seen
+            self.writer.seen_price(ean_id, self.shop.id)
+            if self.schedule is not None:
+                self.schedule.observe(ean_id, unchanged=True)
+            return True
+
+        if self.schedule is not None:
+            self.schedule.observe(ean_id, price_val)
+
+        if price_val is None:
+            self.count("no_price")
+            self.log(f"{ean_id} No price found", event="no_price", ean=ean_id)
+            return False
+
+        self.count("price")
+        self.log(f"{ean_id} Price {price_val}", event="price", ean=ean_id, price=price_val)
+        self.writer.add_price(ean_id, self.shop.id, price_val)
+        self.cache_when_stored()
+
+        return True
+
+    def cache_when_stored(self):
+        """
+        Writes the cache entry of the page read last once the rows buffered
+        for it were committed. Otherwise a page whose rows got lost would be
+        skipped as unchanged by the next run
+        """
+        if self.validated is not None:
+            self.writer.after_commit(partial(self.cache.store_entry, self.validated))
+            self.validated = None
+
+    def seed_frontier(self):
+        """
+        Marks the urls of all known product pages of this shop as seen so
+        listings only queue products which are actually new
+        """
+        if not self.seeded:
+            self.frontier.seed(self.known.shop_pages(self.shop.id).values())
+            self.seeded = True
+
+    def http_client(self):
+        """
+        Returns the httpx client plain requests, e.g. of sitemaps, are made with
+        """
+        raise NotImplementedError
+
+    def sitemap_urls(self):
+        """
+        Returns the sitemaps of the shop, read from its robots.txt unless the
+        plugin names them
+        """
+        if self.sitemaps:
+            return list(self.sitemaps)
+
+        self.limiter.wait()
+        r = self.http_client().get(urljoin(self.base_url, "/robots.txt"))
+        found = robots_sitemaps(r.text) if r.status_code < 400 else []
+
+        return found if found else [urljoin(self.base_url, "/sitemap.xml")]
+
+    def read_sitemap(self, url):
+        """
+        Yields the entries of a sitemap or sitemap index while it is
+        downloaded, the document is never held in memory as a whole
+        """
+        parser = SitemapParser()
+
+        self.limiter.wait()
+        with self.http_client().stream("GET", url) as r:
+            METRICS.response(r.status_code, shop=self.name)
+            if r.status_code >= 400:
+                self.log(f"{url} returned {r.status_code}", event="http_error", url=url, status=r.status_code)
+                return
+
+            for chunk in r.iter_bytes():
+                yield from parser.feed(chunk)
+
+        yield from parser.close()
+
+    def discover(self, workers=None, batch=1000):
+        """
+        Queues the product pages in the sitemaps of the shop which are new or
+        were modified since the last discovery and crawls them. Sitemaps
+        which were not modified since then are skipped altogether
+        """
+        since = self.frontier.last_discovery("sitemap")
+        started = time()
+        pattern = re.compile(self.product_pattern) if self.product_pattern else None
+
+        self.seed_frontier()
+
+        todo = self.sitemap_urls()
+        read = set()
+        listed = new = changed = 0
+        while todo:
+            sitemap_url = todo.pop()
+            if sitemap_url in read:
+                continue
+            read.add(sitemap_url)
+
+            unmodified, modified = [], []
+            for entry in self.read_sitemap(sitemap_url):
+                if entry.kind == "sitemap":
+                    if since is None or entry.lastmod is None or entry.lastmod > since:
+                        todo.append(entry.loc)
+                    continue
+
+                if pattern and not pattern.search(entry.loc):
+                    continue
+
+                listed += 1
+                # Pages modified since the last discovery are crawled again,
+                # all others only if they are new
+                if since is not None and entry.lastmod is not None and entry.lastmod > since:
+                    modified.append(entry.loc)
+                else:
+                    unmodified.append(entry.loc)
+
+                if len(unmodified) + len(modified) >= batch:
+                    new += self.frontier.add(unmodified)
+                    changed += self.frontier.requeue(modified)
+                    unmodified, modified = [], []
+
+            new += self.frontier.add(unmodified)
+            changed += self.frontier.requeue(modified)
+
+        # Only a complete discovery moves the point later ones start from
+        self.frontier.discovered("sitemap", started)
+        self.count("listed", listed)
+        self.log(
+            f"{len(read)} sitemaps read, {new} new and {changed} modified of {listed} products",
+            event="discover", sitemaps=len(read), new=new, modified=changed, listed=listed
+        )
+
+        self.crawl(self.frontier.pending(), workers=workers)
+        self.writer.flush()
+        self.frontier.commit()
+
+        return True
+
+    def populate_from_list(self, product_list_url, workers=None):
+        """
+        Calls the get_product function to each new product found in the
+        supplied list
+        """
+        results = self.list_products(product_list_url)
+
+        self.seed_frontier()
+        new = self.frontier.add(results)
+        self.count("listed", len(results))
+        self.log(f"{new}/{len(results)} products are new", event="list", url=product_list_url, new=new, listed=len(results))
+
+        # Also resumes urls left over from an interrupted run
+        self.crawl(self.frontier.pending(), workers=workers)
+        self.writer.flush()
+        self.frontier.commit()
+
+        return True
+
+    def crawl(self, urls, workers=None):
+        """
+        Gets the products of all supplied urls and removes them from the
+        frontier, see done
+        """
+        self.warm_up()
+
+        for url in urls:
+            try:
+                self.log(url, event="crawl", url=url)
+                self.get_product(url)
+            except Exception as e:
+                self.error(e, url=url)
+            finally:
+                self.done(url)
+
+    def done(self, url):
+        """
+        Removes a crawled url from the frontier once the rows buffered for it
+        were committed. Otherwise products whose rows got lost would never be
+        crawled again
+        """
+        self.writer.after_commit(partial(self.frontier.done, url))
+
+    def get_product(self, product_url):
+        """
+        Gets product information of the supplied product page
+        """
+        result = self.fetch_product(product_url)
+
+        return self.store_product(result, product_url)
+
+    def store_product(self, result, product_url):
+        """
+        Registers the product, its product page and its price in the database
+        if they do not exist yet
+        """
+        if result == UNCHANGED:
+            self.count("unchanged")
+            self.log("Page unchanged; skipping", event="unchanged", url=product_url)
+            return True
+
+        if not result:
+            self.count("no_product")
+            return False
+
+        self.log(f"Found Product {result['name']}", event="product", ean=result["ean"], url=product_url)
+
+        # Check if Product exists in database and add it if not
+        if not self.known.has_product(result["ean"]):
+            if not self.known.has_unit("pcs"):
+                self.writer.add_unit("pcs")
+                self.known.add_unit("pcs")
+            self.count("new_product")
+            self.log("...Constructing Database Product Object", event="new_product", ean=result["ean"])
+            self.writer.add_product(result["ean"], result["name"], result["description"], result["amount"], "pcs")
+            self.known.add_product(result["ean"])
+        else:
+            self.log(f"...EAN exists: {result['ean']}", event="known_product", ean=result["ean"])
+
+        # Check if product page is registered and add it if not
+        # TODO: Also update product page if necessary
+        if not self.known.has_page(result["ean"], self.shop.id):
+            url = product_url.partition("?")[0]
+            self.count("new_page")
+            self.log("...Constructing Database ProductPage Object", event="new_page", ean=result["ean"])
+            self.writer.add_page(result["ean"], self.shop.id, url)
+            self.known.add_page(result["ean"], self.shop.id, url)
+
+        # Register Price in Database
+        if result.get("price") is not None:
+            self.count("price")
+            self.log(f"{result['ean']} Price {result['price']}", event="price", ean=result["ean"], price=result["price"])
+            self.writer.add_price(result["ean"], self.shop.id, result["price"])
+        self.cache_when_stored()
+
+        return True
+
+class HttpScraper(ShopScraper):
+    """
+    Base of scrapers reading server rendered pages with a httpx client.
+    Plugins implement parse_list, parse_price and parse_product on the page
+    source.
+    """
+
+    def __init__(self, client, *args, **kwargs):
+        super().__init__(client, *args, **kwargs)
+        self.session = client
+
+    def http_client(self):
+        return self.session
+
+    def parse_list(self, text):
+        """
+        Returns the product urls found in a product list page
+        """
+        raise NotImplementedError
+
+    def parse_price(self, text):
+        """
+        Returns the price found in a product page or None
+        """
+        raise NotImplementedError
+
+    def parse_product(self, text):
+        """
+        Returns the product information found in a product page or None
+        """
+        raise NotImplementedError
+
+    def fetch(self, url, headers=None):
+        """
+        Requests url respecting the rate limit of the shop
+        """
+        self.limiter.wait()
+        with self.timer("fetch"):
+            r = self.session.get(url, headers=headers)
+        self.limiter.feedback(r.status_code, r.elapsed.total_seconds(), served_from_cache(r.headers))
+        METRICS.response(r.status_code, shop=self.name)
+
+        return r
+
+    def conditional_headers(self, product_url):
+        """
+        Returns the headers making a request to the supplied url conditional
+        """
+        return self.cache.headers(product_url) if self.cache else {}
+
+    def read(self, r, product_url, parse, kind="price"):
+        """
+        Applies parse to the body of a fetched product page of the supplied
+        kind ("price" or "product").
+        Pages which did not change since they were processed last are not
+        parsed at all. The page is only remembered in the cache once its rows
+        were committed, see cache_when_stored
+        """
+        self.validated = None
+        if self.cache and self.cache.unchanged(product_url, r):
+            return UNCHANGED
+
+        if r.status_code >= 400:
+            self.log(f"{product_url} returned {r.status_code}", event="http_error", url=product_url, status=r.status_code)
+            return None
+
+        if self.archive:
+            self.archive.store(self.shop.id, self.name, product_url, kind, r.text)
+
+        with self.timer("parse"):
+            result = parse(r.text)
+
+        if result is not None and self.cache:
+            self.validated = self.cache.entry(product_url, r)
+
+        return result
+
+    def list_products(self, product_list_url):
+        r = self.fetch(product_list_url)
+
+        if r.status_code >= 400:
+            self.log(f"{product_list_url} returned {r.status_code}", event="http_error", url=product_list_url, status=r.status_code)
+            return []
+
+        with self.timer("parse"):
+            return self.parse_list(r.text)
+
+    def fetch_price(self, product_url):
+        r = self.fetch(product_url, headers=self.conditional_headers(product_url))
+
+        return self.read(r, product_url, self.parse_price)
+
+    def fetch_product(self, product_url):
+        r = self.fetch(product_url, headers=self.conditional_headers(product_url))
+
+        return self.read(r, product_url, self.parse_product, kind="product")
+
+    async def update_stored_async(self, concurrency=8):
+        """
+        Asynchronous variant of update_stored. Stale pages are fetched
+        concurrently with at most `concurrency` requests in flight per host.
+        A failing page is reported and skipped without affecting the others.
+        """
+
+        stale = [(page.url, page.ean_id) for page in self.due_pages()]
+
+        # A sync connection can not be shared with asyncio, so the async client
+        # mirrors the settings of self.session. With HTTP/2 all requests to one
+        # host are multiplexed over a single connection.
+        async with httpx.AsyncClient(
+            http2=True,
+            headers=self.session.headers,
+            timeout=self.session.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=concurrency)
+        ) as client:
+            semaphores = {}
+
+            async def refresh(product_url, ean_id):
+                host = urlparse(product_url).netloc
+                semaphore = semaphores.setdefault(host, asyncio.Semaphore(concurrency))
+                try:
+                    async with semaphore:
+                        await self.limiter.wait_async()
+                        r = await client.get(product_url, headers=self.conditional_headers(product_url))
+                    self.limiter.feedback(r.status_code, r.elapsed.total_seconds(), served_from_cache(r.headers))
+                    self.observe("fetch", r.elapsed.total_seconds())
+                    METRICS.response(r.status_code, shop=self.name)
+                    return self.store_price(ean_id, self.read(r, product_url, self.parse_price))
+                except Exception as e:
+                    self.error(e, ean=ean_id, url=product_url)
+                    return False
+
+            results = await asyncio.gather(*(refresh(url, ean) for url, ean in stale))
+
+        self.log(f"Updated {sum(results)}/{len(stale)} due pages", event="updated", updated=sum(results), due=len(stale))
+        return results
+
+class BrowserScraper(ShopScraper):
+    """
+    Base of scrapers which have to render pages in a selenium driver.
+    Pages can be spread across a pool of browser processes.
+    Hybrid plugins first try to read prices from the server rendered page with
+    a plain request and only render the pages where that fails.
+    """
+
+    browser = True
+    hybrid = False # Whether prices are read without the browser if possible
+    hosts = None # Domains the browser may load from, defaults to the one of base_url
+
+    def __init__(self, client, *args, session=None, paths=None, **kwargs):
+        super().__init__(client, *args, **kwargs)
+        self.driver = client
+        self.wait = WebDriverWait(self.driver, timeout=10)
+        self.initialized = False # Set by warm_up
+        self.session = session # httpx client of the hybrid path, created when needed
+        self.shared = False # Whether the browser cookies were copied, see share_session
+        # Which path worked for each page, in memory unless a persistent one is supplied
+        self.paths = paths if paths is not None else FetchPaths(path=":memory:")
+        self.load_times = []
+        self.load_total = 0.0 # Seconds spent loading pages, see render
+
+    @classmethod
+    def allowed_hosts(cls, base_url=None):
+        """
+        Returns the domains the browser of this plugin may load from. If
+        base_url differs from the one of the plugin (e.g. a stand-in server)
+        only its host
+        """
+        if base_url in (None, cls.base_url):
+            if cls.hosts:
+                return list(cls.hosts)
+            base_url = cls.base_url
+
+        host = urlparse(base_url).hostname
+        return [host[4:] if host.startswith("www.") else host]
+
+    @classmethod
+    def make_driver(cls, headless=True, base_url=None):
+        """
+        Creates a lean browser for this plugin, see helper.driver
+        """
+        return make_driver(headless=headless, hosts=cls.allowed_hosts(base_url))
+
+    def load(self, url):
+        """
+        Loads url in the browser respecting the rate limit of the shop
+        """
+        self.limiter.wait()
+        start = monotonic()
+        self.driver.get(url)
+        elapsed = monotonic() - start
+        self.limiter.feedback(None, elapsed)
+
+        self.load_times.append(elapsed)
+        self.load_total += elapsed
+        self.observe("render", elapsed)
+        self.log(f"Loaded {url} in {elapsed:.2f}s", event="load", url=url, seconds=elapsed)
+
+    def render(self, method, *args):
+        """
+        Calls a method of the plugin reading a page in the browser. The time
+        not spent loading pages is recorded as parse time
+        """
+        start = monotonic()
+        loaded = self.load_total
+        try:
+            return method(*args)
+        finally:
+            self.observe("parse", monotonic() - start - (self.load_total - loaded))
+
+    def wait_ready(self, timeout=10):
+        """
+        Waits until the current page finished loading
+        """
+        WebDriverWait(self.driver, timeout).until(
+            lambda driver: driver.execute_script("return document.readyState") == "complete"
+        )
+
+    def load_summary(self):
+        """
+        Returns a short report of the page load times of this scraper
+        """
+        if not self.load_times:
+            return "No pages loaded"
+
+        return "{count} pages loaded, {mean:.2f}s on average, {longest:.2f}s at most".format(
+            count=len(self.load_times),
+            mean=sum(self.load_times) / len(self.load_times),
+            longest=max(self.load_times)
+        )
+
+    def render_price(self, product_url):
+        """
+        Reads the price from the supplied product page rendered in the browser.
+        Returns None if no valid price was found
+        """
+        raise NotImplementedError
+
+    def parse_price(self, text):
+        """
+        Returns the price found in the server rendered product page or None.
+        Only used by hybrid plugins
+        """
+        return structured_price(text)
+
+    def http_client(self):
+        if self.session is None:
+            self.session = make_http_client()
+
+        return self.session
+
+    def share_session(self):
+        """
+        Warms the browser up and copies its cookies into the httpx client
+        once, so plain requests see the pages like the browser session, e.g.
+        with the customer type chosen in warm_up. Without a browser the
+        client is used as is
+        """
+        if self.shared or self.driver is None:
+            return
+
+        self.warm_up()
+        client = self.http_client()
+        for cookie in self.driver.get_cookies():
+            client.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+        self.shared = True
+
+    def fetch_price_http(self, product_url):
+        """
+        Reads the price from the supplied product page without the browser.
+        Returns None if the page does not contain it
+        """
+        self.limiter.wait()
+        try:
+            with self.timer("fetch"):
+                r = self.http_client().get(product_url)
+        except httpx.HTTPError as e:
+            self.count("network_error")
+            self.log(f"Plain request failed: {e}", event="network_error", url=product_url, error=str(e))
+            return None
+        self.limiter.feedback(r.status_code, r.elapsed.total_seconds(), served_from_cache(r.headers))
+        METRICS.response(r.status_code, shop=self.name)
+
+        if r.status_code >= 400:
+            return None
+
+        if self.archive:
+            self.archive.store(self.shop.id, self.name, product_url, "price", r.text)
+
+        with self.timer("parse"):
+            return self.parse_price(r.text)
+
+    def refresh_http(self, product_url, ean_id):
+        """
+        Updates the price of the supplied ean without the browser if the page
+        allows it. Returns False if the page still has to be rendered
+        """
+        if self.hybrid:
+            self.share_session()
+        if not self.hybrid or not self.paths.try_http(product_url):
+            return False
+
+        try:
+            price_val = self.fetch_price_http(product_url)
+        except Exception as e:
+            self.error(e, ean=ean_id, url=product_url)
+            price_val = None
+
+        self.paths.record(product_url, "http", price_val is not None)
+
+        return price_val is not None and self.store_price(ean_id, price_val)
+
+    def fetch_price(self, product_url):
+        if self.hybrid:
+            self.share_session()
+        if self.hybrid and self.paths.try_http(product_url):
+            price_val = self.fetch_price_http(product_url)
+            self.paths.record(product_url, "http", price_val is not None)
+            if price_val is not None:
+                return price_val
+
+        self.warm_up()
+        price_val = self.render(self.render_price, product_url)
+        self.paths.record(product_url, "browser", price_val is not None)
+
+        return price_val
+
+    def update_stored(self, workers=None):
+        """
+        Iterates through the product pages of this shop which are due and
+        updates their prices on each page.
+        If workers is set, the pages are spread across that many browser
+        processes instead.
+        """
+        pages = self.due_pages()
+
+        # Pages read without the browser do not have to be rendered at all
+        if self.hybrid:
+            pages = [page for page in pages if not self.refresh_http(page.url, page.ean_id)]
+            self.log(f"{len(pages)} pages left to render", event="render_left", pages=len(pages))
+
+        if not pages:
+            self.log(self.paths.summary(), event="paths", **self.paths.counts)
+            return
+
+        if workers:
+            pool = DriverPool(type(self), workers=workers, limiter=self.limiter, base_url=self.base_url)
+            urls = {page.ean_id: page.url for page in pages}
+            tasks = [(page.ean_id, (page.url,)) for page in pages]
+            for ean_id, price_val, error in pool.map("render_price", tasks):
+                if error:
+                    self.error(error, ean=ean_id, url=urls[ean_id])
+                self.paths.record(urls[ean_id], "browser", not error and price_val is not None)
+                if not error:
+                    self.store_price(ean_id, price_val)
+        else:
+            self.warm_up()
+            for page in pages:
+                self.log(f"{page.ean_id}... Updating", event="update", ean=page.ean_id)
+                try:
+                    price_val = self.render(self.render_price, page.url)
+                    self.paths.record(page.url, "browser", price_val is not None)
+                    self.store_price(page.ean_id, price_val)
+                except Exception as e:
+                    self.paths.record(page.url, "browser", False)
+                    self.error(e, ean=page.ean_id, url=page.url)
+            self.log(self.load_summary(), event="load_summary")
+
+        self.log(self.paths.summary(), event="paths", **self.paths.counts)
+
+    def get_product(self, product_url):
+        result = self.render(self.fetch_product, product_url)
+
+        return self.store_product(result, product_url)
+
+    def crawl(self, urls, workers=None):
+        """
+        Gets the products of all supplied urls and removes them from the
+        frontier.
+        If workers is set, the products are fetched by that many browser
+        processes instead.
+        """
+        if not workers:
+            super().crawl(urls)
+            self.log(self.load_summary(), event="load_summary")
+            return
+
+        pool = DriverPool(type(self), workers=workers, limiter=self.limiter, base_url=self.base_url)
+        tasks = [(url, (url,)) for url in urls]
+        for url, product, error in pool.map("fetch_product", tasks):
+            if error:
+                self.error(error, url=url)
+            else:
+                self.store_product(product, url)
+            self.done(url)
@@ -3,9 +3,6 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.support import expected_conditions as EC
-from datetime import datetime,timedelta
-from time import sleep
-from random import randint
 import os,sys
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,67 +11,67 @@ src_dir = os.path.abspath(os.path.join(current_dir,'../../../'))
 if src_dir not in sys.path:
     sys.path.append(src_dir)
 
-from helper.data import get_latest_prices
-from datahandler.models import Product, Price, Shop, Unit, ProductPage
+from .base import BrowserScraper
 
-class Conrad:
+class Conrad(BrowserScraper):
     """
     Scrapes conrad
     """
 
     # https://www.conrad.de/de/c/papiere-bloecke-40094.html
-    def __init__(self, driver, database_connection, shop):
-        self.base_url = "https://www.conrad.de"
-        self.driver = driver
-        self.shop = shop
-        self.initialized = False
-        self.wait = wait = WebDriverWait(self.driver, timeout=10)
-        self.db = database_connection
-        self.to_crawl = [] # List of urls to crawl
-        self.crawled = [] # List of eans already crawled 
-
-    def update_stored(self, rand_range=(0,500)):
+    name = "conrad"
+    base_url = "https://www.conrad.de"
+    product_pattern = r"/p/[^/]+-\d+\.html" # Product pages in the sitemaps
+    # Product pages embed the price as JSON-LD offer. Business customers see
+    # net prices, so warm_up switches the browser session to private customer
+    # and plain requests are sent with its cookies
+    hybrid = True
+    customer_toggle = "/html/body/div[2]/div/header/div[2]/div/div[2]/ul/li[2]/div[1]/button"
+    switched = False # Whether warm_up tried to switch to private customer
+
+    def warm_up(self):
         """
-        Iterates through the stored product pages for this shop and updates
-        their prices on each page
+        Opens the shop once so the following page loads are served with the
+        session cookies set and switches the session to private customer.
+        Prices are only rendered if that fails
         """
-
         if not self.initialized:
-            self.driver.get(self.base_url)
-            sleep(10)
+            self.load(self.base_url)
+            self.wait_ready()
             self.initialized = True
 
-        now = datetime.now()
-
-        limit = timedelta(hours=24)
-
-        pages = self.db.query(ProductPage).filter_by(shop_id=self.shop.id).all()
+        if not self.switched:
+            self.switched = True
+            if not self.private_customer():
+                self.hybrid = False
 
-        for page in pages:
-            latest = [price for price in get_latest_prices(self.db, page.ean_id) if price.shop_id == self.shop.id]
-            delta = (now - latest[0][2]) if latest else None
-
-            if delta is not None and delta < limit:
-                print(f"{page.ean_id} Recent value exists; skipping")
-            else:
-                print(f"{page.ean_id}... Updating")
-                try:
-                    self.update_price(page.url, page.ean_id)
-                except Exception as e:
-                    print(f"Request resulted in Exception: {e}\n")
-                    print("Proceeding Anyway")
-                finally:
-                    sleep(randint(rand_range[0], rand_range[1])/1000)
+    def private_customer(self):
+        """
+        Switches the session to private customer so prices include VAT.
+        Returns False if that failed
+        """
+        try:
+            selector = self.driver.find_element(By.XPATH, self.customer_toggle)
+            if "Geschäftskunde" in selector.text:
+                selector.click()
+                box = self.driver.find_element(By.XPATH, "/html/body/div[2]/div/header/div[2]/div/div[2]/ul/li[2]/div[1]/div/button/div")
+                box.click()
+                # The page is updated in place once the switch went through
+                WebDriverWait(self.driver, 10).until(
+                    lambda driver: "Geschäftskunde" not in driver.find_element(By.XPATH, self.customer_toggle).text
+                )
+        except:
+            print("Could not set me to private customer")
+            return False
 
+        return True
 
-    def populate_from_list(self, product_list_url, rand_range=(0,500)):
+    def list_products(self, product_list_url):
         """
-        Calls the get_product function to each product found in the supplied list
-        can be instructed to wait a random amount in between from a given range
-        by setting rand_range to a tuple of (min, max) in milliseconds.
+        Returns the urls of all products found in the supplied list
         """
 
-        self.driver.get(product_list_url)
+        self.load(product_list_url)
 
         # Accept fucking cookies
         #try:
@@ -87,16 +84,15 @@ class Conrad:
         #except:
             #print("No cookie banner found")
 
-        if not self.initialized:
-            sleep(10)
-            self.initialized = True
-
         results = []
 
-        search_container = WebDriverWait(self.driver, 7).until(
+        # The first list may take a while as the session is set up with it
+        search_container = WebDriverWait(self.driver, 7 if self.initialized else 17).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, "#scroller"))
         )
 
+        self.initialized = True
+
         search_results = search_container.find_elements(By.XPATH, "./*")
 
         for child in search_results:
@@ -105,53 +101,31 @@ class Conrad:
                 link = self.base_url + link
             results.append(link)
 
-        for result in results:
-            try:
-                print(result)
-                self.get_product(result)
-            except Exception as e:
-                print(f"Request resulted in Exception: {e}\n")
-                print("Proceeding Anyway")
-            finally:
-                sleep(randint(rand_range[0], rand_range[1])/1000)
-
-        return True
-
+        return results
 
-    def update_price(self, product_url, ean_id):
+    def render_price(self, product_url):
         """
-        Gets price of the supplied ean using the supplied product page
+        Reads the price from the supplied product page rendered in the browser.
+        Returns None if no valid price was found
         """
-        self.driver.get(product_url)
+        self.load(product_url)
 
         price_obj = WebDriverWait(self.driver, 5).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, '#productPriceUnitPrice'))
         )
 
         try:
-            price_val = float(price_obj.text.replace(",",".").replace("€","").strip())
+            return float(price_obj.text.replace(",",".").replace("€","").strip())
         except ValueError:
             print("Price invalid")
-            return False
+            return None
 
-        # Register Price in Database
-        print("...Constructing Database Price Object")
-        price = Price()
-        price.ean_id = ean_id
-        price.value = price_val
-        price.shop_id = self.shop.id
-        price.date = datetime.now()
-
-        self.db.add(price)
-        self.db.commit()
-
-        return True
-
-    def get_product(self, product_url):
+    def fetch_product(self, product_url):
         """
-        Gets product information of the supplied product page
+        Reads the product information from the supplied product page.
+        Returns None if the page could not be read
         """
-        self.driver.get(product_url)
+        self.load(product_url)
 
         # Accept fucking cookies
         #try:
@@ -167,20 +141,10 @@ class Conrad:
         result = {}
 
         # Ensure we get price with VAT
-        try:
-            selector = self.driver.find_element(By.XPATH, "/html/body/div[2]/div/header/div[2]/div/div[2]/ul/li[2]/div[1]/button")
-            if "Geschäftskunde" in selector.text:
-                selector.click()
-                box = self.driver.find_element(By.XPATH, "/html/body/div[2]/div/header/div[2]/div/div[2]/ul/li[2]/div[1]/div/button/div")
-                box.click()
-                sleep(3)
-        except:
-            print("Could not set me to private customer")
-            return False
+        if not self.private_customer():
+            return None
 
-        WebDriverWait(self.driver, 10).until(
-            lambda driver: driver.execute_script('return document.readyState') == 'complete'
-        )
+        self.wait_ready()
 
         title = self.driver.find_element(By.CSS_SELECTOR, '#ProductTitle')
         description = WebDriverWait(self.driver, 5).until(
@@ -200,13 +164,13 @@ class Conrad:
             result["price"] = float(price.text.replace(",",".").replace("€","").strip())
         except ValueError:
             print("Price invalid")
-            return False
+            return None
 
         try:
             result["ean"] = int(ean.text.strip())
         except ValueError:
             print("Ean Invalid")
-            return False
+            return None
 
         if props:
             try:
@@ -225,46 +189,4 @@ class Conrad:
         else:
             result["amount"] = 1
 
-        print(f"Found Product {result['name']}")
-
-        # Check if Product exists in database and add it if not
-        product = self.db.query(Product).filter_by(ean_id=result["ean"]).first()
-        if result["ean"] and not product:
-            print("...Constructing Database Product Object")
-            product = Product()
-            product.ean_id = result["ean"]
-            product.name = result["name"]
-            product.description = result["description"]
-            product.amount = result["amount"]
-            product.unit = self.db.query(Unit).filter_by(name="pcs").first()
-
-            self.db.add(product)
-            self.db.commit()
-        else:
-            print(f"...EAN exists: result['ean']")
-
-        # Check if product page is registered and add it if not
-        # TODO: Also update product page if necessary
-        page = self.db.query(ProductPage).filter_by(ean_id=result["ean"], shop_id=self.shop.id).first()
-        if not page:
-            print("...Constructing Databasse ProductPage Object")
-            page = ProductPage()
-            page.ean = product
-            page.shop = self.shop
-            page.url = product_url.partition("?")[0]
-
-            self.db.add(page)
-            self.db.commit()
-
-        # Register Price in Database
-        print("...Constructing Database Price Object")
-        price = Price()
-        price.ean = product
-        price.value = result["price"]
-        price.shop_id = self.shop.id
-        price.date = datetime.now()
-
-        self.db.add(price)
-        self.db.commit()
-
-        return True
+        return result
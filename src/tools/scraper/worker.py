@@ -0,0 +1,171 @@
+"""
+Scrape worker daemon. Any number of workers on any number of hosts can work
+through the shared scrapejob queue at the same time.
+
+    python src/tools/scraper/worker.py enqueue   # queue due pages and list crawls
+    python src/tools/scraper/worker.py work      # work through the queue until stopped
+
+Every worker applies the rate limit of a shop on its own, so the limits in
+scrapeconfig are per worker.
+"""
+from argparse import ArgumentParser
+from dotenv import load_dotenv
+from time import sleep
+import signal
+import socket
+import os,sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir,'../../'))
+
+if src_dir not in sys.path:
+    sys.path.append(src_dir)
+
+from datahandler.models import Shop, ScrapeConfig
+from datahandler.migrate import upgrade_schema, upgrade_data
+from datahandler.writer import BulkWriter
+
+from sites import SITES
+from helper.jobs import JobQueue
+from helper.known import KnownRows
+from helper.metrics import METRICS, metrics_path
+from helper.schedule import RefreshSchedule
+from run import search, get_session, make_scraper, close_scraper
+
+def get_shops(db, names=None):
+    """
+    Returns (shop, site name) of all shops with a known site plugin,
+    optionally only those of the supplied plugins
+    """
+    configs = db.query(ScrapeConfig).filter(ScrapeConfig.site.in_(names if names else list(SITES))).all()
+
+    return [(db.query(Shop).filter_by(id=config.shop_id).first(), config.site) for config in configs]
+
+def enqueue(db, args):
+    """
+    Queues the price refreshes of all due pages and the configured product
+    lists. Meant to be run periodically, e.g. by cron
+    """
+    queue = JobQueue(db, socket.gethostname())
+
+    for shop, site_name in get_shops(db, args.shops):
+        # The schedule is only read here, the workers write it
+        schedule = RefreshSchedule.for_shop(db, shop, None)
+        schedule.load()
+        pages = schedule.due()
+
+        prices = queue.enqueue(shop.id, "price", [(page.ean_id, page.url) for page in pages])
+        lists = queue.enqueue(shop.id, "list", [(None, url) for url in search.get(site_name, [])])
+
+        print(f"{shop.name}: queued {prices}/{len(pages)} due pages and {lists} lists")
+
+def run_job(scraper, job):
+    """
+    Runs a single job, raises if it failed
+    """
+    if job.kind == "price":
+        # A page without a price is not a failed job, store_price already
+        # scheduled it again after min_interval
+        scraper.update_price(job.url, job.ean_id)
+    elif job.kind == "list":
+        scraper.populate_from_list(job.url)
+    else:
+        raise ValueError(f"Unknown job kind {job.kind}")
+
+def work(db, args):
+    """
+    Claims and runs jobs until stopped with SIGINT / SIGTERM. The current
+    batch is finished before the worker exits
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(db, owner, lease=args.lease)
+    writer = BulkWriter(db, observer=lambda seconds, rows: METRICS.observe("db", seconds))
+    shops = {shop.id: (shop, site_name) for shop, site_name in get_shops(db, args.shops)}
+    scrapers = {}
+    # Shared by all scrapers and reloaded hourly to pick up rows of other workers
+    known = KnownRows(db, max_age=3600)
+
+    stopping = []
+    def stop(signum, frame):
+        print("Stopping after the current batch")
+        stopping.append(signum)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"Worker {owner} started for {', '.join(site for shop, site in shops.values())}")
+
+    try:
+        while not stopping:
+            queue.expire()
+            jobs = queue.claim(list(shops), limit=args.batch)
+
+            if not jobs:
+                if args.once:
+                    break
+                sleep(args.idle)
+                continue
+
+            # Scrapers are created on first use and kept for later batches
+            for shop_id in {job.shop_id for job in jobs}:
+                if shop_id not in scrapers:
+                    shop, site_name = shops[shop_id]
+                    scraper = make_scraper(db, shop, site_name, writer, known)
+                    scraper.schedule = RefreshSchedule.for_shop(db, shop, writer)
+                    scrapers[shop_id] = scraper
+                scrapers[shop_id].schedule.track(
+                    [job.ean_id for job in jobs if job.shop_id == shop_id and job.kind == "price"]
+                )
+
+            done = []
+            # All jobs of the batch stay leased until they are completed,
+            # finished ones too as their results are only flushed at the end
+            with queue.leased(jobs):
+                for job in jobs:
+                    try:
+                        run_job(scrapers[job.shop_id], job)
+                        done.append(job)
+                    except Exception as e:
+                        scrapers[job.shop_id].count("job_failed")
+                        print(f"Job {job.id} ({job.kind} {job.url}) failed: {e}")
+                        queue.fail(job, e)
+
+                # Results are written before their jobs are removed
+                writer.flush()
+            queue.complete(done)
+            print(f"Finished {len(done)}/{len(jobs)} jobs")
+            METRICS.write(metrics_path(f"worker-{os.getpid()}"))
+    finally:
+        writer.close()
+        for scraper in scrapers.values():
+            close_scraper(scraper)
+        METRICS.write(metrics_path(f"worker-{os.getpid()}"))
+
+def main():
+    parser = ArgumentParser(description="Scrape worker working through the shared job queue")
+    parser.add_argument("--shops", nargs="*", default=None, choices=list(SITES), help="only these site plugins")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_enqueue = commands.add_parser("enqueue", help="queue due pages and product lists")
+    parser_enqueue.set_defaults(function=enqueue)
+
+    parser_work = commands.add_parser("work", help="work through the queue")
+    parser_work.add_argument("--batch", type=int, default=10, help="jobs claimed at once")
+    parser_work.add_argument("--lease", type=int, default=600, help="seconds a claim is valid without heartbeat")
+    parser_work.add_argument("--idle", type=float, default=30.0, help="seconds to wait if the queue is empty")
+    parser_work.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    parser_work.set_defaults(function=work)
+
+    args = parser.parse_args()
+
+    load_dotenv(".env")
+
+    db = get_session()
+    upgrade_schema(db.get_bind())
+    upgrade_data(db)
+    try:
+        args.function(db, args)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
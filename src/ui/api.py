@@ -5,8 +5,8 @@ from sqlalchemy import asc
 from datahandler import \
     db,Unit,Price,Shop,Product, \
     get_ean,get_database_stats,search_product_by_query,get_latest_prices, \
-    add_alternative,get_product_pages, \
-    ProductSchema,PriceSchema
+    add_alternative,get_product_pages,get_price_history, \
+    ProductSchema,PriceSchema,AUTOCOMPLETE
 
 appapi = Blueprint('appapi', __name__)
 
@@ -20,18 +20,31 @@ def api_add_alternative(product, alternative):
 def api_search(query):
     print(f"Searching... {query}")
     products_schema = ProductSchema(many=True)
-    results = search_product_by_query(db, query)
+    # The database is only searched until the index is loaded
+    if AUTOCOMPLETE.loaded is not None:
+        results = AUTOCOMPLETE.search(query)
+    else:
+        results = search_product_by_query(db, query)
     return {"results": products_schema.dump(results)}
     
 @appapi.route('/api/prices/<ean>')
 def api_prices(ean):
-    prices_schema = PriceSchema(many=True)
+    # from and to (ISO dates) limit the time range, max_points the points per
+    # shop, e.g. to the width of the chart
+    try:
+        start = datetime.fromisoformat(request.args["from"]) if request.args.get("from") else None
+        end = datetime.fromisoformat(request.args["to"]) if request.args.get("to") else None
+        max_points = int(request.args["max_points"]) if request.args.get("max_points") else None
+    except ValueError as e:
+        return {"error": f"Invalid parameter: {e}"}, 400
+
+    # A line needs its first, its last and at least one point in between
+    if max_points is not None and max_points < 3:
+        return {"error": "Invalid parameter: max_points has to be at least 3"}, 400
 
     product = Product.query.get(ean)
 
-    results = None
     if product:
-        return {"results": prices_schema.dump(product.prices)}
+        return {"results": get_price_history(db, product.ean_id, start, end, max_points)}
     else:
         return {"results": {}}
-
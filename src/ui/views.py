@@ -6,9 +6,9 @@ from sqlalchemy import asc
 
 from datahandler import \
     db,Unit,Price,Shop,Product, \
-    get_ean,get_database_stats,search_product_by_query,get_latest_prices, \
+    get_ean,get_database_stats,search_product_by_query,get_latest_prices,get_latest_prices_many, \
     add_alternative,get_product_pages, \
-    ProductSchema,PriceSchema
+    ProductSchema,PriceSchema,BulkWriter,AUTOCOMPLETE,count_statistics
 from ui.forms import ShopForm,ProductForm,ProductPriceForm,PurchaseForm,ImageUploadForm
 from helpers.barcode import read_barcodes
 
@@ -26,7 +26,8 @@ def overview():
         print(results)
     else: 
         results = []
-    return render_template("overview.html", query=query, results=results)
+    prices = get_latest_prices_many(db, [result.ean_id for result in results])
+    return render_template("overview.html", query=query, results=results, prices=prices)
 
 @appview.route('/add/photo', methods=['GET', 'POST'])
 def photo():
@@ -94,30 +95,23 @@ def add_productprice(shop):
             form.ean.data = ean
 
     if form.validate_on_submit():
-        price = Price()
-        price.ean = get_ean(int(form.ean.data))
-        price.value = form.price.data
-        price.shop_id = shop
-        price.date = date
-
-        db.session.add(price)
-        db.session.commit()
+        with BulkWriter(db.session) as writer:
+            writer.add_price(int(form.ean.data), shop, form.price.data, date)
 
         return redirect(f'/add/productprice/{shop}?date={int(date.timestamp())}', code=303)
 
     if productform.validate_on_submit():
-        product = Product()
-        product.ean_id = productform.ean.data
-        product.name = productform.name.data
-        product.description = productform.description.data
-        product.amount = productform.amount.data
-        product.unit = productform.unit.data
-        product.image = productform.image.data
-
-        db.session.add(product)
-        db.session.commit()
-
-        return redirect(f'/add/productprice/{shop}?date={int(date.timestamp())}&ean={product.ean_id}', code=303)
+        with BulkWriter(db.session) as writer:
+            writer.add_product(
+                productform.ean.data,
+                productform.name.data,
+                productform.description.data,
+                productform.amount.data,
+                productform.unit.data.name,
+                productform.image.data
+            )
+
+        return redirect(f'/add/productprice/{shop}?date={int(date.timestamp())}&ean={productform.ean.data}', code=303)
 
     if photoform.validate_on_submit():
         data = photoform.photo.data
@@ -149,6 +143,7 @@ def add_shop():
         shop.lat = form.lat.data
         
         db.session.add(shop)
+        count_statistics(db.session, {"shops": 1})
         db.session.commit()
 
     return render_template("add.html", form=form)
@@ -178,7 +173,9 @@ def add_product():
         product.image = form.image.data
 
         db.session.add(product)
+        count_statistics(db.session, {"products": 1})
         db.session.commit()
+        AUTOCOMPLETE.add(product.ean_id, product.name, product.description)
 
         return redirect(f'/view/product/{product.ean_id}', code=303)
 
@@ -186,15 +183,17 @@ def add_product():
 
 @appview.route('/view/product/<ean>')
 def view_product(ean):
-    price_overview = get_latest_prices(db, ean)
     product_pages = get_product_pages(db, ean)
     now = datetime.now()
     product = get_ean(ean)
     alts = product.alternatives + product.alternative_of
+    # Prices of the product and all alternatives in one query
+    prices = get_latest_prices_many(db, [product.ean_id] + [alt.ean_id for alt in alts])
+    price_overview = prices.get(product.ean_id, ([], None, None))[0]
     alternatives = []
     for alt in alts:
-        prices = get_latest_prices(db, alt.ean_id)
-        alternatives.append((alt, prices[0], prices[-1]))
+        alt_prices, lowest, highest = prices.get(alt.ean_id, ([], None, None))
+        alternatives.append((alt, lowest, highest))
     return render_template(
         "view_product.html",
         alternatives = alternatives,
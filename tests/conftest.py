@@ -0,0 +1,37 @@
+import os,sys
+
+import pytest
+import sqlalchemy
+from sqlalchemy.orm import sessionmaker
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for directory in (os.path.join(root_dir, "src"), os.path.join(root_dir, "src", "tools", "scraper")):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+
+from datahandler.models import base, Unit, Shop, Product
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session(engine):
+    """
+    Session on an empty database with the unit pcs, the shops 1 and 2 and
+    the products 1 to 3
+    """
+    session = sessionmaker(bind=engine)()
+    session.add(Unit(name="pcs"))
+    session.add(Shop(id=1, name="a"))
+    session.add(Shop(id=2, name="b"))
+    for ean_id in (1, 2, 3):
+        session.add(Product(ean_id=ean_id, name=f"Product {ean_id}", amount=1, unit_id="pcs"))
+    session.commit()
+
+    yield session
+    session.close()
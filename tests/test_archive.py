@@ -0,0 +1,51 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from bench.server import StandInServer, make_ean, make_price
+from datahandler.models import Product, ProductPage, Price
+from helper.archive import PageArchive
+from helper.reparse import reparse
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"))
+    yield archive
+    archive.close()
+
+def test_equal_bodies_are_stored_once(archive):
+    first = archive.store(1, "reichelt", "http://a/1", "price", "<p>1,00</p>", fetched_at=10.0)
+    second = archive.store(1, "reichelt", "http://a/1", "price", "<p>1,00</p>", fetched_at=20.0)
+
+    assert first == second
+    assert archive.load(first) == "<p>1,00</p>"
+    assert len(os.listdir(os.path.join(archive.path, "objects", first[:2]))) == 1
+    assert [row[3] for row in archive.fetches()] == [10.0, 20.0]
+
+def test_fetches_are_filtered(archive):
+    archive.store(1, "reichelt", "http://a/1", "price", "a", fetched_at=10.0)
+    archive.store(2, "reichelt", "http://b/1", "price", "b", fetched_at=20.0)
+    archive.store(1, "reichelt", "http://a/2", "price", "c", fetched_at=30.0)
+
+    assert [row[2] for row in archive.fetches([1])] == ["http://a/1", "http://a/2"]
+    assert [row[2] for row in archive.fetches(since=15.0, until=30.0)] == ["http://b/1"]
+
+def test_reparse_rewrites_prices_from_archived_pages(session, archive):
+    server = StandInServer(filler=1)
+    ean = make_ean(7)
+    session.add(Product(ean_id=ean, name="Product 7", amount=1, unit_id="pcs"))
+    session.add(ProductPage(ean_id=ean, shop_id=1, url="http://a/7"))
+    # Written by a parser which got the price wrong
+    for n in (1, 2):
+        session.add(Price(ean_id=ean, shop_id=1, value=99.0, date=datetime(2026, 1, n, 0, 0, 10)))
+    session.commit()
+
+    page = server.render_product("reichelt", 7)
+    for n in (1, 2):
+        archive.store(1, "reichelt", "http://a/7", "price", page, fetched_at=datetime(2026, 1, n).timestamp())
+    archive.commit()
+
+    assert reparse(session, archive, processes=1) == (1, 2, 1)
+    assert session.query(Price.value, Price.date, Price.last_seen).all() == \
+        [(round(make_price(7), 2), datetime(2026, 1, 1), datetime(2026, 1, 2))]
@@ -0,0 +1,76 @@
+import pytest
+
+import datahandler.autocomplete as autocomplete
+from datahandler.autocomplete import AutocompleteIndex, normalize, trigrams
+from datahandler.models import Product
+
+@pytest.fixture
+def index(session, engine):
+    for ean_id, name, description, popularity in (
+        (4006381333931, "AA Batterie", "Alkaline 1,5 V", 10),
+        (4006381333932, "AAA Batterie", None, 50),
+        (4006381333933, "Kabel USB-C", "Ladekabel 1 m", 5),
+        (4016138999999, "Lötzinn", "bleifrei, für Batteriehalter", 1),
+    ):
+        session.add(Product(ean_id=ean_id, name=name, description=description, amount=1, unit_id="pcs", popularity=popularity))
+    session.commit()
+
+    index = AutocompleteIndex()
+    index.load(engine)
+    return index
+
+def names(entries):
+    return [entry.name for entry in entries]
+
+def test_normalize_and_trigrams():
+    assert normalize("  USB-C  Kabel!") == "usb c kabel"
+    assert trigrams("usb") == {" us", "usb"}
+
+def test_prefix_matches_rank_by_popularity(index):
+    assert names(index.search("batt"))[:2] == ["AAA Batterie", "AA Batterie"]
+
+def test_name_matches_before_description_matches(index):
+    assert names(index.search("batterie"))[-1] == "Lötzinn"
+
+def test_substring_and_multiple_words(index):
+    assert names(index.search("atteri")) [:2] == ["AAA Batterie", "AA Batterie"]
+    assert names(index.search("kabel usb")) == ["Kabel USB-C"]
+    assert names(index.search("lötz")) == ["Lötzinn"]
+
+def test_ean_prefix(index):
+    assert sorted(names(index.search("400638133393"))) == ["AA Batterie", "AAA Batterie", "Kabel USB-C"]
+    assert names(index.search("4016")) == ["Lötzinn"]
+
+def test_no_match(index):
+    assert index.search("xyzq") == []
+    assert index.search("  ") == []
+
+def test_add_and_update(index):
+    index.add(1234567890123, "Quasar Batterie", "neu")
+    assert "Quasar Batterie" in names(index.search("quasar"))
+
+    index.add(1234567890123, "Pulsar Batterie", "neu")
+    assert index.search("quasar") == []
+    assert names(index.search("pulsar")) == ["Pulsar Batterie"]
+    assert names(index.search("1234")) == ["Pulsar Batterie"]
+
+def test_add_before_load_is_ignored():
+    index = AutocompleteIndex()
+    index.add(1, "Batterie", None)
+
+    assert index.entries == {}
+
+def test_add_while_loading_reaches_the_new_index(index, engine, monkeypatch):
+    session = autocomplete.Session
+
+    class Writing(session):
+        def __enter__(self):
+            # A product written by this process while the products are read
+            index.add(1234567890123, "Quasar Batterie", "neu")
+            return super().__enter__()
+
+    monkeypatch.setattr(autocomplete, "Session", Writing)
+    index.load(engine)
+
+    assert names(index.search("quasar")) == ["Quasar Batterie"]
+    assert not index.loading and index.pending == []
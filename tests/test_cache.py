@@ -0,0 +1,74 @@
+import httpx
+import pytest
+
+from datahandler.models import Shop, ProductPage
+from helper.cache import ResponseCache
+from helper.ratelimit import RateLimiter
+from sites.reichelt import Reichelt
+from sites.base import UNCHANGED
+
+def response(status_code=200, content=b"<p>1,00</p>", headers=None):
+    return httpx.Response(status_code, content=content, headers=headers)
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    yield cache
+    cache.close()
+
+def test_validators_make_requests_conditional(cache):
+    assert cache.headers("http://a/1") == {}
+
+    cache.store("http://a/1", response(headers={"etag": '"v1"', "last-modified": "Thu, 01 Jan 2026 00:00:00 GMT"}))
+
+    assert cache.headers("http://a/1") == {
+        "if-none-match": '"v1"',
+        "if-modified-since": "Thu, 01 Jan 2026 00:00:00 GMT"
+    }
+
+def test_unchanged_pages(cache):
+    cache.store("http://a/1", response())
+
+    assert cache.unchanged("http://a/1", response(304, b""))
+    assert cache.unchanged("http://a/1", response())
+    assert not cache.unchanged("http://a/1", response(content=b"<p>2,00</p>"))
+    assert not cache.unchanged("http://a/1", response(500))
+    assert not cache.unchanged("http://a/2", response())
+
+def test_failed_responses_are_not_remembered(cache):
+    assert cache.entry("http://a/1", response(404)) is None
+
+    cache.store("http://a/1", response(404))
+
+    assert not cache.unchanged("http://a/1", response(404))
+
+class Site(Reichelt):
+    def fetch(self, url, headers=None):
+        return self.responses.pop(0)
+
+@pytest.fixture
+def scraper(session, cache):
+    session.add(ProductPage(ean_id=1, shop_id=1, url="http://a/1"))
+    session.commit()
+    scraper = Site(None, session, session.get(Shop, 1), cache=cache, limiter=RateLimiter(rate=1000.0))
+    scraper.responses = [response(content=b'<p class="productPrice">1,00</p>')] * 2
+    return scraper
+
+def test_page_is_cached_once_its_price_was_committed(scraper):
+    scraper.update_price("http://a/1", 1)
+    assert scraper.cache._get("http://a/1") is None
+
+    scraper.writer.flush()
+
+    assert scraper.fetch_price("http://a/1") == UNCHANGED
+
+def test_page_is_not_cached_if_the_flush_fails(scraper, monkeypatch):
+    scraper.update_price("http://a/1", 1)
+
+    def fail():
+        raise RuntimeError("Lost connection")
+    monkeypatch.setattr(scraper.db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        scraper.writer.flush()
+
+    assert scraper.fetch_price("http://a/1") == 1.0
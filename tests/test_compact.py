@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from datahandler.compact import compact_prices, replace_prices
+from datahandler.models import Price, LatestPrice
+
+START = datetime(2026, 1, 1)
+
+def day(n):
+    return START + timedelta(days=n)
+
+def add(session, value, date, last_seen=None):
+    session.add(Price(ean_id=1, shop_id=1, value=value, date=date, last_seen=last_seen))
+
+def prices(session):
+    session.expire_all()
+    return [(price.value, price.date, price.last_seen) for price in session.query(Price).order_by(Price.date)]
+
+def test_compact_folds_runs_of_equal_prices(session):
+    for n, value in enumerate((1.0, 1.0, 2.0, None, 2.0, 2.0)):
+        add(session, value, day(n))
+    session.commit()
+
+    assert compact_prices(session) == 2
+    assert prices(session) == [
+        (1.0, day(0), day(1)), (2.0, day(2), None), (None, day(3), None), (2.0, day(4), day(5))
+    ]
+
+def test_replace_rows_written_for_the_observations(session):
+    add(session, 9.0, day(0) + timedelta(seconds=20))
+    add(session, 9.0, day(1) + timedelta(seconds=20))
+    session.commit()
+
+    assert replace_prices(session, 1, 1, [(day(0), 1.0), (day(1), 1.0)]) == (2, 1)
+    assert prices(session) == [(1.0, day(0), day(1))]
+    assert session.get(LatestPrice, (1, 1)).value == 1.0
+
+def test_rows_between_archived_fetches_are_kept(session):
+    add(session, 1.0, day(0) + timedelta(seconds=20))
+    # Written while pages were not archived
+    add(session, 3.0, day(2), last_seen=day(3))
+    add(session, 1.0, day(5) + timedelta(seconds=20))
+    session.commit()
+
+    assert replace_prices(session, 1, 1, [(day(0), 1.0), (day(1), 1.0), (day(5), 1.0), (day(6), 1.0)]) == (2, 2)
+    assert prices(session) == [(1.0, day(0), day(1)), (3.0, day(2), day(3)), (1.0, day(5), day(6))]
+    assert session.get(LatestPrice, (1, 1)).date == day(5)
+
+def test_replacement_continues_the_previous_price(session):
+    add(session, 1.0, day(0), last_seen=day(1))
+    add(session, 2.0, day(2) + timedelta(seconds=5))
+    session.commit()
+
+    replace_prices(session, 1, 1, [(day(2), 1.0), (day(3), 1.0)])
+
+    assert prices(session) == [(1.0, day(0), day(3))]
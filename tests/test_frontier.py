@@ -0,0 +1,100 @@
+import pytest
+
+from datahandler.models import Shop, Product
+from datahandler.writer import BulkWriter
+from helper.frontier import Frontier, url_key
+from sites.base import ShopScraper
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "frontier.sqlite")
+
+def test_urls_are_queued_once(path):
+    frontier = Frontier(1, path=path)
+
+    assert frontier.add(["http://a/1", "http://a/2", "http://a/1?ref=list"]) == 2
+    assert frontier.add(["http://a/2", "http://a/3"]) == 1
+    assert frontier.pending() == ["http://a/1", "http://a/2", "http://a/3"]
+
+def test_seeded_urls_are_not_queued(path):
+    frontier = Frontier(1, path=path)
+    frontier.seed(["http://a/1"])
+
+    assert frontier.add(["http://a/1", "http://a/2"]) == 1
+    assert frontier.pending() == ["http://a/2"]
+
+def test_done_urls_are_not_queued_again(path):
+    frontier = Frontier(1, path=path)
+    frontier.add(["http://a/1"])
+    frontier.done("http://a/1")
+
+    assert frontier.add(["http://a/1"]) == 0
+    assert len(frontier) == 0
+    assert frontier.requeue(["http://a/1"]) == 1
+    assert frontier.pending() == ["http://a/1"]
+
+def test_shops_are_separate(path):
+    first = Frontier(1, path=path)
+    second = Frontier(2, path=path)
+    first.add(["http://a/1"])
+    first.commit()
+
+    assert second.add(["http://a/1"]) == 1
+    assert len(first) == len(second) == 1
+
+def test_pending_urls_survive_a_restart(path):
+    frontier = Frontier(1, path=path, checkpoint=1000)
+    frontier.add(["http://a/1", "http://a/2"])
+    frontier.discovered("sitemap", 1234.5)
+    frontier.close()
+
+    frontier = Frontier(1, path=path)
+    assert frontier.pending() == ["http://a/1", "http://a/2"]
+    assert frontier.last_discovery("sitemap") == 1234.5
+    assert frontier.last_discovery("lists") is None
+
+def test_url_key_ignores_the_query():
+    assert url_key("http://a/1?ref=x") == url_key("http://a/1")
+    assert url_key("http://a/1") != url_key("http://a/2")
+
+class Site(ShopScraper):
+    name = "site"
+
+    def fetch_product(self, product_url):
+        n = int(product_url.rpartition("/")[2])
+        return {"name": f"Product {n}", "description": None, "ean": n, "price": 1.0, "amount": 1}
+
+@pytest.fixture
+def scraper(session, path):
+    return Site(None, session, session.get(Shop, 1), frontier=Frontier(1, path=path))
+
+def test_crawled_urls_leave_the_queue_once_committed(scraper):
+    scraper.frontier.add(["http://a/10", "http://a/11"])
+
+    scraper.crawl(scraper.frontier.pending())
+    assert len(scraper.frontier) == 2
+
+    scraper.writer.flush()
+    assert len(scraper.frontier) == 0
+    assert scraper.db.get(Product, 11) is not None
+
+def test_crawled_urls_stay_queued_if_the_flush_fails(scraper, monkeypatch):
+    scraper.frontier.add(["http://a/10"])
+    scraper.crawl(scraper.frontier.pending())
+
+    def fail():
+        raise RuntimeError("Lost connection")
+    monkeypatch.setattr(scraper.db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        scraper.writer.flush()
+
+    assert scraper.frontier.pending() == ["http://a/10"]
+
+def test_urls_without_rows_leave_the_queue_on_the_next_flush(scraper):
+    scraper.frontier.add(["http://a/10"])
+    scraper.fetch_product = lambda product_url: None
+
+    scraper.crawl(scraper.frontier.pending())
+    scraper.writer.flush()
+
+    assert len(scraper.frontier) == 0
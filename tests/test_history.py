@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from datahandler.models import Price
+from datahandler.history import lttb, get_price_history
+
+START = datetime(2024, 1, 1)
+
+def test_lttb_keeps_short_series():
+    points = [(x, x) for x in range(5)]
+
+    assert lttb(points, 5) == [0, 1, 2, 3, 4]
+    assert lttb(points, 10) == [0, 1, 2, 3, 4]
+
+def test_lttb_reduces_to_threshold_and_keeps_the_ends():
+    points = [(x, x % 7) for x in range(100)]
+
+    kept = lttb(points, 10)
+
+    assert len(kept) == 10
+    assert kept[0] == 0 and kept[-1] == 99
+    assert kept == sorted(kept)
+
+def test_lttb_keeps_a_spike():
+    points = [(x, 1.0) for x in range(1000)]
+    points[500] = (500, 99.0)
+
+    assert 500 in lttb(points, 20)
+
+def test_price_history_is_bounded_and_keeps_extremes(session):
+    for shop_id in (1, 2):
+        for n in range(400):
+            value = 99.0 if n == 200 else 10.0 + n % 5
+            session.add(Price(ean_id=1, shop_id=shop_id, value=value, date=START + timedelta(days=n)))
+    session.commit()
+
+    db = SimpleNamespace(session=session)
+    full = get_price_history(db, 1)
+    reduced = get_price_history(db, 1, max_points=50)
+
+    assert len(full) == 800
+    for shop in ("a", "b"):
+        values = [point["y"] for point in reduced if point["group"]["name"] == shop]
+        assert len(values) <= 50
+        assert max(values) == 99.0 and min(values) == 10.0
+    assert [point["x"] for point in reduced] == sorted(point["x"] for point in reduced)
+
+def test_price_history_time_range(session):
+    for n in range(10):
+        session.add(Price(ean_id=1, shop_id=1, value=float(n), date=START + timedelta(days=n)))
+    session.commit()
+
+    points = get_price_history(
+        SimpleNamespace(session=session), 1,
+        start=START + timedelta(days=3), end=START + timedelta(days=5)
+    )
+
+    assert [point["y"] for point in points] == [3.0, 4.0, 5.0]
+
+@pytest.mark.parametrize("max_points", [None, 3, 10, 150])
+def test_price_history_skips_rows_without_value(session, max_points):
+    for n in range(200):
+        value = None if n % 3 == 0 else float(n % 7)
+        session.add(Price(ean_id=1, shop_id=1, value=value, date=START + timedelta(days=n)))
+    session.commit()
+
+    points = get_price_history(SimpleNamespace(session=session), 1, max_points=max_points)
+
+    assert points and all(point["y"] is not None for point in points)
@@ -0,0 +1,64 @@
+import pytest
+
+from bench.server import StandInServer, make_ean, make_price
+from datahandler.models import Shop, Product, ProductPage, Price
+from helper.ratelimit import RateLimiter
+from sites.conrad import Conrad
+
+class FakeDriver:
+    """
+    Stands in for the browser, only hands out the cookies of its session
+    """
+
+    def get_cookies(self):
+        return [{"name": "customer", "value": "private", "domain": "127.0.0.1", "path": "/"}]
+
+class Site(Conrad):
+    private = True
+    rendered = []
+
+    def warm_up(self):
+        self.initialized = True
+        super().warm_up()
+
+    def private_customer(self):
+        return self.private
+
+    def render_price(self, product_url):
+        self.rendered.append(product_url)
+        return 1.0
+
+@pytest.fixture
+def server(session):
+    server = StandInServer(filler=1).start()
+    session.add(Product(ean_id=make_ean(0), name="Product 0", amount=1, unit_id="pcs"))
+    session.add(ProductPage(ean_id=make_ean(0), shop_id=1, url=server.product_url("conrad", 0)))
+    session.commit()
+
+    yield server
+    server.stop()
+
+@pytest.fixture
+def scraper(session):
+    Site.rendered = []
+    scraper = Site(FakeDriver(), session, session.get(Shop, 1), limiter=RateLimiter(rate=1000.0))
+    yield scraper
+    scraper.session.close()
+
+def test_prices_are_read_with_the_browser_cookies(session, server, scraper):
+    scraper.update_stored()
+    scraper.writer.close()
+
+    assert scraper.session.cookies.get("customer") == "private"
+    assert session.query(Price.value).scalar() == round(make_price(0), 2)
+    assert scraper.rendered == []
+
+def test_prices_are_rendered_without_private_customer(session, server, scraper):
+    scraper.private = False
+
+    scraper.update_stored()
+    scraper.writer.close()
+
+    assert not scraper.hybrid
+    assert scraper.rendered == [server.product_url("conrad", 0)]
+    assert session.query(Price.value).scalar() == 1.0
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from time import sleep
+
+import pytest
+from sqlalchemy import update
+
+from datahandler.models import ScrapeJob
+from helper.jobs import JobQueue
+
+def queue(session, owner, skip_locked=None, **kwargs):
+    queue = JobQueue(session, owner, **kwargs)
+    if skip_locked is not None:
+        queue.skip_locked = skip_locked
+    return queue
+
+def lease_until(session):
+    session.expire_all()
+    return {job.id: job.lease_until for job in session.query(ScrapeJob)}
+
+@pytest.mark.parametrize("skip_locked", [False, True])
+def test_claims_are_disjoint(session, skip_locked):
+    # SQLite ignores FOR UPDATE, with skip_locked the same statements as on
+    # MariaDB are run without the row locks
+    first = queue(session, "first", skip_locked)
+    second = queue(session, "second", skip_locked)
+    assert first.enqueue(1, "price", [(n, f"http://shop/{n}") for n in range(5)]) == 5
+
+    claimed = first.claim(limit=3)
+    rest = second.claim(limit=3)
+
+    assert len(claimed) == 3 and len(rest) == 2
+    assert not {job.id for job in claimed} & {job.id for job in rest}
+    assert second.claim() == []
+
+@pytest.mark.parametrize("dialect", ["mariadb", "mysql", "postgresql"])
+def test_skip_locked_where_supported(dialect):
+    bind = SimpleNamespace(dialect=SimpleNamespace(name=dialect))
+
+    assert JobQueue(SimpleNamespace(get_bind=lambda: bind), "worker").skip_locked
+
+def test_open_jobs_are_not_queued_twice(session):
+    jobs = queue(session, "worker")
+    jobs.enqueue(1, "price", [(1, "http://shop/1")])
+
+    assert jobs.enqueue(1, "price", [(1, "http://shop/1"), (2, "http://shop/2")]) == 1
+
+def test_claim_filters_shops(session):
+    jobs = queue(session, "worker")
+    jobs.enqueue(1, "price", [(1, "http://a/1")])
+    jobs.enqueue(2, "price", [(1, "http://b/1")])
+
+    assert [job.url for job in jobs.claim([2])] == ["http://b/1"]
+
+def test_expired_lease_is_claimed_again(session):
+    first = queue(session, "first")
+    second = queue(session, "second")
+    first.enqueue(1, "price", [(1, "http://shop/1")])
+    first.claim()
+
+    session.execute(update(ScrapeJob).values(lease_until=datetime.now() - timedelta(seconds=1)))
+    session.commit()
+
+    jobs = second.claim()
+    assert len(jobs) == 1 and jobs[0].attempts == 2
+    # The old owner can not remove it anymore
+    first.complete(jobs)
+    assert session.query(ScrapeJob).count() == 1
+
+def test_leases_are_renewed_while_the_batch_runs(session):
+    jobs = queue(session, "worker", lease=60)
+    jobs.enqueue(1, "price", [(n, f"http://shop/{n}") for n in range(3)])
+    claimed = jobs.claim()
+    claimed_until = lease_until(session)
+
+    with jobs.leased(claimed, interval=0.05):
+        # Finished jobs stay leased until they are completed
+        sleep(0.3)
+        renewed = lease_until(session)
+
+    assert all(renewed[job_id] > until for job_id, until in claimed_until.items())
+    sleep(0.1)
+    assert lease_until(session) == renewed
+
+def test_failed_jobs_are_not_renewed(session):
+    jobs = queue(session, "worker", lease=60)
+    jobs.enqueue(1, "price", [(1, "http://shop/1")])
+    claimed = jobs.claim()
+
+    with jobs.leased(claimed, interval=0.05):
+        jobs.fail(claimed[0], ValueError("boom"))
+        sleep(0.2)
+
+    assert lease_until(session) == {claimed[0].id: None}
+
+def test_failed_job_is_retried_with_backoff(session):
+    jobs = queue(session, "worker", max_attempts=2, backoff=60)
+    jobs.enqueue(1, "price", [(1, "http://shop/1")])
+
+    jobs.fail(jobs.claim()[0], ValueError("boom"))
+    job = session.query(ScrapeJob).one()
+    assert job.state == "queued" and job.error == "boom"
+    assert job.run_after > datetime.now() + timedelta(seconds=40)
+    assert jobs.claim() == []
+
+    session.execute(update(ScrapeJob).values(run_after=datetime.now()))
+    session.commit()
+    jobs.fail(jobs.claim()[0], ValueError("boom"))
+    session.expire_all()
+    assert session.query(ScrapeJob).one().state == "failed"
+
+def test_completed_jobs_are_removed(session):
+    jobs = queue(session, "worker")
+    jobs.enqueue(1, "price", [(1, "http://shop/1")])
+
+    jobs.complete(jobs.claim())
+
+    assert session.query(ScrapeJob).count() == 0
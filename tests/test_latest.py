@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from datahandler.models import Price, LatestPrice, Statistic
+from datahandler.latest import latest_price_rows, refresh_latest_prices, backfill_latest_prices, upsert, insert_missing
+
+START = datetime(2026, 1, 1)
+
+def add(session, ean_id, shop_id, value, days, last_seen=None):
+    price = Price(ean_id=ean_id, shop_id=shop_id, value=value, date=START + timedelta(days=days), last_seen=last_seen)
+    session.add(price)
+    session.flush()
+    return price
+
+def test_latest_price_rows_picks_the_newest_row_per_pair(session):
+    add(session, 1, 1, 3.0, 0)
+    newest = add(session, 1, 1, 2.0, 5)
+    other = add(session, 1, 2, 9.0, 1)
+    session.commit()
+
+    rows = latest_price_rows(session, [(1, 1), (1, 2), (2, 1)])
+
+    assert {pair: row.id for pair, row in rows.items()} == {(1, 1): newest.id, (1, 2): other.id}
+
+def test_refresh_inserts_and_updates(session):
+    first = add(session, 1, 1, 3.0, 0)
+    refresh_latest_prices(session, [(1, 1)])
+    session.commit()
+    assert session.get(LatestPrice, (1, 1)).price_id == first.id
+
+    second = add(session, 1, 1, 4.0, 1, last_seen=START + timedelta(days=2))
+    refresh_latest_prices(session, [(1, 1)])
+    session.commit()
+
+    latest = session.get(LatestPrice, (1, 1))
+    session.refresh(latest)
+    assert (latest.price_id, latest.value, latest.last_seen) == (second.id, 4.0, START + timedelta(days=2))
+    assert session.query(LatestPrice).count() == 1
+
+def test_refresh_removes_pairs_without_prices(session):
+    add(session, 1, 1, 3.0, 0)
+    refresh_latest_prices(session, [(1, 1)])
+    session.commit()
+
+    session.execute(delete(Price))
+    refresh_latest_prices(session, [(1, 1)])
+    session.commit()
+
+    assert session.query(LatestPrice).count() == 0
+
+def test_backfill_builds_all_pairs(session):
+    for ean_id in (1, 2, 3):
+        for shop_id in (1, 2):
+            add(session, ean_id, shop_id, 1.0, 0)
+    session.commit()
+
+    assert backfill_latest_prices(session, batch=2) == 6
+    assert session.query(LatestPrice).count() == 6
+
+def test_upsert_updates_existing_keys(session):
+    upsert(session, Statistic, [{"name": "a", "value": 1}, {"name": "b", "value": 2}], ["name"])
+    upsert(session, Statistic, [{"name": "a", "value": 5}], ["name"])
+    session.commit()
+
+    assert dict(session.query(Statistic.name, Statistic.value).all()) == {"a": 5, "b": 2}
+
+def test_insert_missing_keeps_existing_keys(session):
+    insert_missing(session, Statistic, [{"name": "a", "value": 1}], ["name"])
+
+    assert insert_missing(session, Statistic, [{"name": "a", "value": 5}, {"name": "b", "value": 2}], ["name"]) == 1
+    assert dict(session.query(Statistic.name, Statistic.value).all()) == {"a": 1, "b": 2}
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, String, Float, DateTime, inspect
+from sqlalchemy.orm import sessionmaker
+
+from datahandler.migrate import upgrade_schema, upgrade_data
+from datahandler.models import Product, LatestPrice, Statistic
+
+@pytest.fixture
+def old_engine(tmp_path):
+    """
+    Database as created before the latest prices, statistics, scrape
+    configuration and the added columns existed
+    """
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    metadata = MetaData()
+    Table("unit", metadata, Column("name", String(7), primary_key=True))
+    Table("shop", metadata, Column("id", Integer, primary_key=True), Column("name", String(255)))
+    Table("product", metadata,
+        Column("ean_id", BigInteger, primary_key=True), Column("name", String(255)),
+        Column("description", String(1023)), Column("amount", Float), Column("unit_id", String(7)))
+    Table("price", metadata,
+        Column("id", Integer, primary_key=True), Column("ean_id", BigInteger), Column("value", Float),
+        Column("shop_id", Integer), Column("date", DateTime))
+    metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO shop (id, name) VALUES (1, 'a')")
+        connection.exec_driver_sql("INSERT INTO product (ean_id, name, amount, unit_id) VALUES (1, 'Product 1', 1, 'pcs')")
+        connection.exec_driver_sql("INSERT INTO price (ean_id, value, shop_id, date) VALUES (1, 2.5, 1, '2026-01-01 00:00:00.000000')")
+        connection.exec_driver_sql("INSERT INTO price (ean_id, value, shop_id, date) VALUES (1, 3.5, 1, '2026-01-02 00:00:00.000000')")
+
+    yield engine
+    engine.dispose()
+
+def test_upgrade_creates_missing_tables_and_columns(old_engine):
+    upgrade_schema(old_engine)
+
+    inspector = inspect(old_engine)
+    for table in ("latestprice", "statistic", "scrapeconfig", "scrapejob", "productpage"):
+        assert inspector.has_table(table)
+    assert "last_seen" in {column["name"] for column in inspector.get_columns("price")}
+    assert "popularity" in {column["name"] for column in inspector.get_columns("product")}
+    assert "ix_price_ean_shop_date" in {index["name"] for index in inspector.get_indexes("price")}
+
+def test_upgrade_fills_derived_data(old_engine):
+    upgrade_schema(old_engine)
+    session = sessionmaker(bind=old_engine)()
+
+    upgrade_data(session)
+
+    latest = session.get(LatestPrice, (1, 1))
+    assert (latest.value, latest.date) == (3.5, datetime(2026, 1, 2))
+    assert session.get(Product, 1).popularity == 2
+    assert session.get(Statistic, "prices").value == 2
+    session.close()
+
+def test_upgrade_twice_changes_nothing(old_engine):
+    upgrade_schema(old_engine)
+    upgrade_schema(old_engine)
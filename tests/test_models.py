@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.dialects.mysql.mariadb import MariaDBDialect
+from sqlalchemy.schema import CreateIndex
+
+from datahandler.migrate import _created_on
+from datahandler.models import Product
+
+def fulltext_index():
+    return next(index for index in Product.__table__.indexes if index.name == "ix_product_fulltext")
+
+@pytest.mark.parametrize("dialect", [mysql.dialect(), MariaDBDialect()])
+def test_fulltext_index_ddl(dialect):
+    ddl = str(CreateIndex(fulltext_index()).compile(dialect=dialect))
+
+    assert ddl == "CREATE FULLTEXT INDEX ix_product_fulltext ON product (name, description)"
+
+def test_fulltext_index_only_on_mariadb_and_mysql():
+    index = fulltext_index()
+
+    assert _created_on(index, MariaDBDialect())
+    assert _created_on(index, mysql.dialect())
+    assert not _created_on(index, sqlite.dialect())
@@ -0,0 +1,58 @@
+import pytest
+
+import helper.parse as parse
+from helper.parse import StreamExtractor, extract_text, price_value, structured_price, make_soup
+
+PAGE = """<html><body>
+<div class="price"><p class="old productPrice">9,99 €</p></div>
+<p class="productPrice big">1.299,00 <span>€</span></p>
+</body></html>"""
+
+def test_extract_text_of_the_first_match():
+    assert extract_text(PAGE, "p", class_="productPrice") == "9,99 €"
+    assert extract_text(PAGE, "p", class_="big") == "1.299,00 €"
+    assert extract_text(PAGE, "div", class_="missing") is None
+
+def test_extract_text_of_nested_elements():
+    text = '<div id="a"><div>x</div><div>y</div></div><div>z</div>'
+
+    assert extract_text(text, "div", id="a") == "xy"
+
+def test_extract_text_across_chunks(monkeypatch):
+    monkeypatch.setattr(parse, "CHUNK_SIZE", 3)
+
+    assert extract_text(PAGE, "p", class_="big") == "1.299,00 €"
+
+def test_extractor_stops_at_the_end_of_the_element():
+    extractor = StreamExtractor("p", {"class": "productPrice"})
+
+    with pytest.raises(parse._Found):
+        extractor.feed(PAGE)
+    assert "".join(extractor.text) == "9,99 €"
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.299,00 €", 1299.0), ("1299.00", 1299.0), (12.5, 12.5), ("3,50", 3.5), ("n/a", None)
+])
+def test_price_value(value, expected):
+    assert price_value(value) == expected
+
+def test_structured_price_from_json_ld():
+    text = '<script type="application/ld+json">{"@graph": [{"@type": "Product", "offers": [{"price": "4.20"}]}]}</script>'
+
+    assert structured_price(text) == 4.2
+
+def test_structured_price_from_microdata():
+    assert structured_price('<span itemprop="price" content="7.50">7,50 €</span>') == 7.5
+    assert structured_price('<span itemprop="price">7,50 €</span>') == 7.5
+
+def test_structured_price_skips_invalid_json():
+    text = '<script type="application/ld+json">{broken</script><meta itemprop="price" content="1.00">'
+
+    assert structured_price(text) == 1.0
+    assert structured_price("<p>no price</p>") is None
+
+def test_soup_only_contains_the_requested_ids():
+    soup = make_soup('<div id="a">1</div><div id="b">2</div>', ids=["b"])
+
+    assert soup.find(id="a") is None
+    assert soup.find(id="b").text == "2"
@@ -0,0 +1,89 @@
+from datahandler.models import Shop, ScrapeConfig
+from helper.ratelimit import RateLimiter, served_from_cache
+
+def test_healthy_responses_increase_the_rate_up_to_max_rate():
+    limiter = RateLimiter(rate=1.0, max_rate=1.5, increase=0.2)
+
+    for _ in range(10):
+        limiter.feedback(200, 0.1)
+
+    assert limiter.rate == 1.5
+
+def test_backoff_status_cuts_the_rate_once_per_interval():
+    limiter = RateLimiter(rate=4.0, min_rate=0.5, decrease=0.5)
+
+    limiter.feedback(429, 0.1)
+    limiter.feedback(503, 0.1)
+
+    assert limiter.rate == 2.0
+
+def test_rate_does_not_drop_below_min_rate():
+    limiter = RateLimiter(rate=1.0, min_rate=0.8, decrease=0.5)
+
+    limiter.feedback(429, 0.1)
+
+    assert limiter.rate == 0.8
+
+def test_rising_latency_counts_as_overload():
+    limiter = RateLimiter(rate=4.0, slowdown=3.0)
+    for _ in range(5):
+        limiter.feedback(200, 0.1)
+    rate = limiter.rate
+
+    for _ in range(5):
+        limiter.feedback(200, 2.0)
+
+    assert limiter.rate < rate
+
+def test_baseline_follows_recent_responses():
+    limiter = RateLimiter(window=10)
+    for _ in range(5):
+        limiter.feedback(200, 0.01)
+    for _ in range(30):
+        limiter.feedback(200, 0.3)
+
+    assert abs(limiter.baseline - 0.3) < 0.01
+
+def test_not_modified_and_cached_responses_are_no_latency():
+    limiter = RateLimiter()
+    limiter.feedback(200, 0.3)
+
+    limiter.feedback(304, 0.001)
+    limiter.feedback(200, 0.001, cached=True)
+
+    assert limiter.latency == 0.3 and limiter.baseline == 0.3
+
+def test_served_from_cache():
+    assert served_from_cache({"x-cache": "HIT from cdn"})
+    assert served_from_cache({"cf-cache-status": "HIT"})
+    assert served_from_cache({"age": "12"})
+    assert not served_from_cache({"age": "0", "x-cache": "MISS"})
+    assert not served_from_cache({"age": "soon"})
+
+def test_split_shares_the_rate():
+    limiter = RateLimiter(rate=4.0, min_rate=0.4, max_rate=8.0).split(4)
+
+    assert (limiter.rate, limiter.min_rate, limiter.max_rate) == (1.0, 0.1, 2.0)
+
+def test_wait_spaces_requests():
+    limiter = RateLimiter(rate=10.0, burst=1)
+
+    assert limiter._reserve() == 0
+    assert abs(limiter._reserve() - 0.1) < 0.01
+
+def test_browser_loads_without_status_only_count_latency():
+    limiter = RateLimiter(rate=1.0, max_rate=5.0, increase=0.5)
+
+    limiter.feedback(None, 0.2)
+
+    assert limiter.rate == 1.5
+
+def test_config_of_the_shop(session):
+    session.add(ScrapeConfig(shop_id=1, rate=3.0, min_rate=0.5, max_rate=6.0, burst=2))
+    session.commit()
+
+    limiter = RateLimiter.for_shop(session, session.get(Shop, 1))
+    default = RateLimiter.for_shop(session, session.get(Shop, 2))
+
+    assert (limiter.rate, limiter.min_rate, limiter.max_rate, limiter.burst) == (3.0, 0.5, 6.0, 2)
+    assert default.rate == RateLimiter().rate
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from datahandler.models import Shop, ProductPage, ScrapeConfig
+from datahandler.writer import BulkWriter
+from helper.schedule import RefreshSchedule, DuePage
+
+NOW = datetime(2024, 6, 1, 12)
+
+@pytest.fixture
+def writer(session):
+    for ean_id in (1, 2, 3):
+        session.add(ProductPage(ean_id=ean_id, shop_id=1, url=f"http://a/{ean_id}"))
+    session.commit()
+    return BulkWriter(session)
+
+def page(session, ean_id):
+    session.expire_all()
+    return session.get(ProductPage, (ean_id, 1))
+
+def schedule(session, writer, **kwargs):
+    return RefreshSchedule(session, 1, writer, **kwargs)
+
+def test_load_queues_due_pages_most_overdue_first(session, writer):
+    # 1 was never priced, 2 was priced long ago, 3 recently
+    writer.add_price(2, 1, 5.0, NOW - timedelta(days=3))
+    writer.add_price(3, 1, 5.0, NOW - timedelta(hours=1))
+    writer.flush()
+
+    refresh = schedule(session, writer)
+    refresh.load(NOW)
+
+    assert refresh.due() == [DuePage(1, "http://a/1"), DuePage(2, "http://a/2")]
+    assert len(refresh) == 0
+
+def test_load_uses_the_scheduled_due_date(session, writer):
+    writer.schedule_page(1, 1, NOW + timedelta(hours=1), 12.0)
+    writer.schedule_page(2, 1, NOW - timedelta(hours=1), 12.0)
+    writer.schedule_page(3, 1, NOW - timedelta(hours=2), 12.0)
+    writer.flush()
+
+    refresh = schedule(session, writer)
+    refresh.load(NOW)
+
+    assert [page.ean_id for page in refresh.due()] == [3, 2]
+
+def test_due_returns_at_most_budget_pages(session, writer):
+    refresh = schedule(session, writer, budget=2)
+    refresh.load(NOW)
+
+    assert len(refresh.due()) == 2
+    assert len(refresh.due()) == 1
+
+@pytest.mark.parametrize("interval, value, expected", [
+    (10.0, 5.0, 15.0), # unchanged price
+    (300.0, 5.0, 336.0), # capped at max_interval
+    (20.0, 6.0, 10.0), # changed price
+    (8.0, 6.0, 6.0), # not below min_interval
+])
+def test_observe_adapts_the_interval(session, writer, interval, value, expected):
+    writer.add_price(1, 1, 5.0, NOW - timedelta(days=3))
+    writer.schedule_page(1, 1, NOW - timedelta(hours=1), interval)
+    writer.flush()
+
+    refresh = schedule(session, writer)
+    refresh.load(NOW)
+    refresh.observe(1, value, now=NOW)
+    writer.flush()
+
+    assert page(session, 1).refresh_interval == expected
+    assert page(session, 1).next_due == NOW + timedelta(hours=expected)
+
+def test_unchanged_pages_lengthen_the_interval(session, writer):
+    writer.schedule_page(1, 1, NOW - timedelta(hours=1), 10.0)
+    writer.flush()
+
+    refresh = schedule(session, writer)
+    refresh.load(NOW)
+    refresh.observe(1, unchanged=True, now=NOW)
+    writer.flush()
+
+    assert page(session, 1).refresh_interval == 15.0
+
+def test_first_price_keeps_the_interval(session, writer):
+    refresh = schedule(session, writer, default=24.0)
+    refresh.load(NOW)
+    refresh.observe(1, 5.0, now=NOW)
+    refresh.observe(1, 5.0, now=NOW + timedelta(days=1))
+    writer.flush()
+
+    # The second observation already compares to the first
+    assert page(session, 1).refresh_interval == 36.0
+    assert page(session, 1).next_due == NOW + timedelta(days=1, hours=36)
+
+def test_failed_pages_are_retried_soon(session, writer):
+    writer.schedule_page(1, 1, NOW - timedelta(hours=1), 48.0)
+    writer.flush()
+
+    refresh = schedule(session, writer, min_interval=2.0)
+    refresh.load(NOW)
+    refresh.observe(1, None, now=NOW)
+    writer.flush()
+
+    assert page(session, 1).refresh_interval == 48.0
+    assert page(session, 1).next_due == NOW + timedelta(hours=2)
+
+def test_track_makes_pages_known_without_queueing(session, writer):
+    writer.add_price(1, 1, 5.0, NOW - timedelta(hours=1))
+    writer.schedule_page(1, 1, NOW + timedelta(days=1), 10.0)
+    writer.flush()
+
+    refresh = schedule(session, writer)
+    refresh.observe(1, 5.0, now=NOW)
+    assert len(writer) == 0
+
+    refresh.track([1])
+    assert len(refresh) == 0
+    refresh.observe(1, 5.0, now=NOW)
+    writer.flush()
+
+    assert page(session, 1).refresh_interval == 15.0
+
+def test_for_shop_uses_the_config_of_the_shop(session, writer):
+    session.add(ScrapeConfig(shop_id=1, min_interval=1.0, max_interval=48.0, budget=10))
+    session.add(ScrapeConfig(shop_id=2, min_interval=None, max_interval=None))
+    session.commit()
+
+    configured = RefreshSchedule.for_shop(session, session.get(Shop, 1), writer)
+    empty = RefreshSchedule.for_shop(session, session.get(Shop, 2), writer)
+    session.query(ScrapeConfig).filter_by(shop_id=2).delete()
+    missing = RefreshSchedule.for_shop(session, session.get(Shop, 2), writer)
+
+    assert (configured.min_interval, configured.max_interval, configured.budget) == (1.0, 48.0, 10)
+    assert (empty.min_interval, empty.max_interval, empty.budget) == (6.0, 336.0, None)
+    assert (missing.min_interval, missing.max_interval, missing.budget) == (6.0, 336.0, None)
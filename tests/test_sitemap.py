@@ -0,0 +1,56 @@
+import gzip
+
+from helper.sitemap import SitemapParser, SitemapEntry, parse_lastmod, robots_sitemaps
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc> https://shop.example/a-p1.html </loc><lastmod>2026-01-02T00:00:00+00:00</lastmod></url>
+  <url><loc>https://shop.example/b-p2.html</loc></url>
+  <url><lastmod>2026-01-02</lastmod></url>
+</urlset>"""
+
+INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://shop.example/sitemap-1.xml.gz</loc><lastmod>2026-01-02</lastmod></sitemap>
+</sitemapindex>"""
+
+EXPECTED = [
+    SitemapEntry("url", "https://shop.example/a-p1.html", 1767312000.0),
+    SitemapEntry("url", "https://shop.example/b-p2.html", None),
+]
+
+def parse(document, size):
+    parser = SitemapParser()
+    entries = []
+    for i in range(0, len(document), size):
+        entries += parser.feed(document[i:i + size])
+    return entries + parser.close()
+
+def test_urlset():
+    assert parse(URLSET, len(URLSET)) == EXPECTED
+
+def test_entries_split_across_chunks():
+    assert parse(URLSET, 7) == EXPECTED
+
+def test_gzipped_sitemap():
+    assert parse(gzip.compress(URLSET), 16) == EXPECTED
+
+def test_sitemap_index():
+    assert parse(INDEX, 50) == [SitemapEntry("sitemap", "https://shop.example/sitemap-1.xml.gz", 1767312000.0)]
+
+def test_parsed_entries_are_dropped():
+    parser = SitemapParser()
+    parser.feed(URLSET)
+
+    assert len(parser.root) == 0
+
+def test_parse_lastmod():
+    assert parse_lastmod("2026-01-02T01:00:00+01:00") == 1767312000.0
+    assert parse_lastmod("2026-01-02") == 1767312000.0
+    assert parse_lastmod("yesterday") is None
+    assert parse_lastmod(None) is None
+
+def test_robots_sitemaps():
+    robots = "User-agent: *\nDisallow: /cart\nSitemap: https://shop.example/sitemap.xml\nsitemap:https://shop.example/b.xml\n"
+
+    assert robots_sitemaps(robots) == ["https://shop.example/sitemap.xml", "https://shop.example/b.xml"]
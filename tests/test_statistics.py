@@ -0,0 +1,71 @@
+from datetime import date, datetime, timedelta
+
+from datahandler.models import Price, Statistic
+from datahandler.statistics import (
+    StatisticsCache, count_statistics, ensure_statistics, prices_on, refresh_statistics
+)
+from datahandler.writer import BulkWriter
+
+def counters(session):
+    session.expire_all()
+    return {row.name: row.value for row in session.query(Statistic)}
+
+def test_count_statistics_adds_to_the_counters(session):
+    count_statistics(session, {"prices": 2, "products": 0})
+    count_statistics(session, {"prices": 3, "shops": 1})
+    session.commit()
+
+    # Counters without an amount are not created
+    assert counters(session) == {"prices": 5, "shops": 1}
+
+def test_writer_counts_the_rows_it_wrote(session):
+    with BulkWriter(session) as writer:
+        writer.add_product(4, "Product 4", None, 1, "pcs")
+        writer.add_price(4, 1, 2.0)
+        writer.add_price(1, 1, 3.0)
+
+    assert counters(session) == {"products": 1, "prices": 2, prices_on(date.today()): 2}
+
+def test_refresh_statistics_recounts_and_keeps_the_daily_counters(session):
+    count_statistics(session, {"products": 10, "prices": 10, prices_on(date.today()): 4})
+    session.add(Price(ean_id=1, shop_id=1, value=1.0))
+    session.commit()
+
+    assert refresh_statistics(session) == {"products": 3, "shops": 2, "prices": 1}
+    session.commit()
+    assert counters(session) == {"products": 3, "shops": 2, "prices": 1, prices_on(date.today()): 4}
+
+def test_ensure_statistics_counts_only_once(session):
+    ensure_statistics(session)
+    assert counters(session)["products"] == 3
+
+    count_statistics(session, {"products": 1})
+    session.commit()
+    ensure_statistics(session)
+    assert counters(session)["products"] == 4
+
+def test_cache_reads_counters_and_latest_prices(session):
+    with BulkWriter(session) as writer:
+        writer.add_price(1, 1, 1.0, datetime.now() - timedelta(days=3))
+        writer.add_price(2, 2, 1.0, datetime.now() - timedelta(hours=1))
+        writer.add_price(3, 2, 1.0, datetime.now() - timedelta(hours=2))
+
+    stats = StatisticsCache(active=timedelta(days=1)).get(session)
+
+    assert stats["prices"] == 3 and stats["products"] == 0 and stats["shops"] == 0
+    # Only the prices written today are counted for today, whatever their date
+    assert stats["prices_today"] == 3
+    assert stats["active_shops"] == 1
+    assert abs(stats["newest_price"] - (datetime.now() - timedelta(hours=1))) < timedelta(minutes=1)
+
+def test_cache_is_read_at_most_every_ttl(session):
+    cache = StatisticsCache(ttl=3600)
+    assert cache.get(session)["prices"] == 0
+
+    count_statistics(session, {"prices": 1})
+    session.commit()
+    assert cache.get(session)["prices"] == 0
+
+    cache.clear()
+    assert cache.get(session)["prices"] == 1
+    assert StatisticsCache(ttl=0).get(session)["prices"] == 1
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from bench.server import StandInServer, make_ean, make_price
+from datahandler.models import Shop, Product, ProductPage, Price
+from datahandler.writer import BulkWriter
+from helper.ratelimit import RateLimiter
+from sites import make_http_client
+from sites.reichelt import Reichelt
+
+PAGES = 20
+
+@pytest.fixture
+def server(session):
+    server = StandInServer(filler=1).start()
+    for n in range(PAGES):
+        session.add(Product(ean_id=make_ean(n), name=f"Product {n}", amount=1, unit_id="pcs"))
+        session.add(ProductPage(ean_id=make_ean(n), shop_id=1, url=server.product_url("reichelt", n)))
+    session.commit()
+
+    yield server
+    server.stop()
+
+def update_stored_async(session, concurrency=4):
+    client = make_http_client()
+    writer = BulkWriter(session)
+    limiter = RateLimiter(rate=1000.0, min_rate=1000.0, max_rate=1000.0, burst=concurrency)
+    scraper = Reichelt(client, session, session.get(Shop, 1), writer=writer, limiter=limiter)
+    try:
+        results = asyncio.run(scraper.update_stored_async(concurrency=concurrency))
+        writer.close()
+    finally:
+        client.close()
+
+    return results
+
+def stored_prices(session):
+    return dict(session.query(Price.ean_id, Price.value))
+
+def expected_prices(numbers):
+    return {make_ean(n): round(make_price(n), 2) for n in numbers}
+
+def test_all_due_pages_are_refreshed(session, server):
+    results = update_stored_async(session)
+
+    assert results == [True] * PAGES
+    assert stored_prices(session) == expected_prices(range(PAGES))
+    assert server.requests == PAGES
+
+def test_refreshed_pages_are_not_due_anymore(session, server):
+    update_stored_async(session)
+
+    assert update_stored_async(session) == []
+
+def test_failing_pages_do_not_stop_the_others(session, server):
+    server.error_rate = 0.3
+
+    results = update_stored_async(session)
+
+    stored = stored_prices(session)
+    assert 0 < server.errors < PAGES
+    assert sum(results) == len(stored) == PAGES - server.errors
+    assert stored == {ean: value for ean, value in expected_prices(range(PAGES)).items() if ean in stored}
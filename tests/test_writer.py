@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from datahandler.models import Unit, Product, ProductPage, Price, LatestPrice, Statistic
+from datahandler.writer import BulkWriter
+
+START = datetime(2026, 1, 1)
+
+def day(n):
+    return START + timedelta(days=n)
+
+def prices(session):
+    return [
+        (price.ean_id, price.shop_id, price.value, price.date, price.last_seen)
+        for price in session.query(Price).order_by(Price.ean_id, Price.shop_id, Price.date)
+    ]
+
+def test_rows_are_buffered_until_max_rows(session):
+    writer = BulkWriter(session, max_rows=3)
+    writer.add_product(10, "Product 10", None, 1, "pcs")
+    writer.add_page(10, 1, "http://a/10")
+    assert session.get(Product, 10) is None
+
+    writer.add_price(10, 1, 1.0, day(0))
+
+    assert len(writer) == 0
+    assert session.get(ProductPage, (10, 1)).url == "http://a/10"
+    assert prices(session) == [(10, 1, 1.0, day(0), None)]
+
+def test_close_flushes(session):
+    with BulkWriter(session) as writer:
+        writer.add_unit("kg")
+        writer.add_price(1, 1, 1.0, day(0))
+
+    assert session.get(Unit, "kg") is not None
+    assert len(prices(session)) == 1
+
+def test_keys_written_by_another_writer_keep_the_batch(session):
+    first = BulkWriter(session)
+    second = BulkWriter(session)
+    for writer, shop_id, value in ((first, 1, 1.0), (second, 2, 2.0)):
+        writer.add_unit("kg")
+        writer.add_product(10, "Product 10", None, 1, "kg")
+        writer.add_page(10, shop_id, f"http://{shop_id}/10")
+        writer.add_page(1, 1, "http://a/1")
+        writer.add_price(10, shop_id, value, day(0))
+
+    first.flush()
+    second.flush()
+
+    assert prices(session) == [(10, 1, 1.0, day(0), None), (10, 2, 2.0, day(0), None)]
+    assert session.query(ProductPage).count() == 3
+    assert session.get(Statistic, "products").value == 1
+
+def test_existing_products_are_not_changed(session):
+    with BulkWriter(session) as writer:
+        writer.add_product(1, "Other name", None, 1, "pcs")
+
+    assert session.get(Product, 1).name == "Product 1"
+
+def test_equal_prices_extend_the_current_row(session):
+    with BulkWriter(session) as writer:
+        writer.add_price(1, 1, 3.5, day(0))
+        writer.add_price(1, 1, 3.5, day(1))
+        writer.add_price(1, 1, 3.5, day(2))
+
+    assert prices(session) == [(1, 1, 3.5, day(0), day(2))]
+
+def test_changed_price_adds_a_row(session):
+    with BulkWriter(session) as writer:
+        writer.add_price(1, 1, 3.5, day(0))
+        writer.add_price(1, 1, 4.0, day(1))
+        writer.add_price(1, 1, 4.0, day(2))
+
+    assert prices(session) == [(1, 1, 3.5, day(0), None), (1, 1, 4.0, day(1), day(2))]
+
+def test_folding_continues_across_flushes(session):
+    writer = BulkWriter(session)
+    writer.add_price(1, 1, 3.5, day(0))
+    writer.flush()
+    writer.add_price(1, 1, 3.5, day(1))
+    writer.seen_price(1, 1, day(2))
+    writer.add_price(2, 1, 1.0, day(2))
+    writer.close()
+
+    assert prices(session) == [(1, 1, 3.5, day(0), day(2)), (2, 1, 1.0, day(2), None)]
+
+def test_backdated_observation_does_not_shorten_the_row(session):
+    with BulkWriter(session) as writer:
+        writer.add_price(1, 1, 3.5, day(0))
+        writer.add_price(1, 1, 3.5, day(9))
+    with BulkWriter(session) as writer:
+        writer.add_price(1, 1, 3.5, day(4))
+        writer.seen_price(1, 1, day(5))
+
+    assert prices(session) == [(1, 1, 3.5, day(0), day(9))]
+    assert session.get(LatestPrice, (1, 1)).last_seen == day(9)
+
+def test_shops_are_folded_separately(session):
+    with BulkWriter(session) as writer:
+        writer.add_price(1, 1, 3.5, day(0))
+        writer.add_price(1, 2, 3.5, day(1))
+
+    assert len(prices(session)) == 2
+
+def test_without_change_only_every_price_is_a_row(session):
+    with BulkWriter(session, change_only=False) as writer:
+        writer.add_price(1, 1, 3.5, day(0))
+        writer.add_price(1, 1, 3.5, day(1))
+
+    assert len(prices(session)) == 2
+
+def test_seen_price_without_current_price_is_dropped(session):
+    with BulkWriter(session) as writer:
+        writer.seen_price(1, 1, day(0))
+
+    assert prices(session) == []
+
+def test_latest_price_and_popularity_are_updated(session):
+    with BulkWriter(session) as writer:
+        writer.add_price(1, 1, 3.5, day(0))
+        writer.add_price(1, 1, 4.0, day(1))
+        writer.add_price(1, 1, 4.0, day(2))
+
+    latest = session.get(LatestPrice, (1, 1))
+    assert (latest.value, latest.date, latest.last_seen) == (4.0, day(1), day(2))
+    assert session.get(Product, 1).popularity == 2
+
+def test_after_commit_runs_once_after_a_successful_flush(session):
+    called = []
+    writer = BulkWriter(session)
+    writer.add_price(1, 1, 1.0, day(0))
+    writer.after_commit(lambda: called.append(True))
+    assert called == []
+
+    writer.flush()
+    writer.add_price(1, 1, 2.0, day(1))
+    writer.flush()
+    assert called == [True]
+
+def test_after_commit_is_dropped_if_the_flush_fails(session, monkeypatch):
+    called = []
+    writer = BulkWriter(session)
+    writer.add_price(1, 1, 1.0, day(0))
+    writer.after_commit(lambda: called.append(True))
+
+    def fail():
+        raise RuntimeError("Lost connection")
+    monkeypatch.setattr(session, "commit", fail)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    monkeypatch.undo()
+
+    writer.add_price(1, 1, 1.0, day(1))
+    writer.flush()
+    assert called == []
+    assert prices(session) == [(1, 1, 1.0, day(1), None)]